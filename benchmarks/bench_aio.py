@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+#
+# K2hash Python Driver under MIT License
+#
+# Copyright (c) 2022 Yahoo Japan Corporation
+#
+# For the full copyright and license information, please view
+# the license file that was distributed with this source code.
+#
+# AUTHOR:   Hirotaka Wakabayashi
+# CREATE:   Tue Feb 08 2022
+# REVISION:
+#
+"""
+Measures the event loop latency while gets run on the loop, comparing K2hash.get
+called from coroutines with AsyncK2hash.get.
+
+A heartbeat coroutine sleeps 1ms repeatedly and records how late it wakes up.
+
+Usage::
+
+    $ python3 benchmarks/bench_aio.py [count] [concurrency]
+"""
+import asyncio
+import statistics
+import sys
+import time
+
+import k2hash
+from k2hash import aio
+
+
+async def _heartbeat(lags, stop):
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        start = loop.time()
+        await asyncio.sleep(0.001)
+        lags.append(loop.time() - start - 0.001)
+
+
+async def _measure(name, count, concurrency, get):
+    lags = []
+    stop = asyncio.Event()
+    heartbeat = asyncio.ensure_future(_heartbeat(lags, stop))
+    keys = ["key{}".format(i) for i in range(count)]
+
+    async def worker(offset):
+        for key in keys[offset::concurrency]:
+            await get(key)
+
+    start = time.perf_counter()
+    await asyncio.gather(*[worker(i) for i in range(concurrency)])
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await heartbeat
+    lags.sort()
+    print(
+        "{:<12} {:>10.0f} ops/sec  loop lag median {:>8.1f} usec  max {:>8.1f} usec".format(
+            name,
+            count / elapsed,
+            statistics.median(lags) * 1000000 if lags else 0.0,
+            lags[-1] * 1000000 if lags else 0.0,
+        )
+    )
+
+
+async def _main(count, concurrency):
+    db = k2hash.K2hash()
+    db.set_many({"key{}".format(i): "val{}".format(i) for i in range(count)})
+
+    async def sync_get(key):
+        db.get(key)
+        await asyncio.sleep(0)
+
+    await _measure("K2hash", count, concurrency, sync_get)
+    adb = aio.AsyncK2hash(db)
+    await _measure("AsyncK2hash", count, concurrency, adb.get)
+    await adb.close()
+
+
+def main(count=100000, concurrency=100):
+    """Runs the benchmark and prints ops/sec and the event loop lag."""
+    asyncio.run(_main(count, concurrency))
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:3]])
+
+#
+# Local variables:
+# tab-width: 4
+# c-basic-offset: 4
+# End:
+# vim600: expandtab sw=4 ts=4 fdm=marker
+# vim<600: expandtab sw=4 ts=4
+#
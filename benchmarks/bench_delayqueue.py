@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+#
+# K2hash Python Driver under MIT License
+#
+# Copyright (c) 2022 Yahoo Japan Corporation
+#
+# For the full copyright and license information, please view
+# the license file that was distributed with this source code.
+#
+# AUTHOR:   Hirotaka Wakabayashi
+# CREATE:   Tue Feb 08 2022
+# REVISION:
+#
+"""
+Schedules count elements spread over span seconds into a DelayQueue and measures
+the put rate, the cost of a get that finds nothing due, and the promotion rate of
+matured buckets.
+
+The delays are scaled by speedup, so that an hour of schedule can be replayed in
+a shorter run; bucket_seconds is scaled the same way.
+
+Usage::
+
+    $ python3 benchmarks/bench_delayqueue.py [count] [span] [speedup]
+"""
+import random
+import sys
+import time
+
+import k2hash
+
+
+def main(count=1000000, span=3600, speedup=60):
+    """Runs the benchmark and prints the rates."""
+    db = k2hash.K2hash()
+    queue = k2hash.DelayQueue(db, bucket_seconds=1 / speedup)
+    delays = sorted(random.uniform(1, span) / speedup for _ in range(count))
+
+    start = time.perf_counter()
+    # elements in the same bucket are put together, as a scheduler would batch them.
+    groups = {}
+    for i, delay in enumerate(delays):
+        groups.setdefault(int(delay * speedup), []).append("job{}".format(i))
+    for bucket, jobs in groups.items():
+        queue.put_many(jobs, delay=bucket / speedup)
+    elapsed = time.perf_counter() - start
+    print("put       {:>12.0f} elements/sec".format(count / elapsed))
+
+    start = time.perf_counter()
+    for _ in range(10000):
+        queue.get()
+    print("empty get {:>12.1f} usec/op".format((time.perf_counter() - start) * 100))
+
+    got = 0
+    start = time.perf_counter()
+    deadline = time.monotonic() + span / speedup + 5
+    while got < count and time.monotonic() < deadline:
+        got += len(queue.get_many(10000, block=True, timeout=1))
+    elapsed = time.perf_counter() - start
+    print("delivered {:>12} of {} in {:.1f} sec".format(got, count, elapsed))
+    queue.close()
+    db.close()
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:4]])
+
+#
+# Local variables:
+# tab-width: 4
+# c-basic-offset: 4
+# End:
+# vim600: expandtab sw=4 ts=4 fdm=marker
+# vim<600: expandtab sw=4 ts=4
+#
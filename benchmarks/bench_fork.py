@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+#
+# K2hash Python Driver under MIT License
+#
+# Copyright (c) 2022 Yahoo Japan Corporation
+#
+# For the full copyright and license information, please view
+# the license file that was distributed with this source code.
+#
+# AUTHOR:   Hirotaka Wakabayashi
+# CREATE:   Tue Feb 08 2022
+# REVISION:
+#
+"""
+Measures the read throughput of forked multiprocessing.Pool workers that use a
+K2hash opened in the parent before fork, from 1 worker to processes workers.
+Every worker checks the values it reads, so a handle shared after fork shows up
+as errors.
+
+Usage::
+
+    $ python3 benchmarks/bench_fork.py [count] [processes] [path]
+"""
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+import k2hash
+
+# opened in the parent and inherited by the workers.
+_DB = None
+
+
+def _read(args):
+    offset, step, count = args
+    errors = 0
+    for i in range(offset, count, step):
+        if _DB.get("key{}".format(i)) != "val{}".format(i):
+            errors += 1
+    return errors
+
+
+def _run(processes, count):
+    context = multiprocessing.get_context("fork")
+    with context.Pool(processes) as pool:
+        start = time.perf_counter()
+        errors = sum(pool.map(_read, [(i, processes, count) for i in range(processes)]))
+        return count / (time.perf_counter() - start), errors
+
+
+def main(count=200000, processes=8, path=None):
+    """Runs the benchmark and prints reads/sec for each process count."""
+    global _DB  # noqa: pylint: disable=global-statement
+    if path is None:
+        path = os.path.join(tempfile.mkdtemp(), "bench_fork.k2h")
+    _DB = k2hash.K2hash(path, readonly=False, removefile=False)
+    try:
+        _DB.set_many({"key{}".format(i): "val{}".format(i) for i in range(count)})
+        workers = 1
+        while workers <= processes:
+            rate, errors = _run(workers, count)
+            print("processes={:<3} {:>12.0f} reads/sec errors={}".format(workers, rate, errors))
+            workers *= 2
+    finally:
+        _DB.close()
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:3]], *sys.argv[3:4])
+
+#
+# Local variables:
+# tab-width: 4
+# c-basic-offset: 4
+# End:
+# vim600: expandtab sw=4 ts=4 fdm=marker
+# vim<600: expandtab sw=4 ts=4
+#
@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+#
+# K2hash Python Driver under MIT License
+#
+# Copyright (c) 2022 Yahoo Japan Corporation
+#
+# For the full copyright and license information, please view
+# the license file that was distributed with this source code.
+#
+# AUTHOR:   Hirotaka Wakabayashi
+# CREATE:   Tue Feb 08 2022
+# REVISION:
+#
+"""
+Compares K2hash.get_many/set_many with a loop of K2hash.get/set.
+
+Usage::
+
+    $ python3 benchmarks/bench_get_many.py [count]
+"""
+import sys
+import time
+
+import k2hash
+
+
+def _ops_per_sec(count, func):
+    start = time.perf_counter()
+    func()
+    return count / (time.perf_counter() - start)
+
+
+def main(count=100000):
+    """Runs the benchmark and prints ops/sec."""
+    db = k2hash.K2hash()
+    mapping = {"key{}".format(i): "val{}".format(i) for i in range(count)}
+    keys = list(mapping)
+
+    def set_loop():
+        for key, val in mapping.items():
+            db.set(key, val)
+
+    def get_loop():
+        for key in keys:
+            db.get(key)
+
+    results = [
+        ("set loop", _ops_per_sec(count, set_loop)),
+        ("set_many", _ops_per_sec(count, lambda: db.set_many(mapping))),
+        ("get loop", _ops_per_sec(count, get_loop)),
+        ("get_many", _ops_per_sec(count, lambda: db.get_many(keys))),
+    ]
+    for name, ops in results:
+        print("{:<10} {:>12.0f} ops/sec".format(name, ops))
+    db.close()
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
+
+#
+# Local variables:
+# tab-width: 4
+# c-basic-offset: 4
+# End:
+# vim600: expandtab sw=4 ts=4 fdm=marker
+# vim<600: expandtab sw=4 ts=4
+#
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+#
+# K2hash Python Driver under MIT License
+#
+# Copyright (c) 2022 Yahoo Japan Corporation
+#
+# For the full copyright and license information, please view
+# the license file that was distributed with this source code.
+#
+# AUTHOR:   Hirotaka Wakabayashi
+# CREATE:   Tue Feb 08 2022
+# REVISION:
+#
+"""
+Measures K2hash.get_subkeys and K2hash.get_attributes across subkey counts.
+
+Usage::
+
+    $ python3 benchmarks/bench_get_subkeys.py
+"""
+import time
+
+import k2hash
+
+
+def _msec_per_call(repeat, func):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) * 1000 / repeat
+
+
+def main(counts=(10, 100, 1000, 10000), repeat=20):
+    """Runs the benchmark and prints msec/call for each subkey count."""
+    print("{:>8} {:>14} {:>14} {:>14}".format("subkeys", "str", "bytes", "attributes"))
+    for count in counts:
+        db = k2hash.K2hash()
+        key = "parent"
+        db.set(key, "val")
+        db.set_subkeys(key, {"subkey{}".format(i): "subval" for i in range(count)})
+        db.set_attribute(key, "attrkey", "attrval")
+        print(
+            "{:>8} {:>11.3f} ms {:>11.3f} ms {:>11.3f} ms".format(
+                count,
+                _msec_per_call(repeat, lambda: db.get_subkeys(key)),
+                _msec_per_call(repeat, lambda: db.get_subkeys(key, use_str=False)),
+                _msec_per_call(repeat, lambda: db.get_attributes(key)),
+            )
+        )
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
+
+#
+# Local variables:
+# tab-width: 4
+# c-basic-offset: 4
+# End:
+# vim600: expandtab sw=4 ts=4 fdm=marker
+# vim<600: expandtab sw=4 ts=4
+#
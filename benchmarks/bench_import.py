@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+#
+# K2hash Python Driver under MIT License
+#
+# Copyright (c) 2022 Yahoo Japan Corporation
+#
+# For the full copyright and license information, please view
+# the license file that was distributed with this source code.
+#
+# AUTHOR:   Hirotaka Wakabayashi
+# CREATE:   Tue Feb 08 2022
+# REVISION:
+#
+"""
+Measures the time to import k2hash and to open the first K2hash in a new interpreter.
+
+Usage::
+
+    $ python3 benchmarks/bench_import.py [repeat]
+
+Set K2HASH_LIBRARY to measure the startup time without find_library.
+"""
+import os
+import statistics
+import subprocess
+import sys
+
+_SCRIPT = """
+import time
+start = time.perf_counter()
+import k2hash
+imported = time.perf_counter()
+k2hash.K2hash().close()
+opened = time.perf_counter()
+print(imported - start, opened - imported)
+"""
+
+
+def main(repeat=20):
+    """Runs the benchmark and prints the median times in msec."""
+    imports = []
+    opens = []
+    for _ in range(repeat):
+        out = subprocess.run(
+            [sys.executable, "-c", _SCRIPT],
+            check=True,
+            capture_output=True,
+            text=True,
+            env=os.environ.copy(),
+        ).stdout.split()
+        imports.append(float(out[0]) * 1000)
+        opens.append(float(out[1]) * 1000)
+    print("K2HASH_LIBRARY={}".format(os.environ.get("K2HASH_LIBRARY", "")))
+    print("import k2hash     {:>8.2f} ms".format(statistics.median(imports)))
+    print("first K2hash()    {:>8.2f} ms".format(statistics.median(opens)))
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20)
+
+#
+# Local variables:
+# tab-width: 4
+# c-basic-offset: 4
+# End:
+# vim600: expandtab sw=4 ts=4 fdm=marker
+# vim<600: expandtab sw=4 ts=4
+#
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+#
+# K2hash Python Driver under MIT License
+#
+# Copyright (c) 2022 Yahoo Japan Corporation
+#
+# For the full copyright and license information, please view
+# the license file that was distributed with this source code.
+#
+# AUTHOR:   Hirotaka Wakabayashi
+# CREATE:   Tue Feb 08 2022
+# REVISION:
+#
+"""
+Measures the read/write throughput of threads leasing handles of a K2hashPool,
+from 1 thread to size threads, and prints the pool statistics.
+
+Usage::
+
+    $ python3 benchmarks/bench_k2hashpool.py [count] [size] [path]
+"""
+import os
+import sys
+import tempfile
+import threading
+import time
+
+import k2hash
+
+
+def _run(pool, threads, count):
+    def work(offset):
+        with pool.lease() as db:
+            for i in range(offset, count, threads):
+                key = "key{}".format(i)
+                db.set(key, "val{}".format(i))
+                db.get(key)
+
+    workers = [threading.Thread(target=work, args=(i,)) for i in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return count * 2 / (time.perf_counter() - start)
+
+
+def main(count=200000, size=8, path=None):
+    """Runs the benchmark and prints ops/sec for each thread count."""
+    if path is None:
+        path = os.path.join(tempfile.mkdtemp(), "bench_k2hashpool.k2h")
+    with k2hash.K2hashPool(path, size=size) as pool:
+        threads = 1
+        while threads <= size:
+            print("threads={:<3} {:>12.0f} ops/sec".format(threads, _run(pool, threads, count)))
+            threads *= 2
+        print(pool.stats())
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:3]], *sys.argv[3:4])
+
+#
+# Local variables:
+# tab-width: 4
+# c-basic-offset: 4
+# End:
+# vim600: expandtab sw=4 ts=4 fdm=marker
+# vim<600: expandtab sw=4 ts=4
+#
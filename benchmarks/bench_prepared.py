@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+#
+# K2hash Python Driver under MIT License
+#
+# Copyright (c) 2022 Yahoo Japan Corporation
+#
+# For the full copyright and license information, please view
+# the license file that was distributed with this source code.
+#
+# AUTHOR:   Hirotaka Wakabayashi
+# CREATE:   Tue Feb 08 2022
+# REVISION:
+#
+"""
+Measures the per-op overhead of K2hash.set against K2hash.prepare_set, and of
+Queue.put/get with a password and expire_duration.
+
+Usage::
+
+    $ python3 benchmarks/bench_prepared.py [count]
+"""
+import sys
+import time
+
+import k2hash
+
+
+def _usec_per_op(count, func):
+    start = time.perf_counter()
+    func()
+    return (time.perf_counter() - start) * 1000000 / count
+
+
+def main(count=100000):
+    """Runs the benchmark and prints usec/op."""
+    password = "secretstring"
+    expire_duration = 3600
+    db = k2hash.K2hash()
+    keys = ["key{}".format(i) for i in range(count)]
+
+    def set_loop():
+        for key in keys:
+            db.set(key, "val", password=password, expire_duration=expire_duration)
+
+    def prepared_loop():
+        prepared_set = db.prepare_set(password=password, expire_duration=expire_duration)
+        for key in keys:
+            prepared_set(key, "val")
+
+    queue = k2hash.Queue(db, password=password, expire_duration=expire_duration)
+
+    def put_loop():
+        for key in keys:
+            queue.put(key)
+
+    def get_loop():
+        for _ in keys:
+            queue.get()
+
+    results = [
+        ("K2hash.set", _usec_per_op(count, set_loop)),
+        ("prepare_set", _usec_per_op(count, prepared_loop)),
+        ("Queue.put", _usec_per_op(count, put_loop)),
+        ("Queue.get", _usec_per_op(count, get_loop)),
+    ]
+    for name, usec in results:
+        print("{:<12} {:>8.2f} usec/op".format(name, usec))
+    queue.close()
+    db.close()
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
+
+#
+# Local variables:
+# tab-width: 4
+# c-basic-offset: 4
+# End:
+# vim600: expandtab sw=4 ts=4 fdm=marker
+# vim<600: expandtab sw=4 ts=4
+#
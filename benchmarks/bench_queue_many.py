@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+#
+# K2hash Python Driver under MIT License
+#
+# Copyright (c) 2022 Yahoo Japan Corporation
+#
+# For the full copyright and license information, please view
+# the license file that was distributed with this source code.
+#
+# AUTHOR:   Hirotaka Wakabayashi
+# CREATE:   Tue Feb 08 2022
+# REVISION:
+#
+"""
+Compares Queue.put_many/get_many with a loop of Queue.put/get.
+
+Usage::
+
+    $ python3 benchmarks/bench_queue_many.py [count] [batch_size]
+"""
+import sys
+import time
+
+import k2hash
+
+
+def _ops_per_sec(count, func):
+    start = time.perf_counter()
+    func()
+    return count / (time.perf_counter() - start)
+
+
+def main(count=100000, batch_size=1000):
+    """Runs the benchmark and prints ops/sec."""
+    db = k2hash.K2hash()
+    queue = k2hash.Queue(db)
+    objs = ["message{}".format(i) for i in range(count)]
+
+    def put_loop():
+        for obj in objs:
+            queue.put(obj)
+
+    def get_loop():
+        for _ in objs:
+            queue.get()
+
+    def put_many():
+        for i in range(0, count, batch_size):
+            queue.put_many(objs[i:i + batch_size])
+
+    def get_many():
+        for _ in range(0, count, batch_size):
+            queue.get_many(batch_size)
+
+    results = [
+        ("put loop", _ops_per_sec(count, put_loop)),
+        ("get loop", _ops_per_sec(count, get_loop)),
+        ("put_many", _ops_per_sec(count, put_many)),
+        ("get_many", _ops_per_sec(count, get_many)),
+    ]
+    for name, ops in results:
+        print("{:<10} {:>12.0f} ops/sec".format(name, ops))
+    queue.close()
+    db.close()
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:3]])
+
+#
+# Local variables:
+# tab-width: 4
+# c-basic-offset: 4
+# End:
+# vim600: expandtab sw=4 ts=4 fdm=marker
+# vim<600: expandtab sw=4 ts=4
+#
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+#
+# K2hash Python Driver under MIT License
+#
+# Copyright (c) 2022 Yahoo Japan Corporation
+#
+# For the full copyright and license information, please view
+# the license file that was distributed with this source code.
+#
+# AUTHOR:   Hirotaka Wakabayashi
+# CREATE:   Tue Feb 08 2022
+# REVISION:
+#
+"""
+Measures the producer to consumer wakeup latency of Queue.get(block=True), with
+the producer in a thread of the same process and in another process.
+
+Usage::
+
+    $ python3 benchmarks/bench_queue_wakeup.py [count] [path]
+"""
+import multiprocessing
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+import k2hash
+
+
+def _produce(path, count, interval):
+    db = k2hash.K2hash(path, readonly=False, removefile=False)
+    queue = k2hash.Queue(db)
+    for _ in range(count):
+        time.sleep(interval)
+        queue.put(repr(time.perf_counter()))
+    queue.close()
+    db.close()
+
+
+def _consume(queue, count):
+    latencies = []
+    for _ in range(count):
+        obj = queue.get(block=True, timeout=10)
+        latencies.append(time.perf_counter() - float(obj))
+    return latencies
+
+
+def _report(name, latencies):
+    latencies = sorted(latencies)
+    print(
+        "{:<8} median {:>8.1f} usec  p99 {:>8.1f} usec".format(
+            name,
+            statistics.median(latencies) * 1000000,
+            latencies[int(len(latencies) * 0.99) - 1] * 1000000,
+        )
+    )
+
+
+def main(count=1000, path=None, interval=0.002):
+    """Runs the benchmark and prints the wakeup latencies."""
+    if path is None:
+        path = os.path.join(tempfile.mkdtemp(), "bench_queue_wakeup.k2h")
+    db = k2hash.K2hash(path, readonly=False, removefile=False)
+    queue = k2hash.Queue(db)
+
+    # perf_counter is comparable between processes on Linux.
+    producer = threading.Thread(target=_produce, args=(path, count, interval))
+    producer.start()
+    _report("thread", _consume(queue, count))
+    producer.join()
+
+    producer = multiprocessing.Process(target=_produce, args=(path, count, interval))
+    producer.start()
+    _report("process", _consume(queue, count))
+    producer.join()
+    queue.close()
+    db.close()
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000, *sys.argv[2:3])
+
+#
+# Local variables:
+# tab-width: 4
+# c-basic-offset: 4
+# End:
+# vim600: expandtab sw=4 ts=4 fdm=marker
+# vim<600: expandtab sw=4 ts=4
+#
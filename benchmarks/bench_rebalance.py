@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+#
+# K2hash Python Driver under MIT License
+#
+# Copyright (c) 2022 Yahoo Japan Corporation
+#
+# For the full copyright and license information, please view
+# the license file that was distributed with this source code.
+#
+# AUTHOR:   Hirotaka Wakabayashi
+# CREATE:   Tue Feb 08 2022
+# REVISION:
+#
+"""
+Measures the migration throughput of ShardedK2hash.add_shard/remove_shard and the
+fraction of the key space they move, while a reader thread keeps reading.
+
+Usage::
+
+    $ python3 benchmarks/bench_rebalance.py [count] [shards]
+"""
+import os
+import random
+import sys
+import tempfile
+import threading
+
+import k2hash
+
+
+def _report(name, stats, misses):
+    print(
+        "{:<12} moved {:>8} keys ({:>5.1%} of all keys) skipped {} {:>10.0f} keys/sec, "
+        "{} missed reads".format(
+            name,
+            stats["moved"],
+            stats["moved_fraction"],
+            stats["skipped"],
+            stats["keys_per_sec"],
+            misses,
+        )
+    )
+
+
+def _with_reader(db, keys, func):
+    """Runs func while a thread reads random keys and counts the misses."""
+    stop = threading.Event()
+    misses = [0]
+
+    def read():
+        while not stop.is_set():
+            if not db.get(random.choice(keys)):
+                misses[0] += 1
+
+    reader = threading.Thread(target=read)
+    reader.start()
+    try:
+        stats = func()
+    finally:
+        stop.set()
+        reader.join()
+    return stats, misses[0]
+
+
+def main(count=200000, shards=4):
+    """Runs the benchmark and prints the migration statistics."""
+    tmpdir = tempfile.mkdtemp()
+    paths = [os.path.join(tmpdir, "bench{}.k2h".format(i)) for i in range(shards + 1)]
+    with k2hash.ShardedK2hash(paths[:shards], readonly=False) as db:
+        mapping = {"key{}".format(i): "val{}".format(i) for i in range(count)}
+        db.set_many(mapping)
+        keys = list(mapping)
+        stats, misses = _with_reader(db, keys, lambda: db.add_shard(paths[shards]))
+        _report("add_shard", stats, misses)
+        stats, misses = _with_reader(db, keys, lambda: db.remove_shard(paths[0]))
+        _report("remove_shard", stats, misses)
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:3]])
+
+#
+# Local variables:
+# tab-width: 4
+# c-basic-offset: 4
+# End:
+# vim600: expandtab sw=4 ts=4 fdm=marker
+# vim<600: expandtab sw=4 ts=4
+#
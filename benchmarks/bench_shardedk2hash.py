@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+#
+# K2hash Python Driver under MIT License
+#
+# Copyright (c) 2022 Yahoo Japan Corporation
+#
+# For the full copyright and license information, please view
+# the license file that was distributed with this source code.
+#
+# AUTHOR:   Hirotaka Wakabayashi
+# CREATE:   Tue Feb 08 2022
+# REVISION:
+#
+"""
+Measures the write and read throughput of ShardedK2hash against the shard count,
+with writer threads calling set and with set_many/get_many fanning out per shard.
+
+Usage::
+
+    $ python3 benchmarks/bench_shardedk2hash.py [count] [threads]
+"""
+import os
+import sys
+import tempfile
+import threading
+import time
+
+import k2hash
+
+
+def _ops_per_sec(count, func):
+    start = time.perf_counter()
+    func()
+    return count / (time.perf_counter() - start)
+
+
+def _bench(db, count, threads):
+    mapping = {"key{}".format(i): "val{}".format(i) for i in range(count)}
+    keys = list(mapping)
+
+    def set_threads():
+        def work(offset):
+            for key in keys[offset::threads]:
+                db.set(key, mapping[key])
+
+        workers = [threading.Thread(target=work, args=(i,)) for i in range(threads)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+    return [
+        ("set x{}".format(threads), _ops_per_sec(count, set_threads)),
+        ("set_many", _ops_per_sec(count, lambda: db.set_many(mapping))),
+        ("get_many", _ops_per_sec(count, lambda: db.get_many(keys))),
+    ]
+
+
+def main(count=200000, threads=8):
+    """Runs the benchmark and prints ops/sec for each shard count."""
+    tmpdir = tempfile.mkdtemp()
+    for shards in (1, 2, 4, 8):
+        paths = [
+            os.path.join(tmpdir, "bench{}_{}.k2h".format(shards, i)) for i in range(shards)
+        ]
+        with k2hash.ShardedK2hash(paths, readonly=False) as db:
+            for name, ops in _bench(db, count, threads):
+                print("shards={:<3} {:<10} {:>12.0f} ops/sec".format(shards, name, ops))
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:3]])
+
+#
+# Local variables:
+# tab-width: 4
+# c-basic-offset: 4
+# End:
+# vim600: expandtab sw=4 ts=4 fdm=marker
+# vim<600: expandtab sw=4 ts=4
+#
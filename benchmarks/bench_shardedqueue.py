@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+#
+# K2hash Python Driver under MIT License
+#
+# Copyright (c) 2022 Yahoo Japan Corporation
+#
+# For the full copyright and license information, please view
+# the license file that was distributed with this source code.
+#
+# AUTHOR:   Hirotaka Wakabayashi
+# CREATE:   Tue Feb 08 2022
+# REVISION:
+#
+"""
+Measures the throughput of ShardedQueue against the shard count, with producer
+and consumer processes sharing a k2hash file.
+
+Usage::
+
+    $ python3 benchmarks/bench_shardedqueue.py [count] [workers]
+"""
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+import k2hash
+
+
+def _produce(path, shards, count):
+    db = k2hash.K2hash(path, readonly=False, removefile=False)
+    queue = k2hash.ShardedQueue(db, shards=shards)
+    for i in range(0, count, 100):
+        queue.put_many("message{}".format(j) for j in range(i, min(i + 100, count)))
+    queue.close()
+    db.close()
+
+
+def _consume(path, shards, home, count, counter):
+    db = k2hash.K2hash(path, readonly=False, removefile=False)
+    queue = k2hash.ShardedQueue(db, shards=shards, home=home)
+    while True:
+        vals = queue.get_many(100, block=True, timeout=1)
+        if not vals:
+            break
+        with counter.get_lock():
+            counter.value += len(vals)
+            if counter.value >= count:
+                break
+    queue.close()
+    db.close()
+
+
+def _run(path, shards, count, workers):
+    counter = multiprocessing.Value("l", 0)
+    procs = [
+        multiprocessing.Process(target=_produce, args=(path, shards, count // workers))
+        for _ in range(workers)
+    ] + [
+        multiprocessing.Process(
+            target=_consume, args=(path, shards, i, count // workers * workers, counter)
+        )
+        for i in range(workers)
+    ]
+    start = time.perf_counter()
+    for proc in procs:
+        proc.start()
+    for proc in procs:
+        proc.join()
+    return counter.value / (time.perf_counter() - start)
+
+
+def main(count=200000, workers=4):
+    """Runs the benchmark and prints msgs/sec for each shard count."""
+    tmpdir = tempfile.mkdtemp()
+    for shards in (1, 2, 4, 8, 16):
+        path = os.path.join(tmpdir, "bench_shardedqueue{}.k2h".format(shards))
+        # creates the file before the workers open it.
+        k2hash.K2hash(path, readonly=False, removefile=False).close()
+        print(
+            "shards={:<3} workers={:<3} {:>12.0f} msgs/sec".format(
+                shards, workers, _run(path, shards, count, workers)
+            )
+        )
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:3]])
+
+#
+# Local variables:
+# tab-width: 4
+# c-basic-offset: 4
+# End:
+# vim600: expandtab sw=4 ts=4 fdm=marker
+# vim<600: expandtab sw=4 ts=4
+#
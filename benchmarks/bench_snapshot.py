@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+#
+# K2hash Python Driver under MIT License
+#
+# Copyright (c) 2022 Yahoo Japan Corporation
+#
+# For the full copyright and license information, please view
+# the license file that was distributed with this source code.
+#
+# AUTHOR:   Hirotaka Wakabayashi
+# CREATE:   Tue Feb 08 2022
+# REVISION:
+#
+"""
+Compares a snapshot written by K2hash.export_snapshot and read by SnapshotReader
+with the k2hash file opened by K2hash(flag=OpenFlag.READ). Prints the file sizes,
+the resident memory added by looking up every key and the lookup latency.
+
+Usage::
+
+    $ python3 benchmarks/bench_snapshot.py [count] [lookups] [dir]
+"""
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+import k2hash
+from k2hash import OpenFlag
+
+
+def _rss():
+    """Returns the resident set size of this process in bytes (Linux)."""
+    with open("/proc/self/statm", encoding="ascii") as file:
+        return int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+def _run(name, path, reader, keys, lookups):
+    before = _rss()
+    for key in keys:
+        reader.get(key)
+    touched = _rss() - before
+    latencies = []
+    for key in random.choices(keys, k=lookups):
+        start = time.perf_counter_ns()
+        reader.get(key)
+        latencies.append(time.perf_counter_ns() - start)
+    latencies.sort()
+    print(
+        "{:<9} file={:>8.1f}MiB rss+={:>8.1f}MiB mean={:>6.0f}ns p50={:>6}ns p99={:>6}ns".format(
+            name,
+            os.path.getsize(path) / 2**20,
+            touched / 2**20,
+            statistics.mean(latencies),
+            latencies[len(latencies) // 2],
+            latencies[len(latencies) * 99 // 100],
+        )
+    )
+
+
+def main(count=200000, lookups=100000, directory=None):
+    """Runs the benchmark and prints the footprint and latency of both formats."""
+    directory = directory or tempfile.mkdtemp()
+    k2h_path = os.path.join(directory, "bench_snapshot.k2h")
+    snap_path = os.path.join(directory, "bench_snapshot.snap")
+    keys = ["key{}".format(i) for i in range(count)]
+
+    db = k2hash.K2hash(k2h_path, readonly=False, removefile=False)
+    db.set_many({key: "val{}".format(i) for i, key in enumerate(keys)})
+    start = time.perf_counter()
+    db.export_snapshot(snap_path)
+    print("export    {:.2f} sec".format(time.perf_counter() - start))
+    db.close()
+
+    with k2hash.SnapshotReader(snap_path) as reader:
+        _run("snapshot", snap_path, reader, keys, lookups)
+    db = k2hash.K2hash(k2h_path, OpenFlag.READ)
+    _run("k2hash", k2h_path, db, keys, lookups)
+    db.close()
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:3]], *sys.argv[3:4])
+
+#
+# Local variables:
+# tab-width: 4
+# c-basic-offset: 4
+# End:
+# vim600: expandtab sw=4 ts=4 fdm=marker
+# vim<600: expandtab sw=4 ts=4
+#
@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+#
+# K2hash Python Driver under MIT License
+#
+# Copyright (c) 2022 Yahoo Japan Corporation
+#
+# For the full copyright and license information, please view
+# the license file that was distributed with this source code.
+#
+# AUTHOR:   Hirotaka Wakabayashi
+# CREATE:   Tue Feb 08 2022
+# REVISION:
+#
+"""
+Measures how K2hash.get, K2hashIterator and Queue.get scale with threads sharing
+one object, from 1 thread to max_threads threads. Run it with both a regular and
+a free-threaded (python3.13t) interpreter to compare the builds.
+
+Usage::
+
+    $ python3 benchmarks/bench_threads.py [count] [max_threads]
+    $ python3.13t benchmarks/bench_threads.py [count] [max_threads]
+"""
+import sys
+import threading
+import time
+
+import k2hash
+
+
+def _measure(threads, work):
+    barrier = threading.Barrier(threads + 1)
+
+    def run(offset):
+        barrier.wait()
+        work(offset, threads)
+
+    workers = [threading.Thread(target=run, args=(i,)) for i in range(threads)]
+    for worker in workers:
+        worker.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for worker in workers:
+        worker.join()
+    return time.perf_counter() - start
+
+
+def _bench_get(db, count, threads):
+    def work(offset, step):
+        for i in range(offset, count, step):
+            db.get("key{}".format(i))
+
+    return count / _measure(threads, work)
+
+
+def _bench_iterator(db, count, threads):
+    with db.get_iterator() as ki:
+
+        def work(offset, step):  # noqa: pylint: disable=unused-argument
+            while ki.next_batch(100):
+                pass
+
+        return count / _measure(threads, work)
+
+
+def _bench_queue(db, count, threads):
+    queue = k2hash.Queue(db, prefix="bench_threads")
+    queue.put_many(["val{}".format(i) for i in range(count)])
+
+    def work(offset, step):  # noqa: pylint: disable=unused-argument
+        while queue.get():
+            pass
+
+    rate = count / _measure(threads, work)
+    queue.close()
+    return rate
+
+
+def main(count=200000, max_threads=8):
+    """Runs the benchmarks and prints ops/sec and the speedup for each thread count."""
+    gil = getattr(sys, "_is_gil_enabled", lambda: True)()
+    print("python {} gil={}".format(sys.version.split()[0], "enabled" if gil else "disabled"))
+    db = k2hash.K2hash()
+    db.set_many({"key{}".format(i): "val{}".format(i) for i in range(count)})
+    for name, bench in (
+        ("get", _bench_get),
+        ("iterator", _bench_iterator),
+        ("queue", _bench_queue),
+    ):
+        base = None
+        threads = 1
+        while threads <= max_threads:
+            rate = bench(db, count, threads)
+            base = base or rate
+            print(
+                "{:<9} threads={:<3} {:>12.0f} ops/sec speedup={:.2f}".format(
+                    name, threads, rate, rate / base
+                )
+            )
+            threads *= 2
+    db.close()
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:3]])
+
+#
+# Local variables:
+# tab-width: 4
+# c-basic-offset: 4
+# End:
+# vim600: expandtab sw=4 ts=4 fdm=marker
+# vim<600: expandtab sw=4 ts=4
+#
@@ -18,9 +18,19 @@ from __future__ import absolute_import
 
 __all__ = [
     "K2hash",
+    "CachedK2hash",
+    "FilteredK2hash",
+    "ShardedK2hash",
+    "HashRing",
+    "K2hashPool",
+    "SnapshotReader",
+    "BloomFilter",
     "Queue",
     "BaseQueue",
     "KeyQueue",
+    "ShardedQueue",
+    "PriorityQueue",
+    "DelayQueue",
     "K2hashIterator",
     "LogLevel",
     "KeyPack",
@@ -33,7 +43,9 @@ __all__ = [
 
 import ctypes
 import logging
+import os
 import sys
+import threading
 from ctypes import (
     POINTER,
     Structure,
@@ -45,6 +57,7 @@ from ctypes import (
     c_ubyte,
     c_uint64,
     c_ulong,
+    c_void_p,
 )
 from ctypes.util import find_library
 from enum import Enum
@@ -151,379 +164,395 @@ class LogLevel(Enum):
 
 
 # Library handles
-_HANDLE: Dict[str, str] = {}
+_HANDLE: Dict[str, ctypes.CDLL] = {}
+_HANDLE_LOCK = threading.Lock()
+# libk2hash path set by configure()
+_LIBPATH: Optional[str] = None
+# sonames tried before falling back to find_library, which runs ldconfig or gcc.
+_K2HASH_SONAMES = ["libk2hash.so.1", "libk2hash.so"]
 
 
 # Initializes library handles and stores the result in the _HANDLE cache
 def _init_library_handle():
     global _HANDLE  # noqa: pylint: disable=global-statement
-    if _HANDLE:
+    handle = _HANDLE
+    if handle:
+        return handle
+
+    with _HANDLE_LOCK:
+        if not _HANDLE:
+            # Loads libc and libk2hash and ...
+            result = {}
+            result["c"] = _load_libc()
+            result["k2hash"] = _load_libk2hash()
+            _HANDLE = result
         return _HANDLE
 
-    # Loads libc and libk2hash and ...
-    result = {}
-    result["c"] = _load_libc()
-    result["k2hash"] = _load_libk2hash()
-    _HANDLE = result
-
-    return result
-
 
 def _load_libc():
-    ret = ctypes.cdll.LoadLibrary(find_library("c"))
+    # The global namespace of the process includes libc on POSIX systems, which
+    # saves a find_library call.
+    ret = ctypes.CDLL(None)
     # print("type(ret).{}".format(type(ret)))
     if ret is None:
         raise FileNotFoundError
-    return ret
 
+    # void free(void* ptr)
+    # c_void_p keeps 64bit addresses returned as int from being truncated.
+    ret.free.argtypes = [c_void_p]
+    ret.free.restype = None
+    return ret
 
-def _load_libk2hash():  # noqa: pylint: disable=too-many-statements
-    ret = ctypes.cdll.LoadLibrary(find_library("k2hash"))
-    if ret is None:
-        return None
 
-    # Defines prototypes for python code
+def _load_libk2hash():
+    libpath = _LIBPATH or os.environ.get("K2HASH_LIBRARY")
+    if libpath:
+        return _K2hashLibrary(libpath)
+    for soname in _K2HASH_SONAMES:
+        try:
+            return _K2hashLibrary(soname)
+        except OSError:
+            continue
+    libpath = find_library("k2hash")
+    if libpath is None:
+        raise FileNotFoundError("libk2hash should be installed or set K2HASH_LIBRARY")
+    return _K2hashLibrary(libpath)
+
+
+# Prototypes of libk2hash functions as name: (restype, argtypes), which are
+# bound when a function is used for the first time.
+_K2HASH_PROTOTYPES = {
     #
     # 4. find API
     #
     # k2h_find_h k2h_find_first(k2h_h handle)
-    ret.k2h_find_first.restype = c_uint64
-    ret.k2h_find_first.argtypes = [c_uint64]
+    "k2h_find_first": (c_uint64, [c_uint64]),
     # k2h_find_h k2h_find_first_str_subkey(k2h_h handle, const char* pkey)
-    ret.k2h_find_first_str_subkey.restype = c_uint64
-    ret.k2h_find_first_str_subkey.argtypes = [c_uint64, c_char_p]
+    "k2h_find_first_str_subkey": (c_uint64, [c_uint64, c_char_p]),
     # k2h_find_h k2h_find_next(k2h_find_h findhandle)
-    ret.k2h_find_next.restype = c_uint64
-    ret.k2h_find_next.argtypes = [c_uint64]
+    "k2h_find_next": (c_uint64, [c_uint64]),
     # bool k2h_find_get_key(k2h_find_h findhandle, unsigned char** ppkey, size_t* pkeylength)
-    ret.k2h_find_get_key.restype = c_uint64
-    ret.k2h_find_get_key.argtypes = [c_uint64, POINTER(c_char_p), POINTER(c_size_t)]
+    "k2h_find_get_key": (c_bool, [c_uint64, POINTER(POINTER(c_ubyte)), POINTER(c_size_t)]),
+    # bool k2h_find_get_value(k2h_find_h findhandle, unsigned char** ppval, size_t* pvallength)
+    "k2h_find_get_value": (c_bool, [c_uint64, POINTER(POINTER(c_ubyte)), POINTER(c_size_t)]),
+    # bool k2h_find_free(k2h_find_h findhandle)
+    "k2h_find_free": (c_bool, [c_uint64]),
     #
     # 3. keyqueue API
     #
     # k2h_keyq_h k2h_keyq_handle_str_prefix(k2h_h handle, bool is_fifo, const char* pref)
-    ret.k2h_keyq_handle_str_prefix.restype = c_uint64
-    ret.k2h_keyq_handle_str_prefix.argtypes = [c_uint64, c_bool, c_char_p]
+    "k2h_keyq_handle_str_prefix": (c_uint64, [c_uint64, c_bool, c_char_p]),
     # bool k2h_keyq_str_push_keyval(k2h_keyq_h keyqhandle, const char* pkey, const char* pval)
-    ret.k2h_keyq_str_push_keyval.restype = c_bool
-    ret.k2h_keyq_str_push_keyval.argtypes = [c_uint64, c_char_p, c_char_p]
+    "k2h_keyq_str_push_keyval": (c_bool, [c_uint64, c_char_p, c_char_p]),
     # bool k2h_keyq_str_push_keyval_wa(
     # k2h_keyq_h keyqhandle, const char* pkey, const char* pval, const char* encpass,
     # const time_t* expire)
-    ret.k2h_keyq_str_push_keyval_wa.restype = c_bool
-    ret.k2h_keyq_str_push_keyval_wa.argtypes = [
-        c_uint64,
-        c_char_p,
-        c_char_p,
-        c_char_p,
-        POINTER(c_long),
-    ]
+    "k2h_keyq_str_push_keyval_wa": (
+        c_bool,
+        [
+            c_uint64,
+            c_char_p,
+            c_char_p,
+            c_char_p,
+            POINTER(c_ulong),
+        ],
+    ),
     # bool k2h_keyq_dump(k2h_keyq_h qhandle, FILE* stream)
-    ret.k2h_keyq_dump.restype = c_bool
-    ret.k2h_keyq_dump.argtypes = [c_uint64, POINTER(FILE)]
+    "k2h_keyq_dump": (c_bool, [c_uint64, POINTER(FILE)]),
     # bool k2h_keyq_free(k2h_keyq_h qhandle)
-    ret.k2h_keyq_free.restype = c_bool
-    ret.k2h_keyq_free.argtypes = [c_uint64]
+    "k2h_keyq_free": (c_bool, [c_uint64]),
     # int k2h_keyq_count(k2h_keyq_h qhandle)
-    ret.k2h_keyq_count.restype = c_int
-    ret.k2h_keyq_count.argtypes = [c_uint64]
+    "k2h_keyq_count": (c_int, [c_uint64]),
     # bool k2h_keyq_str_read_keyval_wp(
     # k2h_keyq_h keyqhandle, char** ppkey, char** ppval, int pos, const char* encpass)
-    ret.k2h_keyq_str_read_wp.restype = c_bool
-    ret.k2h_keyq_str_read_keyval_wp.argtypes = [
-        c_uint64,
-        POINTER(c_char_p),
-        POINTER(c_char_p),
-        c_int,
-        c_char_p,
-    ]
+    "k2h_keyq_str_read_keyval_wp": (
+        c_bool,
+        [
+            c_uint64,
+            POINTER(c_char_p),
+            POINTER(c_char_p),
+            c_int,
+            c_char_p,
+        ],
+    ),
     # bool k2h_keyq_empty(k2h_keyq_h qhandle)
-    ret.k2h_keyq_empty.restype = c_bool
-    ret.k2h_keyq_empty.argtypes = [c_uint64]
+    "k2h_keyq_empty": (c_bool, [c_uint64]),
     # bool k2h_keyq_str_pop_keyval_wp(
     # k2h_keyq_h keyqhandle, char** ppkey, char** ppval, const char* encpass)
-    ret.k2h_keyq_str_pop_keyval_wp.restype = c_bool
-    ret.k2h_keyq_str_pop_keyval_wp.argtypes = [
-        c_uint64,
-        POINTER(c_char_p),
-        POINTER(c_char_p),
-        c_char_p,
-    ]
+    "k2h_keyq_str_pop_keyval_wp": (
+        c_bool,
+        [
+            c_uint64,
+            POINTER(c_char_p),
+            POINTER(c_char_p),
+            c_char_p,
+        ],
+    ),
     # bool k2h_keyq_remove(k2h_keyq_h qhandle, int count)
-    ret.k2h_keyq_remove.restype = c_bool
-    ret.k2h_keyq_remove.argtypes = [c_uint64, c_int]
+    "k2h_keyq_remove": (c_bool, [c_uint64, c_int]),
 
     #
     # 2. queue API
     #
     # k2h_q_h k2h_q_handle_str_prefix(k2h_h handle, bool is_fifo, const char* pref)
-    ret.k2h_q_handle_str_prefix.restype = c_uint64
-    ret.k2h_q_handle_str_prefix.argtypes = [c_uint64, c_bool, c_char_p]
+    "k2h_q_handle_str_prefix": (c_uint64, [c_uint64, c_bool, c_char_p]),
     # bool k2h_q_str_push_wa(
     #   k2h_q_h qhandle, const char* pdata, const PK2HATTRPCK pattrspck,
     #   int attrspckcnt, const char* encpass, const time_t* expire)
-    ret.k2h_q_str_push_wa.restype = c_bool
-    ret.k2h_q_str_push_wa.argtypes = [
-        c_uint64,
-        c_char_p,
-        POINTER(AttrPack),
-        c_int,
-        c_char_p,
-        POINTER(c_ulong),
-    ]
+    "k2h_q_str_push_wa": (
+        c_bool,
+        [
+            c_uint64,
+            c_char_p,
+            POINTER(AttrPack),
+            c_int,
+            c_char_p,
+            POINTER(c_ulong),
+        ],
+    ),
     # bool k2h_q_str_push(k2h_q_h qhandle, const char* pval)
-    ret.k2h_q_str_push.restype = c_bool
-    ret.k2h_q_str_push.argtypes = [c_uint64, c_char_p]
+    "k2h_q_str_push": (c_bool, [c_uint64, c_char_p]),
     # bool k2h_q_remove(k2h_q_h qhandle, int count)
-    ret.k2h_q_remove.restype = c_bool
-    ret.k2h_q_remove.argtypes = [c_uint64, c_int]
+    "k2h_q_remove": (c_bool, [c_uint64, c_int]),
     # bool k2h_q_free(k2h_q_h qhandle)
-    ret.k2h_q_free.restype = c_bool
-    ret.k2h_q_free.argtypes = [c_uint64]
+    "k2h_q_free": (c_bool, [c_uint64]),
     # int k2h_q_count(k2h_q_h qhandle)
-    ret.k2h_q_count.restype = c_int
-    ret.k2h_q_count.argtypes = [c_uint64]
+    "k2h_q_count": (c_int, [c_uint64]),
     # bool k2h_q_str_read_wp(k2h_q_h qhandle, char** ppdata, int pos, const char* encpass)
-    ret.k2h_q_read_wp.restype = c_bool
-    ret.k2h_q_read_wp.argtypes = [
-        c_uint64,
-        POINTER(c_char_p),
-        POINTER(c_size_t),
-        c_int,
-        c_char_p,
-    ]
+    "k2h_q_read_wp": (c_bool, [c_uint64, POINTER(c_char_p), POINTER(c_size_t), c_int, c_char_p]),
     # bool k2h_q_empty(k2h_q_h qhandle)
-    ret.k2h_q_empty.restype = c_bool
-    ret.k2h_q_empty.argtypes = [c_uint64]
+    "k2h_q_empty": (c_bool, [c_uint64]),
     # bool k2h_q_str_pop(k2h_q_h qhandle, char** ppval)
     # bool k2h_q_str_pop_wp(k2h_q_h qhandle, char** ppdata, const char* encpass)
-    ret.k2h_q_str_pop_wp.restype = c_bool
-    ret.k2h_q_str_pop_wp.argtypes = [c_uint64, POINTER(c_char_p), c_char_p]
+    "k2h_q_str_pop_wp": (c_bool, [c_uint64, POINTER(c_char_p), c_char_p]),
     # bool k2h_q_dump(k2h_q_h qhandle, FILE* stream)
-    ret.k2h_q_dump.restype = c_bool
-    ret.k2h_q_dump.argtypes = [c_uint64, POINTER(FILE)]
+    "k2h_q_dump": (c_bool, [c_uint64, POINTER(FILE)]),
 
     #
     # 1. k2hash API
     #
     # add attr crypt API
     # bool k2h_add_attr_crypt_pass(k2h_h handle, const char* pass, bool is_default_encrypt)
-    ret.k2h_add_attr_crypt_pass.argtypes = [c_uint64, c_char_p, c_bool]
-    ret.k2h_add_attr_crypt_pass.restype = c_bool
+    "k2h_add_attr_crypt_pass": (c_bool, [c_uint64, c_char_p, c_bool]),
 
     # add attr plugin API
     # bool k2h_add_attr_plugin_library(k2h_h handle, const char* libpath)
-    ret.k2h_add_attr_plugin_library.argtypes = [c_uint64, c_char_p]
-    ret.k2h_add_attr_plugin_library.restype = c_bool
+    "k2h_add_attr_plugin_library": (c_bool, [c_uint64, c_char_p]),
 
     # add attr API
     # bool k2h_add_str_attr(
     # k2h_h handle, const char* pkey, const char* pattrkey, const char* pattrval)
-    ret.k2h_add_str_attr.argtypes = [c_uint64, c_char_p, c_char_p, c_char_p]
-    ret.k2h_add_str_attr.restype = c_bool
+    "k2h_add_str_attr": (c_bool, [c_uint64, c_char_p, c_char_p, c_char_p]),
     # bool k2h_add_attr(
     # k2h_h handle, const unsigned char* pkey, size_t keylength, const unsigned char* pattrkey,
     # size_t attrkeylength, const unsigned char* pattrval, size_t attrvallength)
-    ret.k2h_add_attr.argtypes = [
-        c_uint64,
-        c_char_p,
-        c_size_t,
-        c_char_p,
-        c_size_t,
-        c_char_p,
-        c_size_t,
-    ]
-    ret.k2h_add_attr.restype = c_bool
+    "k2h_add_attr": (
+        c_bool,
+        [
+            c_uint64,
+            c_char_p,
+            c_size_t,
+            c_char_p,
+            c_size_t,
+            c_char_p,
+            c_size_t,
+        ],
+    ),
 
     # add subkey API
     # bool k2h_add_subkey(
     # k2h_h handle, const unsigned char* pkey, size_t keylength, const unsigned char* psubkey,
     # size_t skeylength, const unsigned char* pval, size_t vallength)
-    ret.k2h_add_subkey.argtypes = [
-        c_uint64,
-        c_char_p,
-        c_size_t,
-        c_char_p,
-        c_size_t,
-        c_char_p,
-        c_size_t,
-    ]
-    ret.k2h_add_subkey.restype = c_bool
+    "k2h_add_subkey": (
+        c_bool,
+        [
+            c_uint64,
+            c_char_p,
+            c_size_t,
+            c_char_p,
+            c_size_t,
+            c_char_p,
+            c_size_t,
+        ],
+    ),
     # bool k2h_add_subkey_wa(k2h_h handle, const unsigned char* pkey, size_t keylength,
     # const unsigned char* psubkey, size_t skeylength, const unsigned char* pval,
     # size_t vallength, const char* pass, const time_t* expire)
-    ret.k2h_add_subkey_wa.argtypes = [
-        c_uint64,
-        c_char_p,
-        c_size_t,
-        c_char_p,
-        c_size_t,
-        c_char_p,
-        c_size_t,
-        c_char_p,
-        POINTER(c_ulong),
-    ]
-    ret.k2h_add_subkey_wa.restype = c_bool
+    "k2h_add_subkey_wa": (
+        c_bool,
+        [
+            c_uint64,
+            c_char_p,
+            c_size_t,
+            c_char_p,
+            c_size_t,
+            c_char_p,
+            c_size_t,
+            c_char_p,
+            POINTER(c_ulong),
+        ],
+    ),
 
     # close API
     # bool k2h_close(k2h_h handle)
     # bool k2h_close_wait(k2h_h handle, long waitms)
-    ret.k2h_close_wait.argtypes = [c_uint64, c_long]
-    ret.k2h_close_wait.restype = c_bool
+    "k2h_close_wait": (c_bool, [c_uint64, c_long]),
 
     # create API
     # bool k2h_create(const char* filepath, int maskbitcnt, int cmaskbitcnt,
     # int maxelementcnt, size_t pagesize)
-    ret.k2h_create.argtypes = [c_char_p, c_int, c_int, c_int, c_size_t]
-    ret.k2h_create.restype = c_bool
+    "k2h_create": (c_bool, [c_char_p, c_int, c_int, c_int, c_size_t]),
 
     # disable tx API
     # bool k2h_disable_transaction(k2h_h handle)
-    ret.k2h_disable_transaction.argtypes = [c_uint64]
-    ret.k2h_disable_transaction.restype = c_bool
+    "k2h_disable_transaction": (c_bool, [c_uint64]),
 
     # dump API
     # bool k2h_dump_head(k2h_h handle, FILE* stream)
-    ret.k2h_dump_head.argtypes = [c_uint64, POINTER(FILE)]
-    ret.k2h_dump_head.restype = c_bool
+    "k2h_dump_head": (c_bool, [c_uint64, POINTER(FILE)]),
     # bool k2h_dump_keytable(k2h_h handle, FILE* stream)
-    ret.k2h_dump_keytable.argtypes = [c_uint64, POINTER(FILE)]
-    ret.k2h_dump_keytable.restype = c_bool
+    "k2h_dump_keytable": (c_bool, [c_uint64, POINTER(FILE)]),
     # bool k2h_dump_full_keytable(k2h_h handle, FILE* stream)
-    ret.k2h_dump_full_keytable.argtypes = [c_uint64, POINTER(FILE)]
-    ret.k2h_dump_full_keytable.restype = c_bool
+    "k2h_dump_full_keytable": (c_bool, [c_uint64, POINTER(FILE)]),
     # bool k2h_dump_elementtable(k2h_h handle, FILE* stream)
-    ret.k2h_dump_elementtable.argtypes = [c_uint64, POINTER(FILE)]
-    ret.k2h_dump_elementtable.restype = c_bool
+    "k2h_dump_elementtable": (c_bool, [c_uint64, POINTER(FILE)]),
     # bool k2h_dump_full(k2h_h handle, FILE* stream)
-    ret.k2h_dump_full.argtypes = [c_uint64, POINTER(FILE)]
-    ret.k2h_dump_full.restype = c_bool
+    "k2h_dump_full": (c_bool, [c_uint64, POINTER(FILE)]),
 
     # get value API
     # char* k2h_get_str_direct_value_wp(k2h_h handle, const char* pkey, const char* pass)
-    ret.k2h_get_str_direct_value_wp.argtypes = [c_uint64, c_char_p, c_char_p]
-    ret.k2h_get_str_direct_value_wp.restype = c_char_p
+    # c_void_p keeps the malloc'ed pointer so that the caller can free it.
+    "k2h_get_str_direct_value_wp": (c_void_p, [c_uint64, c_char_p, c_char_p]),
+    # bool k2h_get_value_wp(k2h_h handle, const unsigned char* pkey, size_t keylength,
+    # unsigned char** ppval, size_t* pvallength, const char* pass)
+    "k2h_get_value_wp": (
+        c_bool,
+        [
+            c_uint64,
+            c_char_p,
+            c_size_t,
+            POINTER(POINTER(c_ubyte)),
+            POINTER(c_size_t),
+            c_char_p,
+        ],
+    ),
+    # bool k2h_get_value_np(k2h_h handle, const unsigned char* pkey, size_t keylength,
+    # unsigned char** ppval, size_t* pvallength)
+    "k2h_get_value_np": (
+        c_bool,
+        [
+            c_uint64,
+            c_char_p,
+            c_size_t,
+            POINTER(POINTER(c_ubyte)),
+            POINTER(c_size_t),
+        ],
+    ),
 
     # get attrs API
     # PK2HATTRPCK k2h_get_direct_attrs(k2h_h handle, const unsigned char* pkey,
     # size_t keylength, int* pattrspckcnt)
-    ret.k2h_get_direct_attrs.argtypes = [c_uint64, c_char_p, c_size_t, POINTER(c_int)]
-    ret.k2h_get_direct_attrs.restype = POINTER(AttrPack)
+    "k2h_get_direct_attrs": (POINTER(AttrPack), [c_uint64, c_char_p, c_size_t, POINTER(c_int)]),
 
     # get subkeys API
     # PK2HKEYPCK k2h_get_direct_subkeys(k2h_h handle, const unsigned char* pkey,
     # size_t keylength, int* pskeypckcnt)
-    ret.k2h_get_direct_subkeys.argtypes = [c_uint64, c_char_p, c_size_t, POINTER(c_int)]
-    ret.k2h_get_direct_subkeys.restype = POINTER(KeyPack)
+    "k2h_get_direct_subkeys": (POINTER(KeyPack), [c_uint64, c_char_p, c_size_t, POINTER(c_int)]),
+
+    # free pack API
+    # bool k2h_free_keypack(PK2HKEYPCK pkeys, int keycnt)
+    "k2h_free_keypack": (c_bool, [POINTER(KeyPack), c_int]),
+    # bool k2h_free_attrpack(PK2HATTRPCK pattrs, int attrcnt)
+    "k2h_free_attrpack": (c_bool, [POINTER(AttrPack), c_int]),
 
     # get transaction API
     # int k2h_get_transaction_archive_fd(k2h_h handle)
-    ret.k2h_get_transaction_archive_fd.argtypes = [c_uint64]
-    ret.k2h_get_transaction_archive_fd.restype = c_int
+    "k2h_get_transaction_archive_fd": (c_int, [c_uint64]),
 
     # int k2h_get_transaction_thread_pool(void)
-    ret.k2h_get_transaction_thread_pool.argtypes = []
-    ret.k2h_get_transaction_thread_pool.restype = c_int
+    "k2h_get_transaction_thread_pool": (c_int, []),
 
     # load archive API
     # bool k2h_load_archive(k2h_h handle, const char* filepath, bool errskip)
-    ret.k2h_load_archive.argtypes = [c_uint64, c_char_p, c_bool]
-    ret.k2h_load_archive.restype = c_bool
+    "k2h_load_archive": (c_bool, [c_uint64, c_char_p, c_bool]),
 
     # open API
-    ret.k2h_open_mem.restype = c_uint64
-    ret.k2h_open_mem.argtypes = [c_int, c_int, c_int, c_int]
-    ret.k2h_open.restype = c_uint64
-    ret.k2h_open.argtypes = [
-        c_char_p,
-        c_bool,
-        c_bool,
-        c_bool,
-        c_int,
-        c_int,
-        c_int,
-        c_int,
-    ]
-    ret.k2h_open_rw.restype = c_uint64
-    ret.k2h_open_rw.argtypes = [c_char_p, c_bool, c_int, c_int, c_int, c_int]
-    ret.k2h_open_ro.restype = c_uint64
-    ret.k2h_open_ro.argtypes = [c_char_p, c_bool, c_int, c_int, c_int, c_int]
-    ret.k2h_open_tempfile.restype = c_uint64
-    ret.k2h_open_tempfile.argtypes = [c_char_p, c_bool, c_int, c_int, c_int, c_int]
+    "k2h_open_mem": (c_uint64, [c_int, c_int, c_int, c_int]),
+    "k2h_open": (c_uint64, [c_char_p, c_bool, c_bool, c_bool, c_int, c_int, c_int, c_int]),
+    "k2h_open_rw": (c_uint64, [c_char_p, c_bool, c_int, c_int, c_int, c_int]),
+    "k2h_open_ro": (c_uint64, [c_char_p, c_bool, c_int, c_int, c_int, c_int]),
+    "k2h_open_tempfile": (c_uint64, [c_char_p, c_bool, c_int, c_int, c_int, c_int]),
 
     # print API
     # bool k2h_print_attr_version(k2h_h handle, FILE* stream)
-    ret.k2h_print_attr_version.argtypes = [c_uint64, POINTER(FILE)]
-    ret.k2h_print_attr_version.restype = c_bool
+    "k2h_print_attr_version": (c_bool, [c_uint64, POINTER(FILE)]),
     #
     # bool k2h_print_attr_information(k2h_h handle, FILE* stream)
-    ret.k2h_print_attr_information.argtypes = [c_uint64, POINTER(FILE)]
-    ret.k2h_print_attr_information.restype = c_bool
+    "k2h_print_attr_information": (c_bool, [c_uint64, POINTER(FILE)]),
     #
     # bool k2h_print_state(k2h_h handle, FILE* stream)
-    ret.k2h_print_state.argtypes = [c_uint64, POINTER(FILE)]
-    ret.k2h_print_state.restype = c_bool
+    "k2h_print_state": (c_bool, [c_uint64, POINTER(FILE)]),
 
     # void k2h_print_version(FILE* stream)
-    ret.k2h_print_version.argtypes = [POINTER(FILE)]
-    ret.k2h_print_version.restype = None
+    "k2h_print_version": (None, [POINTER(FILE)]),
 
     # put_archive API
     # bool k2h_put_archive(k2h_h handle, const char* filepath, bool errskip)
-    ret.k2h_put_archive.argtypes = [c_uint64, c_char_p, c_bool]
-    ret.k2h_put_archive.restype = c_bool
+    "k2h_put_archive": (c_bool, [c_uint64, c_char_p, c_bool]),
 
     # remove API
     # bool k2h_remove_str_all(k2h_h handle, const char* pkey)
-    ret.k2h_remove_str_all.argtypes = [c_uint64, c_char_p]
-    ret.k2h_remove_str_all.restype = c_bool
+    "k2h_remove_str_all": (c_bool, [c_uint64, c_char_p]),
     # bool k2h_remove_str(k2h_h handle, const char* pkey)
-    ret.k2h_remove_str.argtypes = [c_uint64, c_char_p]
-    ret.k2h_remove_str.restype = c_bool
+    "k2h_remove_str": (c_bool, [c_uint64, c_char_p]),
 
     # rename API
     # bool k2h_rename_str(k2h_h handle, const char* pkey, const char* pnewkey)
-    ret.k2h_rename_str.argtypes = [c_uint64, c_char_p, c_char_p]
-    ret.k2h_rename_str.restype = c_bool
+    "k2h_rename_str": (c_bool, [c_uint64, c_char_p, c_char_p]),
 
     # remove subkey API
     # bool k2h_remove_str_subkey(k2h_h handle, const char* pkey, const char* psubkey)
-    ret.k2h_remove_str_subkey.argtypes = [c_uint64, c_char_p, c_char_p]
-    ret.k2h_remove_str_subkey.restype = c_bool
+    "k2h_remove_str_subkey": (c_bool, [c_uint64, c_char_p, c_char_p]),
 
     # set_common_attr
     # bool k2h_set_common_attr(k2h_h handle, const bool* is_mtime, const bool* is_defenc,
     # const char* passfile, const bool* is_history, const c_ulong* expire)
-    ret.k2h_set_common_attr.argtypes = [
-        c_uint64,
-        POINTER(c_bool),
-        POINTER(c_bool),
-        c_char_p,
-        POINTER(c_bool),
-        POINTER(c_ulong),
-    ]
-    ret.k2h_set_common_attr.restype = c_bool
+    "k2h_set_common_attr": (
+        c_bool,
+        [
+            c_uint64,
+            POINTER(c_bool),
+            POINTER(c_bool),
+            c_char_p,
+            POINTER(c_bool),
+            POINTER(c_ulong),
+        ],
+    ),
 
     # set loglevel
-    ret.k2h_set_debug_level_silent.argtypes = []
-    ret.k2h_set_debug_level_silent.restype = None
-    ret.k2h_set_debug_level_error.argtypes = []
-    ret.k2h_set_debug_level_error.restype = None
-    ret.k2h_set_debug_level_warning.argtypes = []
-    ret.k2h_set_debug_level_warning.restype = None
-    ret.k2h_set_debug_level_message.argtypes = []
-    ret.k2h_set_debug_level_message.restype = None
+    "k2h_set_debug_level_silent": (None, []),
+    "k2h_set_debug_level_error": (None, []),
+    "k2h_set_debug_level_warning": (None, []),
+    "k2h_set_debug_level_message": (None, []),
+    "k2h_set_debug_level_dump": (None, []),
     # set value
     # bool k2h_set_str_value_wa(k2h_h handle, const char* pkey, const char* pval, const char* pass,
     # const time_t* expire)
-    ret.k2h_set_str_value_wa.argtypes = [
-        c_uint64,
-        c_char_p,
-        c_char_p,
-        c_char_p,
-        POINTER(c_ulong),
-    ]
-    ret.k2h_set_str_value_wa.restype = c_bool
+    "k2h_set_str_value_wa": (c_bool, [c_uint64, c_char_p, c_char_p, c_char_p, POINTER(c_ulong)]),
+    # bool k2h_set_value_wa(k2h_h handle, const unsigned char* pkey, size_t keylength,
+    # const unsigned char* pval, size_t vallength, const char* pass, const time_t* expire)
+    "k2h_set_value_wa": (
+        c_bool,
+        [
+            c_uint64,
+            c_char_p,
+            c_size_t,
+            c_void_p,
+            c_size_t,
+            c_char_p,
+            POINTER(c_ulong),
+        ],
+    ),
 
     # set transaction
     # bool k2h_transaction_param(k2h_h handle, bool enable, const char* transfile,
@@ -531,27 +560,40 @@ def _load_libk2hash():  # noqa: pylint: disable=too-many-statements
     # bool k2h_transaction_param_we(k2h_h handle, bool enable, const char* transfile,
     # const unsigned char* pprefix, size_t prefixlen, const unsigned char* pparam, size_t paramlen,
     # const time_t* expire)
-    ret.k2h_transaction_param_we.argtypes = [
-        c_uint64,
+    "k2h_transaction_param_we": (
         c_bool,
-        c_char_p,
-        c_char_p,
-        c_size_t,
-        c_char_p,
-        c_size_t,
-        POINTER(c_ulong),
-    ]
-    ret.k2h_transaction_param_we.restype = c_bool
+        [
+            c_uint64,
+            c_bool,
+            c_char_p,
+            c_char_p,
+            c_size_t,
+            c_char_p,
+            c_size_t,
+            POINTER(c_ulong),
+        ],
+    ),
 
     # bool k2h_set_transaction_thread_pool(int count)
-    ret.k2h_set_transaction_thread_pool.argtypes = [c_int]
-    ret.k2h_set_transaction_thread_pool.restype = c_int
+    "k2h_set_transaction_thread_pool": (c_int, [c_int]),
+}
 
-    return ret
 
+class _K2hashLibrary(ctypes.CDLL):  # noqa: pylint:disable=too-few-public-methods
+    """libk2hash handle that binds a prototype when a function is used for the first time"""
 
-# Initializes library handlers
-_init_library_handle()
+    def __getattr__(self, name):
+        # The function is cached as an attribute like CDLL.__getattr__ does, so
+        # this is called about once per function. The prototype is bound before
+        # the function is cached, so other threads never call an unbound one.
+        if name.startswith("__") and name.endswith("__"):
+            raise AttributeError(name)
+        func = self[name]
+        prototype = _K2HASH_PROTOTYPES.get(name)
+        if prototype:
+            func.restype, func.argtypes = prototype
+        setattr(self, name, func)
+        return func
 
 
 # Gets library handler
@@ -560,6 +602,23 @@ def get_library_handle():
     return _init_library_handle()
 
 
+# Sets the libk2hash path used when the library is loaded.
+def configure(libpath=None):
+    """Configures the path of libk2hash.
+
+    libpath has precedence over the K2HASH_LIBRARY environment variable. Handles
+    loaded before calling this function are kept by the objects using them.
+    """
+    global _HANDLE, _LIBPATH  # noqa: pylint: disable=global-statement
+    if libpath is not None and not isinstance(libpath, str):
+        raise TypeError("libpath should be a str object")
+    if libpath is not None and not libpath:
+        raise ValueError("libpath should not be empty")
+    with _HANDLE_LOCK:
+        _LIBPATH = libpath
+        _HANDLE = {}
+
+
 # Configures logger using std logging. default puts to stderr in warning.
 def _configure_logger(log_file="sys.stderr", log_level=logging.WARNING):
     LOG.setLevel(log_level)
@@ -592,6 +651,17 @@ def set_log_level(log_level):
     LOG.setLevel(log_level)
 
 
+# Replaces the library lock in a forked child, where a thread of the parent that
+# held it does not exist. The loaded libraries stay valid in the child.
+def _after_fork_in_child():
+    global _HANDLE_LOCK  # noqa: pylint: disable=global-statement
+    _HANDLE_LOCK = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
+
+
 # Initializes loggging handlers
 _configure_logger()
 
@@ -599,9 +669,19 @@ _configure_logger()
 # import k2hash modules
 #
 from k2hash.k2hash import K2hash, K2hashIterator  # noqa: pylint:disable=wrong-import-position
+from k2hash.snapshot import SnapshotReader  # noqa: pylint:disable=wrong-import-position
+from k2hash.cachedk2hash import CachedK2hash  # noqa: pylint:disable=wrong-import-position
+from k2hash.bloomfilter import BloomFilter  # noqa: pylint:disable=wrong-import-position
+from k2hash.filteredk2hash import FilteredK2hash  # noqa: pylint:disable=wrong-import-position
+from k2hash.k2hashpool import K2hashPool  # noqa: pylint:disable=wrong-import-position
+from k2hash.hashring import HashRing  # noqa: pylint:disable=wrong-import-position
+from k2hash.shardedk2hash import ShardedK2hash  # noqa: pylint:disable=wrong-import-position
 from k2hash.basequeue import BaseQueue  # noqa: pylint:disable=wrong-import-position
 from k2hash.keyqueue import KeyQueue  # noqa: pylint:disable=wrong-import-position
 from k2hash.queue import Queue  # noqa: pylint:disable=wrong-import-position
+from k2hash.shardedqueue import ShardedQueue  # noqa: pylint:disable=wrong-import-position
+from k2hash.priorityqueue import PriorityQueue  # noqa: pylint:disable=wrong-import-position
+from k2hash.delayqueue import DelayQueue  # noqa: pylint:disable=wrong-import-position
 
 #
 # Local variables:
@@ -0,0 +1,489 @@
+# -*- coding: utf-8 -*-
+#
+# K2hash Python Driver under MIT License
+#
+# Copyright (c) 2022 Yahoo Japan Corporation
+#
+# For the full copyright and license information, please view
+# the license file that was distributed with this source code.
+#
+# AUTHOR:   Hirotaka Wakabayashi
+# CREATE:   Tue Feb 08 2022
+# REVISION:
+#
+"""
+asyncio interface of K2hash, Queue and KeyQueue.
+
+libk2hash calls run in a bounded thread pool, because ctypes releases the GIL
+during a foreign call. Concurrent get, set and queue calls made in the same
+event loop iteration are batched into one call of the pool.
+
+Example::
+
+    async with AsyncK2hash(k2hash.K2hash()) as db:
+        await db.set("key", "val")
+        print(await db.get("key"))
+        async for key in db:
+            print(key)
+"""
+from __future__ import absolute_import
+
+import abc
+import asyncio
+import functools
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from k2hash import BaseQueue, K2hash, KeyQueue, Queue, TimeUnit
+
+LOG = logging.getLogger(__name__)
+
+
+class _Batcher:  # noqa: pylint: disable=too-few-public-methods
+    """
+    _Batcher class collects the calls submitted in an event loop iteration and
+    runs the calls of each group as one call of func(group, args), which returns
+    the list of results.
+
+    If restore is given, the non-empty results of calls cancelled while their
+    batch ran are passed to restore(results) in the executor, so a destructive
+    call such as a pop does not lose them.
+    """
+
+    def __init__(self, run, func, max_batch, restore=None):
+        """
+        Initialize a new _Batcher instnace.
+        """
+        self._run = run
+        self._func = func
+        self._max_batch = max_batch
+        self._restore = restore
+        self._pending = {}
+        self._scheduled = False
+        # restore calls running in the executor.
+        self._restoring = set()
+
+    async def submit(self, group, arg):
+        """Submits a call and returns its result."""
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+        self._pending.setdefault(group, []).append((arg, fut))
+        if not self._scheduled:
+            self._scheduled = True
+            loop.call_soon(self._flush)
+        return await fut
+
+    def _flush(self):
+        """Runs the pending calls."""
+        pending, self._pending = self._pending, {}
+        self._scheduled = False
+        for group, calls in pending.items():
+            for i in range(0, len(calls), self._max_batch):
+                chunk = calls[i:i + self._max_batch]
+                task = asyncio.ensure_future(
+                    self._run(self._func, group, [arg for arg, _ in chunk])
+                )
+                task.add_done_callback(functools.partial(self._resolve, chunk))
+
+    def _resolve(self, calls, task):
+        """Sets the results of a batch to the futures of its calls."""
+        if task.cancelled() or task.exception() is not None:
+            for _, fut in calls:
+                if not fut.done():
+                    if task.cancelled():
+                        fut.cancel()
+                    else:
+                        fut.set_exception(task.exception())
+            return
+        unclaimed = []
+        for (_, fut), res in zip(calls, task.result()):
+            if not fut.done():
+                fut.set_result(res)
+            elif res:
+                unclaimed.append(res)
+        if unclaimed and self._restore is not None:
+            restoring = asyncio.ensure_future(self._run(self._restore, unclaimed))
+            self._restoring.add(restoring)
+            restoring.add_done_callback(self._restored)
+
+    def _restored(self, task):
+        """Logs a restore call that failed."""
+        self._restoring.discard(task)
+        if task.cancelled():
+            LOG.error("restoring unclaimed results was cancelled")
+        elif task.exception() is not None:
+            LOG.error("restoring unclaimed results failed: %s", task.exception())
+
+    async def wait_restored(self):
+        """Waits for the restore calls running in the executor."""
+        if self._restoring:
+            await asyncio.gather(*self._restoring, return_exceptions=True)
+
+
+class _AsyncBase(abc.ABC):
+    """
+    _AsyncBase class owns the executor that runs libk2hash calls.
+    """
+
+    def __init__(self, executor=None, max_workers=4, max_batch=256):
+        """
+        Initialize a new _AsyncBase instnace.
+
+        executor is shared with the caller, who should shut it down. Otherwise a
+        ThreadPoolExecutor of max_workers threads is created and shut down by close.
+        """
+        if executor is not None and not isinstance(executor, ThreadPoolExecutor):
+            raise TypeError("executor should be a ThreadPoolExecutor object")
+        if not isinstance(max_workers, int):
+            raise TypeError("max_workers should be a int object")
+        if max_workers <= 0:
+            raise ValueError("max_workers should be positive")
+        if not isinstance(max_batch, int):
+            raise TypeError("max_batch should be a int object")
+        if max_batch <= 0:
+            raise ValueError("max_batch should be positive")
+        self._own_executor = executor is None
+        self._executor = executor or ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="k2hash-aio"
+        )
+        self._max_batch = max_batch
+
+    async def run(self, func, *args, **kwargs):
+        """Runs func(*args, **kwargs) in the executor and returns the result."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor, functools.partial(func, *args, **kwargs)
+        )
+
+    def _shutdown(self):
+        """Shuts the executor down if this object created it."""
+        if self._own_executor:
+            self._executor.shutdown(wait=False)
+
+    async def __aenter__(self):
+        """Implements the async context manager interface"""
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        """Implements the async context manager interface"""
+        await self.close()
+
+    async def close(self):
+        """Closes the executor if this object created it."""
+        self._shutdown()
+
+
+class AsyncK2hash(_AsyncBase):
+    """
+    AsyncK2hash class provides coroutines that call the methods of a K2hash.
+    """
+
+    def __init__(self, k2h, executor=None, max_workers=4, max_batch=256):
+        """
+        Initialize a new AsyncK2hash instnace.
+        """
+        if not isinstance(k2h, K2hash):
+            raise TypeError("k2h should be a K2hash object")
+        super().__init__(executor, max_workers, max_batch)
+        self._k2h = k2h
+        self._get_batcher = _Batcher(self.run, self._get_batch, max_batch)
+        self._set_batcher = _Batcher(self.run, self._set_batch, max_batch)
+
+    @property
+    def k2hash(self):
+        """Returns the wrapped K2hash."""
+        return self._k2h
+
+    def _get_batch(self, password, keys):
+        """Gets the values of keys in a call of the executor."""
+        return self._k2h.get_many(keys, password)
+
+    def _set_batch(self, group, pairs):
+        """Sets the key/value pairs in a call of the executor."""
+        password, expire_duration, time_unit = group
+        res = self._k2h.set_many(dict(pairs), password, expire_duration, time_unit)
+        return [res] * len(pairs)
+
+    async def get(self, key, password=None):
+        """Gets the value of key."""
+        if not isinstance(key, str):
+            raise TypeError("key should currently be a str object")
+        if not key:
+            raise ValueError("key should not be empty")
+        return await self._get_batcher.submit(password, key)
+
+    async def set(  # noqa: pylint: disable=too-many-arguments,too-many-positional-arguments
+        self, key, val, password=None, expire_duration=None, time_unit=TimeUnit.SECONDS
+    ):
+        """Sets a key/value pair."""
+        if not isinstance(key, str):
+            raise TypeError("key should currently be a str object")
+        if not key:
+            raise ValueError("key should not be empty")
+        if not isinstance(val, str):
+            raise TypeError("val should currently be a str object")
+        return await self._set_batcher.submit(
+            (password, expire_duration, time_unit), (key, val)
+        )
+
+    async def get_many(self, keys, password=None):
+        """Gets the values of keys."""
+        return await self.run(self._k2h.get_many, keys, password)
+
+    async def set_many(
+        self, mapping, password=None, expire_duration=None, time_unit=TimeUnit.SECONDS
+    ):
+        """Sets key/value pairs in mapping."""
+        return await self.run(
+            self._k2h.set_many, mapping, password, expire_duration, time_unit
+        )
+
+    async def exists(self, key, password=None):
+        """Returns True if the key exists."""
+        return await self.run(self._k2h.exists, key, password)
+
+    async def remove(self, key, remove_all_subkeys=False):
+        """Removes a key."""
+        return await self.run(self._k2h.remove, key, remove_all_subkeys)
+
+    async def get_subkeys(self, key, use_str=True):
+        """Gets subkeys of a key."""
+        return await self.run(self._k2h.get_subkeys, key, use_str)
+
+    async def get_attributes(self, key, use_str=True):
+        """Gets attributes of a key."""
+        return await self.run(self._k2h.get_attributes, key, use_str)
+
+    async def scan(  # noqa: pylint: disable=too-many-arguments,too-many-positional-arguments
+        self,
+        batch_size=1000,
+        with_values=True,
+        with_attrs=False,
+        use_str=True,
+        start_after=None,
+    ):
+        """Yields lists of at most batch_size items like K2hash.scan."""
+        try:
+            iterator = await self.run(self._k2h.get_iterator, None, start_after)
+        except RuntimeError:
+            # no keys in the k2hash.
+            return
+        try:
+            while True:
+                batch = await self.run(
+                    iterator.next_batch, batch_size, with_values, with_attrs, use_str
+                )
+                if not batch:
+                    break
+                yield batch
+        finally:
+            iterator.close()
+
+    async def __aiter__(self):
+        """Yields all keys."""
+        async for batch in self.scan(with_values=False):
+            for key, _ in batch:
+                yield key
+
+    async def close(self):
+        """Closes the k2hash and the executor."""
+        try:
+            return await self.run(self._k2h.close)
+        finally:
+            await super().close()
+
+
+class _AsyncQueueBase(_AsyncBase):
+    """
+    _AsyncQueueBase class provides blocking gets and batched pops of a queue.
+    """
+
+    def __init__(self, queue, executor=None, max_workers=4, max_batch=256):
+        """
+        Initialize a new _AsyncQueueBase instnace.
+        """
+        if not isinstance(queue, BaseQueue):
+            raise TypeError("queue should be a BaseQueue object")
+        super().__init__(executor, max_workers, max_batch)
+        self._queue = queue
+        self._get_batcher = _Batcher(self.run, self._get_batch, max_batch, self._restore)
+        self._puts = 0
+        # created in the event loop on first use.
+        self._put_cond = None
+
+    @property
+    def queue(self):
+        """Returns the wrapped queue."""
+        return self._queue
+
+    @abc.abstractmethod
+    def _get_batch(self, group, args):
+        """Pops at most len(args) objects, padding the result with empty objects."""
+
+    @abc.abstractmethod
+    def _restore(self, objs):
+        """Pushes back objs popped for gets cancelled while their batch ran."""
+
+    def _condition(self):
+        """Returns the Condition notified by puts of this object."""
+        if self._put_cond is None:
+            self._put_cond = asyncio.Condition()
+        return self._put_cond
+
+    async def _notify(self):
+        """Wakes the coroutines blocked in get of this object."""
+        self._puts += 1
+        cond = self._condition()
+        async with cond:
+            cond.notify_all()
+
+    async def get(self, block=False, timeout=None):
+        """
+        Finds and gets a object from the head of this queue.
+
+        If block is True, waits at most timeout seconds for an object. Puts by
+        this object wake the waiter up at once. Other puts are found by polling
+        like Queue.get. If the get is cancelled after its object was popped, the
+        object is pushed back into the tail of this queue.
+        """
+        if not isinstance(block, bool):
+            raise TypeError("block should be a boolean object")
+        if timeout is not None and not isinstance(timeout, (int, float)):
+            raise TypeError("timeout should be a int or float object")
+        if timeout is not None and timeout < 0:
+            raise ValueError("timeout should not be negative")
+        loop = asyncio.get_running_loop()
+        deadline = None if timeout is None else loop.time() + timeout
+        interval = BaseQueue.POLL_INTERVAL_MIN
+        while True:
+            puts = self._puts
+            obj = await self._get_batcher.submit(None, None)
+            if obj or not block:
+                return obj
+            wait = interval
+            if deadline is not None:
+                wait = min(wait, deadline - loop.time())
+                if wait <= 0:
+                    return obj
+            if puts == self._puts:
+                cond = self._condition()
+                async with cond:
+                    try:
+                        await asyncio.wait_for(cond.wait(), wait)
+                    except asyncio.TimeoutError:
+                        interval = min(interval * 2, BaseQueue.POLL_INTERVAL_MAX)
+
+    async def qsize(self):
+        """Returns the number of queue."""
+        return await self.run(self._queue.qsize)
+
+    async def empty(self):
+        """Returns true if, and only if, queue size is 0."""
+        return await self.run(self._queue.empty)
+
+    async def remove(self, count=1, callback=None):
+        """Removes at most count objects from the head of this queue."""
+        return await self.run(self._queue.remove, count, callback)
+
+    async def clear(self):
+        """Removes all of the elements from this queue."""
+        return await self.run(self._queue.clear)
+
+    async def close(self):
+        """Frees the queue handle and closes the executor."""
+        try:
+            await self._get_batcher.wait_restored()
+            return await self.run(self._queue.close)
+        finally:
+            await super().close()
+
+
+class AsyncQueue(_AsyncQueueBase):
+    """
+    AsyncQueue class provides coroutines that call the methods of a Queue.
+    """
+
+    def __init__(self, queue, executor=None, max_workers=4, max_batch=256):
+        """
+        Initialize a new AsyncQueue instnace.
+        """
+        if not isinstance(queue, Queue):
+            raise TypeError("queue should be a Queue object")
+        super().__init__(queue, executor, max_workers, max_batch)
+        self._put_batcher = _Batcher(self.run, self._put_batch, max_batch)
+
+    def _get_batch(self, group, args):  # noqa: pylint: disable=unused-argument
+        """Pops at most len(args) objects, padding the result with ""."""
+        vals = self._queue.get_many(len(args))
+        return vals + [""] * (len(args) - len(vals))
+
+    def _restore(self, objs):
+        """Pushes objs back into the tail of this queue."""
+        count = self._queue.put_many(objs)
+        if count != len(objs):
+            LOG.error("%s of %s popped objects were not pushed back", len(objs) - count, len(objs))
+
+    def _put_batch(self, group, objs):  # noqa: pylint: disable=unused-argument
+        """Pushes objs and returns whether each of them was pushed."""
+        count = self._queue.put_many(objs)
+        return [True] * count + [False] * (len(objs) - count)
+
+    async def put(self, obj, attrs=None):
+        """Inserts an element into the tail of this queue."""
+        if isinstance(obj, str) and obj and not attrs:
+            res = await self._put_batcher.submit(None, obj)
+        else:
+            res = await self.run(self._queue.put, obj, attrs)
+        await self._notify()
+        return res
+
+    async def put_many(self, objs, attrs=None):
+        """Inserts elements into the tail of this queue and returns the number of them."""
+        res = await self.run(self._queue.put_many, objs, attrs)
+        await self._notify()
+        return res
+
+    async def get_many(self, max_items):
+        """Finds and gets at most max_items objects from the head of this queue."""
+        return await self.run(self._queue.get_many, max_items)
+
+
+class AsyncKeyQueue(_AsyncQueueBase):
+    """
+    AsyncKeyQueue class provides coroutines that call the methods of a KeyQueue.
+    """
+
+    def __init__(self, queue, executor=None, max_workers=4, max_batch=256):
+        """
+        Initialize a new AsyncKeyQueue instnace.
+        """
+        if not isinstance(queue, KeyQueue):
+            raise TypeError("queue should be a KeyQueue object")
+        super().__init__(queue, executor, max_workers, max_batch)
+
+    def _get_batch(self, group, args):  # noqa: pylint: disable=unused-argument
+        """Pops at most len(args) objects, padding the result with {}."""
+        vals = self._queue.remove(len(args))
+        return vals + [{}] * (len(args) - len(vals))
+
+    def _restore(self, objs):
+        """Pushes the key/value pairs of objs back into the tail of this queue."""
+        for obj in objs:
+            if not self._queue.put(obj):
+                LOG.error("popped %s was not pushed back", obj)
+
+    async def put(self, obj):
+        """Inserts key/value pairs of obj into the tail of this queue."""
+        res = await self.run(self._queue.put, obj)
+        await self._notify()
+        return res
+
+
+#
+# Local variables:
+# tab-width: 4
+# c-basic-offset: 4
+# End:
+# vim600: expandtab sw=4 ts=4 fdm=marker
+# vim<600: expandtab sw=4 ts=4
+#
@@ -14,18 +14,44 @@
 """K2hash Python Driver under MIT License"""
 from __future__ import absolute_import
 
+import json
 import logging
+import os
+import threading
+import time
+import weakref
+from ctypes import c_char_p, c_uint64, pointer
 
 from k2hash import K2hash
 
 LOG = logging.getLogger(__name__)
 
+# (class name, k2hash handle, prefix) -> Condition shared by queues in this process
+_CONDITIONS = weakref.WeakValueDictionary()
+_CONDITIONS_LOCK = threading.Lock()
+# queues of this process, whose handles are opened again in a child process after fork.
+_QUEUES = weakref.WeakSet()
+
+
+def _queue_condition(key):
+    """Returns the Condition notified by puts to the queue of key."""
+    with _CONDITIONS_LOCK:
+        cond = _CONDITIONS.get(key)
+        if cond is None:
+            cond = threading.Condition()
+            _CONDITIONS[key] = cond
+        return cond
+
 
 class BaseQueue:  # noqa: pylint: disable=too-many-instance-attributes
     """
     Baseueue class provides methods to handle key/value pairs in k2hash hash database.
     """
 
+    # bounds of the interval to poll a queue that other processes may push to.
+    POLL_INTERVAL_MIN = 0.0005
+    POLL_INTERVAL_MAX = 0.05
+
     def __init__(  # noqa: pylint: disable=too-many-arguments,too-many-positional-arguments
         self, k2h, fifo=True, prefix=None, password=None, expire_duration=None
     ):
@@ -34,6 +60,7 @@ class BaseQueue:  # noqa: pylint: disable=too-many-instance-attributes
         """
         if not isinstance(k2h, K2hash):
             raise TypeError("k2h should be a K2hash object")
+        self._k2h = k2h
         self._k2h_handle = k2h.handle
         self._libc = k2h.libc
         self._libk2hash = k2h.libk2hash
@@ -52,15 +79,107 @@ class BaseQueue:  # noqa: pylint: disable=too-many-instance-attributes
         if expire_duration and expire_duration <= 0:
             raise ValueError("expire_duration should not be positive")
         self._expire_duration = expire_duration
+        # ctypes arguments are built once because they are the same for every call.
+        self._c_password = c_char_p(password.encode()) if password else None
+        self._c_expire = pointer(c_uint64(expire_duration)) if expire_duration else None
 
         # initializes self._handle, which should be set in subclasses
         self._handle = K2hash.K2H_INVALID_HANDLE
+        self._cond = _queue_condition((self.__class__.__name__, self._k2h_handle, prefix))
+        _QUEUES.add(self)
 
     @property
     def handle(self):
         """Returns a Queue handle."""
         return self._handle
 
+    def _open_handle(self):
+        """Returns a new queue handle, which subclasses with a handle should open."""
+        return K2hash.K2H_INVALID_HANDLE
+
+    def _reopen(self):
+        """
+        Opens the queue handle again in a forked child on the reopened K2hash.
+
+        The inherited queue handle is dropped without being freed, and the
+        Condition is replaced because a thread of the parent may have held it.
+        """
+        if self._handle != K2hash.K2H_INVALID_HANDLE and self._k2h_handle != self._k2h.handle:
+            self._k2h_handle = self._k2h.handle
+            try:
+                self._handle = self._open_handle()
+            except RuntimeError:
+                LOG.error("unable to reopen the queue of %s after fork", self._prefix)
+                self._handle = K2hash.K2H_INVALID_HANDLE
+        self._cond = _queue_condition(
+            (self.__class__.__name__, self._k2h_handle, self._prefix)
+        )
+
+    def _notify(self, count=1):
+        """Wakes up to count consumers blocked in get of this process."""
+        with self._cond:
+            self._cond.notify(count)
+
+    def _wait_for(self, pop, block=False, timeout=None, prepare=None):
+        """
+        Returns pop(), waiting until it returns an object if block is True.
+
+        Puts in this process wake the waiter up at once. Puts by other processes
+        are found by polling at an interval that doubles from POLL_INTERVAL_MIN up
+        to POLL_INTERVAL_MAX while the queue stays empty. prepare is called before
+        every pop without the lock held, so it may put and notify.
+        """
+        if not isinstance(block, bool):
+            raise TypeError("block should be a boolean object")
+        if timeout is not None and not isinstance(timeout, (int, float)):
+            raise TypeError("timeout should be a int or float object")
+        if timeout is not None and timeout < 0:
+            raise ValueError("timeout should not be negative")
+        if prepare is not None:
+            prepare()
+        obj = pop()
+        if obj or not block:
+            return obj
+
+        deadline = None if timeout is None else time.monotonic() + timeout
+        interval = self.POLL_INTERVAL_MIN
+        while True:
+            if prepare is not None:
+                prepare()
+            # pops again with the lock held, so a put can not notify in between.
+            with self._cond:
+                obj = pop()
+                if obj:
+                    return obj
+                wait = interval
+                if deadline is not None:
+                    wait = min(wait, deadline - time.monotonic())
+                    if wait <= 0:
+                        return obj
+                self._cond.wait(wait)
+            interval = min(interval * 2, self.POLL_INTERVAL_MAX)
+
+    @staticmethod
+    def _drain(items, callback=None):
+        """
+        Returns removed items as a list, or passes them to callback and returns the count.
+
+        callback is a callable or a file object, to which every item is written as
+        a JSON line.
+        """
+        if callback is None:
+            return list(items)
+        if not callable(callback) and not hasattr(callback, "write"):
+            raise TypeError("callback should be a callable or file object")
+        count = 0
+        for item in items:
+            if callable(callback):
+                callback(item)
+            else:
+                callback.write(json.dumps(item) + "\n")
+            count += 1
+        return count
+
     def __repr__(self):
         """Returns full of members as a string."""
         attrs = []
@@ -80,6 +199,19 @@ class BaseQueue:  # noqa: pylint: disable=too-many-instance-attributes
             values = ", ".join(["%s=%s" % i for i in attrs])  # noqa: pylint:disable=consider-using-f-string
         return f"<_{self.__class__.__name__} " + values + ">"
 
+def _after_fork_in_child():
+    """Fixes up the queues inherited by a forked child."""
+    global _CONDITIONS_LOCK  # noqa: pylint: disable=global-statement
+    _CONDITIONS_LOCK = threading.Lock()
+    _CONDITIONS.clear()
+    for queue in list(_QUEUES):
+        queue._reopen()  # noqa: pylint: disable=protected-access
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
+
+
 #
 # Local variables:
 # tab-width: 4
@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+#
+# K2hash Python Driver under MIT License
+#
+# Copyright (c) 2022 Yahoo Japan Corporation
+#
+# For the full copyright and license information, please view
+# the license file that was distributed with this source code.
+#
+# AUTHOR:   Hirotaka Wakabayashi
+# CREATE:   Tue Feb 08 2022
+# REVISION:
+#
+"""K2hash Python Driver under MIT License"""
+from __future__ import absolute_import
+
+import hashlib
+import logging
+import math
+import threading
+
+LOG = logging.getLogger(__name__)
+
+
+class BloomFilter:
+    """
+    BloomFilter class answers whether a key is definitely absent from a set of keys.
+
+    A key that was added is always reported as present. A key that was not added
+    is reported as present with a probability of about false_positive_rate as
+    long as no more than capacity keys are added.
+    """
+
+    def __init__(self, capacity=100000, false_positive_rate=0.01):
+        """
+        Initialize a new BloomFilter instnace.
+        """
+        if not isinstance(capacity, int):
+            raise TypeError("capacity should be a int object")
+        if capacity <= 0:
+            raise ValueError("capacity should be positive")
+        if not isinstance(false_positive_rate, float):
+            raise TypeError("false_positive_rate should be a float object")
+        if not 0.0 < false_positive_rate < 1.0:
+            raise ValueError("false_positive_rate should be between 0 and 1")
+        self._capacity = capacity
+        self._false_positive_rate = false_positive_rate
+        # m = -n * ln(p) / ln(2)^2, k = m / n * ln(2)
+        self._num_bits = max(
+            8, math.ceil(-capacity * math.log(false_positive_rate) / (math.log(2) ** 2))
+        )
+        self._num_hashes = max(1, round(self._num_bits / capacity * math.log(2)))
+        self._bits = bytearray((self._num_bits + 7) // 8)
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def _positions(self, key):
+        """Returns the bit positions of a key by double hashing."""
+        if isinstance(key, str):
+            key = key.encode()
+        digest = hashlib.blake2b(key, digest_size=16).digest()
+        hash1 = int.from_bytes(digest[:8], "little")
+        hash2 = int.from_bytes(digest[8:], "little") | 1
+        return [(hash1 + i * hash2) % self._num_bits for i in range(self._num_hashes)]
+
+    def add(self, key):
+        """Adds a str or bytes key."""
+        positions = self._positions(key)
+        with self._lock:
+            for pos in positions:
+                self._bits[pos >> 3] |= 1 << (pos & 7)
+            self._count += 1
+        if self._count == self._capacity + 1:
+            LOG.warning("BloomFilter exceeds the capacity %s", self._capacity)
+
+    def __contains__(self, key):
+        """Returns False if the key was definitely not added."""
+        bits = self._bits
+        return all(bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+
+    def clear(self):
+        """Removes all keys."""
+        with self._lock:
+            self._bits = bytearray(len(self._bits))
+            self._count = 0
+
+    @property
+    def capacity(self):
+        """Returns the number of keys the filter is sized for."""
+        return self._capacity
+
+    @property
+    def count(self):
+        """Returns the number of added keys including duplicates."""
+        return self._count
+
+    @property
+    def false_positive_rate(self):
+        """Returns the false positive rate at capacity."""
+        return self._false_positive_rate
+
+    @property
+    def num_hashes(self):
+        """Returns the number of hash functions."""
+        return self._num_hashes
+
+    @property
+    def nbytes(self):
+        """Returns the size of the bit array in bytes."""
+        return len(self._bits)
+
+    def __repr__(self):
+        """Returns full of members as a string."""
+        return (
+            f"<_{self.__class__.__name__} capacity={self._capacity}, "
+            f"false_positive_rate={self._false_positive_rate}, count={self._count}, "
+            f"num_hashes={self._num_hashes}, nbytes={len(self._bits)}>"
+        )
+
+
+#
+# Local variables:
+# tab-width: 4
+# c-basic-offset: 4
+# End:
+# vim600: expandtab sw=4 ts=4 fdm=marker
+# vim<600: expandtab sw=4 ts=4
+#
@@ -0,0 +1,396 @@
+# -*- coding: utf-8 -*-
+#
+# K2hash Python Driver under MIT License
+#
+# Copyright (c) 2022 Yahoo Japan Corporation
+#
+# For the full copyright and license information, please view
+# the license file that was distributed with this source code.
+#
+# AUTHOR:   Hirotaka Wakabayashi
+# CREATE:   Tue Feb 08 2022
+# REVISION:
+#
+"""K2hash Python Driver under MIT License"""
+from __future__ import absolute_import
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from k2hash import K2hash, TimeUnit
+
+LOG = logging.getLogger(__name__)
+
+_SECONDS_PER_UNIT = {
+    TimeUnit.DAYS: 86400,
+    TimeUnit.HOURS: 3600,
+    TimeUnit.MINUTES: 60,
+    TimeUnit.SECONDS: 1,
+    TimeUnit.MILLISECONDS: 0.001,
+}
+
+
+def _to_seconds(expire_duration, time_unit):
+    """Returns expire_duration in time_unit as seconds, or None."""
+    if not expire_duration:
+        return None
+    return expire_duration * _SECONDS_PER_UNIT.get(time_unit, 1)
+
+
+class CachedK2hash(K2hash):
+    """
+    CachedK2hash class keeps recently read values in a bounded LRU cache in front of K2hash.get.
+
+    The cache is invalidated by set, remove, rename and the subkey methods of this
+    object. Writes by other processes are not seen until an entry is evicted or
+    expires, so cache_ttl should be set if the file is shared. The expirations
+    of the values set by this object are remembered, so a value read back from
+    the k2hash is not cached longer than it lives in the file. Expirations of
+    values set by other processes are unknown and only bounded by cache_ttl.
+    """
+
+    def __init__(self, *args, cache_size=1024, cache_ttl=None, **kwargs):
+        """
+        Initialize a new CachedK2hash instnace.
+
+        cache_size is the maximum number of cached keys. cache_ttl is the maximum
+        lifetime in seconds of an entry whose expiration is unknown.
+        """
+        if not isinstance(cache_size, int):
+            raise TypeError("cache_size should be a int object")
+        if cache_size <= 0:
+            raise ValueError("cache_size should be positive")
+        if cache_ttl is not None and not isinstance(cache_ttl, (int, float)):
+            raise TypeError("cache_ttl should be a int or float object")
+        if cache_ttl is not None and cache_ttl <= 0:
+            raise ValueError("cache_ttl should be positive")
+        self._cache_size = cache_size
+        self._cache_ttl = cache_ttl
+        # key -> (password, value, deadline)
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+        # key -> monotonic time when the value set by this object expires in the file
+        self._expiries = {}
+        # key -> number of writes by this object, which a read-through compares
+        # with the count before its read. The epoch changes when they are dropped.
+        self._versions = {}
+        self._epoch = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._common_expire_duration = None
+        super().__init__(*args, **kwargs)
+
+    def _reopen(self):
+        """Opens the k2h file again in a forked child and replaces the cache lock."""
+        super()._reopen()
+        self._cache_lock = threading.Lock()
+
+    def _deadline(self, key, expire_duration):
+        """Returns the monotonic time when an entry should be dropped.
+
+        expire_duration is in seconds.
+        """
+        now = time.monotonic()
+        deadlines = [
+            now + ttl
+            for ttl in (expire_duration, self._common_expire_duration, self._cache_ttl)
+            if ttl
+        ]
+        if key in self._expiries:
+            deadlines.append(self._expiries[key])
+        if not deadlines:
+            return None
+        return min(deadlines)
+
+    def _remember_expiry(self, keys, expire_duration, res):
+        """
+        Remembers when the values of keys expire in the file.
+
+        expire_duration is in seconds. A failed set keeps the expirations,
+        because the old values may still be in the file.
+        """
+        if not expire_duration and not res:
+            return
+        with self._cache_lock:
+            if expire_duration:
+                deadline = time.monotonic() + expire_duration
+                for key in keys:
+                    self._expiries[key] = deadline
+            else:
+                for key in keys:
+                    self._expiries.pop(key, None)
+            if len(self._expiries) > 2 * self._cache_size:
+                now = time.monotonic()
+                self._expiries = {
+                    key: deadline for key, deadline in self._expiries.items() if deadline > now
+                }
+
+    def _bump(self, keys):
+        """Counts a write of keys. Called with the cache lock held."""
+        if len(self._versions) > 2 * self._cache_size:
+            self._versions.clear()
+            self._epoch += 1
+        for key in keys:
+            self._versions[key] = self._versions.get(key, 0) + 1
+
+    def _read_versions(self, keys):
+        """Returns the versions of keys to pass to _cache_put after reading them."""
+        with self._cache_lock:
+            return [(self._epoch, self._versions.get(key, 0)) for key in keys]
+
+    def _cache_put(self, key, password, val, expire_duration=None, version=None):
+        """
+        Stores a value and evicts the least recently used entries.
+
+        A value read from the k2hash is given the version of key before the read,
+        and is not stored if this object has written key since. Otherwise the
+        value is written by this object. expire_duration is in seconds.
+        """
+        with self._cache_lock:
+            if version is None:
+                self._bump([key])
+            elif version != (self._epoch, self._versions.get(key, 0)):
+                return
+            self._cache[key] = (password, val, self._deadline(key, expire_duration))
+            self._cache.move_to_end(key)
+            while len(self._cache) > self._cache_size:
+                self._cache.popitem(last=False)
+                self._evictions += 1
+
+    def _cache_get(self, key, password):
+        """Returns a cached value or None."""
+        with self._cache_lock:
+            entry = self._cache.get(key)
+            if entry is not None:
+                cached_password, val, deadline = entry
+                if deadline is not None and deadline <= time.monotonic():
+                    del self._cache[key]
+                elif cached_password == password:
+                    self._cache.move_to_end(key)
+                    self._hits += 1
+                    return val
+            self._misses += 1
+            return None
+
+    def _cache_invalidate(self, *keys, forget=False):
+        """Drops entries of keys, and their expirations if forget is True."""
+        with self._cache_lock:
+            self._bump(keys)
+            for key in keys:
+                self._cache.pop(key, None)
+                if forget:
+                    self._expiries.pop(key, None)
+
+    def cache_clear(self):
+        """Drops all cached entries."""
+        with self._cache_lock:
+            self._cache.clear()
+            # entries being read through are not stored either.
+            self._versions.clear()
+            self._epoch += 1
+
+    def cache_info(self):
+        """Returns the cache counters as a dict."""
+        with self._cache_lock:
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+                "size": len(self._cache),
+                "maxsize": self._cache_size,
+            }
+
+    def get(self, key, password=None):
+        """Gets the value from the cache or the k2hash."""
+        if not isinstance(key, str) or not key:
+            return super().get(key, password)
+        val = self._cache_get(key, password)
+        if val is not None:
+            return val
+        (version,) = self._read_versions([key])
+        val = super().get(key, password)
+        # misses are not cached because other processes may set the key.
+        if val:
+            self._cache_put(key, password, val, version=version)
+        return val
+
+    def get_many(self, keys, password=None):
+        """Gets the values of keys from the cache or the k2hash."""
+        if not isinstance(keys, list):
+            return super().get_many(keys, password)
+        vals = [
+            self._cache_get(key, password) if isinstance(key, str) and key else None
+            for key in keys
+        ]
+        missing = [i for i, val in enumerate(vals) if val is None]
+        if missing:
+            versions = self._read_versions(
+                [keys[i] if isinstance(keys[i], str) else "" for i in missing]
+            )
+            fetched = super().get_many([keys[i] for i in missing], password)
+            for i, version, val in zip(missing, versions, fetched):
+                vals[i] = val
+                if val:
+                    self._cache_put(keys[i], password, val, version=version)
+        return vals
+
+    def set(  # noqa: pylint: disable=too-many-arguments,too-many-positional-arguments
+        self, key, val, password=None, expire_duration=None, time_unit=TimeUnit.SECONDS
+    ):
+        """Sets a key/value pair and caches the value."""
+        res = super().set(key, val, password, expire_duration, time_unit)
+        seconds = _to_seconds(expire_duration, time_unit)
+        self._remember_expiry([key], seconds, res)
+        if res:
+            self._cache_put(key, password, val, seconds)
+        else:
+            self._cache_invalidate(key)
+        return res
+
+    def set_many(
+        self, mapping, password=None, expire_duration=None, time_unit=TimeUnit.SECONDS
+    ):
+        """Sets key/value pairs in mapping and drops their cached entries."""
+        res = False
+        try:
+            res = super().set_many(mapping, password, expire_duration, time_unit)
+            return res
+        finally:
+            if isinstance(mapping, dict):
+                self._remember_expiry(
+                    list(mapping), _to_seconds(expire_duration, time_unit), res
+                )
+                self._cache_invalidate(*mapping)
+
+    def prepare_set(self, password=None, expire_duration=None, time_unit=TimeUnit.SECONDS):
+        """Returns a function that sets a key/value pair and caches the value."""
+        prepared_set = super().prepare_set(password, expire_duration, time_unit)
+        seconds = _to_seconds(expire_duration, time_unit)
+
+        def cached_set(key, val):
+            res = prepared_set(key, val)
+            self._remember_expiry([key], seconds, res)
+            if res:
+                self._cache_put(key, password, val, seconds)
+            else:
+                self._cache_invalidate(key)
+            return res
+
+        return cached_set
+
+    def set_bytes(  # noqa: pylint: disable=too-many-arguments,too-many-positional-arguments
+        self, key, val, password=None, expire_duration=None, time_unit=TimeUnit.SECONDS
+    ):
+        """Sets a key/binary value pair and drops the cached entry."""
+        res = False
+        try:
+            res = super().set_bytes(key, val, password, expire_duration, time_unit)
+            return res
+        finally:
+            self._remember_expiry([key], _to_seconds(expire_duration, time_unit), res)
+            self._cache_invalidate(key)
+
+    def add_subkey(  # noqa: pylint: disable=too-many-arguments,too-many-positional-arguments
+        self,
+        key,
+        subkey,
+        subval,
+        password=None,
+        expire_duration=None,
+        time_unit=TimeUnit.SECONDS,
+    ):
+        """Adds subkeys to a key/value pair and drops the cached entries."""
+        res = False
+        try:
+            res = super().add_subkey(key, subkey, subval, password, expire_duration, time_unit)
+            return res
+        finally:
+            self._remember_expiry([subkey], _to_seconds(expire_duration, time_unit), res)
+            self._cache_invalidate(key, subkey)
+
+    def set_subkeys(  # noqa: pylint: disable=too-many-arguments,too-many-positional-arguments
+        self,
+        key,
+        subkeys,
+        password=None,
+        expire_duration=None,
+        time_unit=TimeUnit.SECONDS,
+    ):
+        """Sets subkeys and drops the cached entries."""
+        res = False
+        try:
+            res = super().set_subkeys(key, subkeys, password, expire_duration, time_unit)
+            return res
+        finally:
+            if isinstance(subkeys, dict):
+                self._remember_expiry(
+                    list(subkeys), _to_seconds(expire_duration, time_unit), res
+                )
+            self._cache_invalidate(key, *(subkeys if isinstance(subkeys, dict) else ()))
+
+    def remove(self, key, remove_all_subkeys=False):
+        """Removes a key and drops the cached entries."""
+        subkeys = []
+        if (
+            remove_all_subkeys is True
+            and isinstance(key, str)
+            and key
+            and (self._cache or self._expiries)
+        ):
+            subkeys = self.get_subkeys(key)
+        res = False
+        try:
+            res = super().remove(key, remove_all_subkeys)
+            return res
+        finally:
+            self._cache_invalidate(key, *subkeys, forget=bool(res))
+
+    def remove_subkeys(self, key, subkeys):
+        """Removes subkeys from the key and drops the cached entries."""
+        try:
+            return super().remove_subkeys(key, subkeys)
+        finally:
+            self._cache_invalidate(key, *(subkeys if isinstance(subkeys, list) else ()))
+
+    def rename(self, key, newkey):
+        """Renames a key with a new key and drops the cached entries."""
+        res = False
+        try:
+            res = super().rename(key, newkey)
+            return res
+        finally:
+            with self._cache_lock:
+                if res and key in self._expiries:
+                    # the value keeps its expiration under the new key.
+                    self._expiries[newkey] = self._expiries.pop(key)
+                elif res:
+                    self._expiries.pop(newkey, None)
+            self._cache_invalidate(key, newkey)
+
+    def load_from_file(self, path, is_skip_error=True):
+        """Loads data from a file and drops all cached entries."""
+        try:
+            return super().load_from_file(path, is_skip_error)
+        finally:
+            self.cache_clear()
+
+    def set_expiration_duration(self, expire_duration, time_unit=TimeUnit.SECONDS):
+        """Sets the duration to expire a value, which also bounds cached entries."""
+        res = super().set_expiration_duration(expire_duration, time_unit)
+        if res:
+            self._common_expire_duration = _to_seconds(expire_duration, time_unit)
+            self.cache_clear()
+        return res
+
+
+#
+# Local variables:
+# tab-width: 4
+# c-basic-offset: 4
+# End:
+# vim600: expandtab sw=4 ts=4 fdm=marker
+# vim<600: expandtab sw=4 ts=4
+#
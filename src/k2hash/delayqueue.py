@@ -0,0 +1,269 @@
+# -*- coding: utf-8 -*-
+#
+# K2hash Python Driver under MIT License
+#
+# Copyright (c) 2022 Yahoo Japan Corporation
+#
+# For the full copyright and license information, please view
+# the license file that was distributed with this source code.
+#
+# AUTHOR:   Hirotaka Wakabayashi
+# CREATE:   Tue Feb 08 2022
+# REVISION:
+#
+"""K2hash Python Driver under MIT License"""
+from __future__ import absolute_import
+
+import logging
+import math
+import threading
+import time
+
+from k2hash import BaseQueue, Queue
+
+LOG = logging.getLogger(__name__)
+
+
+class DelayQueue(BaseQueue):  # noqa: pylint: disable=too-many-instance-attributes
+    """
+    DelayQueue class delivers elements after a delay.
+
+    An element put with a delay goes into the bucket Queue of the bucket_seconds
+    long time window that contains its due time. The buckets are listed as
+    subkeys of an index key. When the window of a bucket has passed, all of its
+    elements are moved to the ready Queue at once, so get never reads elements
+    that are not due. Elements are delivered up to bucket_seconds after their
+    due time. Times are wall clock times, so that processes share the buckets.
+    """
+
+    MOVE_BATCH_SIZE = 1000
+
+    def __init__(  # noqa: pylint: disable=too-many-arguments,too-many-positional-arguments
+        self,
+        k2h,
+        prefix="delay",
+        bucket_seconds=1,
+        fifo=True,
+        password=None,
+        expire_duration=None,
+    ):
+        """
+        Initialize a new DelayQueue instnace.
+        """
+        if not isinstance(prefix, str):
+            raise TypeError("prefix should be a string object")
+        if not prefix:
+            raise ValueError("prefix should not be empty")
+        if not isinstance(bucket_seconds, (int, float)):
+            raise TypeError("bucket_seconds should be a int or float object")
+        if bucket_seconds <= 0:
+            raise ValueError("bucket_seconds should be positive")
+        super().__init__(k2h, fifo, prefix, password, expire_duration)
+        self._bucket_seconds = bucket_seconds
+        self._ready = Queue(k2h, fifo, f"{prefix}:ready", password, expire_duration)
+        self._index = f"{prefix}:buckets"
+        if not k2h.exists(self._index):
+            k2h.set(self._index, prefix)
+        # buckets this object has added to the index.
+        self._known_buckets = set()
+        self._buckets = {}
+        self._lock = threading.Lock()
+        self._next_promote = 0.0
+
+    def _reopen(self):
+        """Fixes up the queue in a forked child and replaces the bucket lock."""
+        super()._reopen()
+        self._lock = threading.Lock()
+
+    def _bucket_name(self, bucket):
+        """Returns the subkey of a bucket in the index."""
+        return f"{self._prefix}:bucket:{bucket}"
+
+    def _bucket_queue(self, bucket):
+        """Returns the Queue of a bucket."""
+        with self._lock:
+            queue = self._buckets.get(bucket)
+            if queue is None:
+                queue = Queue(
+                    self._k2h,
+                    self._fifo,
+                    self._bucket_name(bucket),
+                    self._password,
+                    self._expire_duration,
+                )
+                self._buckets[bucket] = queue
+            return queue
+
+    def _release_bucket(self, bucket):
+        """Frees the Queue of a bucket."""
+        with self._lock:
+            queue = self._buckets.pop(bucket, None)
+            self._known_buckets.discard(bucket)
+        if queue is not None:
+            queue.close()
+
+    def put(self, obj, delay=0, attrs=None):
+        """Inserts an element that becomes ready after delay seconds."""
+        if isinstance(obj, list):
+            return self.put_many(obj, delay, attrs) == len(obj)
+        return self.put_many([obj], delay, attrs) == 1
+
+    def put_many(self, objs, delay=0, attrs=None):
+        """Inserts elements that become ready after delay seconds."""
+        if not isinstance(delay, (int, float)):
+            raise TypeError("delay should be a int or float object")
+        if delay < 0:
+            raise ValueError("delay should not be negative")
+        if delay == 0:
+            count = self._ready.put_many(objs, attrs)
+            if count:
+                self._notify(count)
+            return count
+
+        now = time.time()
+        bucket = math.floor((now + delay) / self._bucket_seconds)
+        if bucket not in self._known_buckets:
+            # adds the bucket to the index before it has elements.
+            if not self._k2h.add_subkey(self._index, self._bucket_name(bucket), ""):
+                LOG.error("error in add_subkey")
+                return 0
+            current = math.floor(now / self._bucket_seconds)
+            with self._lock:
+                self._known_buckets = {
+                    known for known in self._known_buckets if known >= current
+                }
+                self._known_buckets.add(bucket)
+        return self._bucket_queue(bucket).put_many(objs, attrs)
+
+    def _move(self, bucket):
+        """
+        Moves all elements of a bucket to the ready Queue.
+
+        Returns the number of moved elements and whether the bucket is empty. If
+        the ready Queue takes only some of a batch, the rest is pushed back into
+        the bucket and moved by a later promote.
+        """
+        queue = self._bucket_queue(bucket)
+        count = 0
+        while True:
+            vals = queue.get_many(self.MOVE_BATCH_SIZE)
+            if not vals:
+                return count, True
+            pushed = self._ready.put_many(vals)
+            count += pushed
+            if pushed < len(vals):
+                rest = vals[pushed:]
+                if queue.put_many(rest) < len(rest):
+                    LOG.error("lost %s elements of bucket %s", len(rest), bucket)
+                return count, False
+
+    def promote(self):
+        """Moves the elements of the passed buckets to the ready Queue and returns the count."""
+        now = time.time()
+        current = math.floor(now / self._bucket_seconds)
+        count = 0
+        prefix = self._bucket_name("")
+        for name in self._k2h.get_subkeys(self._index):
+            if not name.startswith(prefix):
+                continue
+            bucket = int(name[len(prefix):])
+            if bucket >= current:
+                continue
+            moved, drained = self._move(bucket)
+            count += moved
+            if drained and bucket < current - 1:
+                # a put may still be writing to the bucket that just passed,
+                # so the bucket is removed one window later.
+                self._k2h.remove_subkeys(self._index, [name])
+                moved, drained = self._move(bucket)
+                count += moved
+                if drained:
+                    self._release_bucket(bucket)
+                else:
+                    # keeps the rest of the bucket for a later promote.
+                    self._k2h.add_subkey(self._index, name, "")
+        self._next_promote = (current + 1) * self._bucket_seconds
+        if count:
+            LOG.debug("promoted %s elements", count)
+            self._notify(count)
+        return count
+
+    def _promote_if_due(self):
+        """Promotes the passed buckets once per window."""
+        if time.time() >= self._next_promote:
+            self.promote()
+
+    def get(self, block=False, timeout=None):
+        """
+        Finds and gets a ready object from the head of this queue.
+
+        See Queue.get for block and timeout.
+        """
+        return self._wait_for(self._ready.get, block, timeout, self._promote_if_due)
+
+    def get_many(self, max_items, block=False, timeout=None):
+        """Finds and gets at most max_items ready objects from the head of this queue."""
+        if not isinstance(max_items, int):
+            raise TypeError("max_items should be a int object")
+        if max_items <= 0:
+            raise ValueError("max_items should be positive")
+        first = self._wait_for(self._ready.get, block, timeout, self._promote_if_due)
+        if not first:
+            return []
+        return [first] + (self._ready.get_many(max_items - 1) if max_items > 1 else [])
+
+    def remove(self, count=1, callback=None):
+        """Removes at most count ready objects. See Queue.remove."""
+        self._promote_if_due()
+        return self._ready.remove(count, callback)
+
+    def qsize(self):
+        """Returns the number of ready elements."""
+        self._promote_if_due()
+        return self._ready.qsize()
+
+    def delayed_size(self):
+        """Returns the number of elements that are not ready."""
+        prefix = self._bucket_name("")
+        count = 0
+        for name in self._k2h.get_subkeys(self._index):
+            if name.startswith(prefix):
+                count += self._bucket_queue(int(name[len(prefix):])).qsize()
+        return count
+
+    def empty(self):
+        """Returns true if, and only if, no element is ready."""
+        self._promote_if_due()
+        return self._ready.empty()
+
+    def clear(self):
+        """Removes all of the ready and delayed elements."""
+        prefix = self._bucket_name("")
+        names = [
+            name for name in self._k2h.get_subkeys(self._index) if name.startswith(prefix)
+        ]
+        for name in names:
+            bucket = int(name[len(prefix):])
+            self._bucket_queue(bucket).clear()
+            self._release_bucket(bucket)
+        if names:
+            self._k2h.remove_subkeys(self._index, names)
+        return self._ready.clear()
+
+    def close(self):
+        """Frees the queue handles."""
+        with self._lock:
+            queues = list(self._buckets.values())
+            self._buckets.clear()
+        results = [queue.close() for queue in queues + [self._ready]]
+        return all(results)
+
+
+#
+# Local variables:
+# tab-width: 4
+# c-basic-offset: 4
+# End:
+# vim600: expandtab sw=4 ts=4 fdm=marker
+# vim<600: expandtab sw=4 ts=4
+#
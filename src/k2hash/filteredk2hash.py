@@ -0,0 +1,237 @@
+# -*- coding: utf-8 -*-
+#
+# K2hash Python Driver under MIT License
+#
+# Copyright (c) 2022 Yahoo Japan Corporation
+#
+# For the full copyright and license information, please view
+# the license file that was distributed with this source code.
+#
+# AUTHOR:   Hirotaka Wakabayashi
+# CREATE:   Tue Feb 08 2022
+# REVISION:
+#
+"""K2hash Python Driver under MIT License"""
+from __future__ import absolute_import
+
+import logging
+import threading
+
+from k2hash import BloomFilter, K2hash, TimeUnit
+
+LOG = logging.getLogger(__name__)
+
+
+class FilteredK2hash(K2hash):
+    """
+    FilteredK2hash class answers lookups of missing keys from a BloomFilter.
+
+    The filter is built by scanning the keys when the k2hash is opened and is
+    updated by set, rename and the subkey methods of this object. Removed keys
+    stay in the filter until rebuild_filter is called, which should also be
+    called after other processes modified the file.
+    """
+
+    def __init__(self, *args, capacity=100000, false_positive_rate=0.01, **kwargs):
+        """
+        Initialize a new FilteredK2hash instnace.
+
+        capacity and false_positive_rate size the BloomFilter. The capacity grows
+        if the k2hash holds more keys than capacity.
+        """
+        # validates the arguments before opening the k2hash.
+        self._bloom_filter = BloomFilter(capacity, false_positive_rate)
+        # keys added while rebuild_filter scans, which are replayed into the new filter.
+        self._added = None
+        # guards the filter and the added keys against a swap in rebuild_filter.
+        self._filter_lock = threading.Lock()
+        self._rebuild_lock = threading.Lock()
+        self._negatives = 0
+        super().__init__(*args, **kwargs)
+        self.rebuild_filter()
+
+    def _reopen(self):
+        """Opens the k2h file again in a forked child and replaces the locks."""
+        super()._reopen()
+        self._filter_lock = threading.Lock()
+        self._rebuild_lock = threading.Lock()
+
+    def _filter_add(self, key):
+        """Adds a key to the filter and records it while the filter is rebuilt."""
+        with self._filter_lock:
+            self._bloom_filter.add(key)
+            if self._added is not None:
+                self._added.append(key)
+
+    def _filter_miss(self, key):
+        """Returns True if key is definitely not in the k2hash."""
+        if isinstance(key, str) and key and key not in self._bloom_filter:
+            self._negatives += 1
+            return True
+        return False
+
+    def rebuild_filter(self):
+        """
+        Rebuilds the filter by scanning all keys.
+
+        Keys added by this object during the scan are recorded and added to the
+        new filter before it replaces the old one, so no key goes missing.
+        """
+        with self._rebuild_lock:
+            with self._filter_lock:
+                self._added = []
+            try:
+                capacity = self._bloom_filter.capacity
+                rate = self._bloom_filter.false_positive_rate
+                while True:
+                    bloom_filter = BloomFilter(capacity, rate)
+                    for batch in self.scan(with_values=False, use_str=False):
+                        for key, _ in batch:
+                            bloom_filter.add(key)
+                    if bloom_filter.count <= capacity:
+                        break
+                    # resizes the filter and scans again.
+                    capacity = bloom_filter.count * 2
+                with self._filter_lock:
+                    for key in self._added:
+                        bloom_filter.add(key)
+                    self._bloom_filter = bloom_filter
+            finally:
+                with self._filter_lock:
+                    self._added = None
+        LOG.debug("rebuilt %s", self._bloom_filter)
+        return True
+
+    def filter_info(self):
+        """Returns the filter statistics and memory usage as a dict."""
+        bloom_filter = self._bloom_filter
+        return {
+            "capacity": bloom_filter.capacity,
+            "count": bloom_filter.count,
+            "false_positive_rate": bloom_filter.false_positive_rate,
+            "num_hashes": bloom_filter.num_hashes,
+            "nbytes": bloom_filter.nbytes,
+            "negatives": self._negatives,
+        }
+
+    def get(self, key, password=None):
+        """Gets the value, or "" without calling libk2hash if the key is missing."""
+        if self._filter_miss(key):
+            return ""
+        return super().get(key, password)
+
+    def get_bytes(self, key, password=None):
+        """Gets the value as a bytes object, or b"" if the key is missing."""
+        if self._filter_miss(key):
+            return b""
+        return super().get_bytes(key, password)
+
+    def exists(self, key, password=None):
+        """Returns True if the key exists, without calling libk2hash if it is missing."""
+        if self._filter_miss(key):
+            return False
+        return super().exists(key, password)
+
+    def value_length(self, key, password=None):
+        """Returns the length in bytes of the value, or None if the key is missing."""
+        if self._filter_miss(key):
+            return None
+        return super().value_length(key, password)
+
+    def get_many(self, keys, password=None):
+        """Gets the values of keys, skipping libk2hash for missing keys."""
+        if not isinstance(keys, list):
+            return super().get_many(keys, password)
+        found = [i for i, key in enumerate(keys) if not self._filter_miss(key)]
+        vals = [""] * len(keys)
+        for i, val in zip(found, super().get_many([keys[i] for i in found], password)):
+            vals[i] = val
+        return vals
+
+    def set(  # noqa: pylint: disable=too-many-arguments,too-many-positional-arguments
+        self, key, val, password=None, expire_duration=None, time_unit=TimeUnit.SECONDS
+    ):
+        """Sets a key/value pair and adds the key to the filter."""
+        if isinstance(key, str) and key:
+            self._filter_add(key)
+        return super().set(key, val, password, expire_duration, time_unit)
+
+    def prepare_set(self, password=None, expire_duration=None, time_unit=TimeUnit.SECONDS):
+        """Returns a function that sets a key/value pair and adds the key to the filter."""
+        prepared_set = super().prepare_set(password, expire_duration, time_unit)
+
+        def filtered_set(key, val):
+            if isinstance(key, str) and key:
+                self._filter_add(key)
+            return prepared_set(key, val)
+
+        return filtered_set
+
+    def set_bytes(  # noqa: pylint: disable=too-many-arguments,too-many-positional-arguments
+        self, key, val, password=None, expire_duration=None, time_unit=TimeUnit.SECONDS
+    ):
+        """Sets a key/binary value pair and adds the key to the filter."""
+        if isinstance(key, str) and key:
+            self._filter_add(key)
+        return super().set_bytes(key, val, password, expire_duration, time_unit)
+
+    def set_many(
+        self, mapping, password=None, expire_duration=None, time_unit=TimeUnit.SECONDS
+    ):
+        """Sets key/value pairs in mapping and adds the keys to the filter."""
+        if isinstance(mapping, dict):
+            for key in mapping:
+                if isinstance(key, str) and key:
+                    self._filter_add(key)
+        return super().set_many(mapping, password, expire_duration, time_unit)
+
+    def add_subkey(  # noqa: pylint: disable=too-many-arguments,too-many-positional-arguments
+        self,
+        key,
+        subkey,
+        subval,
+        password=None,
+        expire_duration=None,
+        time_unit=TimeUnit.SECONDS,
+    ):
+        """Adds subkeys to a key/value pair and adds the keys to the filter."""
+        for name in (key, subkey):
+            if isinstance(name, str) and name:
+                self._filter_add(name)
+        return super().add_subkey(key, subkey, subval, password, expire_duration, time_unit)
+
+    def set_subkeys(  # noqa: pylint: disable=too-many-arguments,too-many-positional-arguments
+        self,
+        key,
+        subkeys,
+        password=None,
+        expire_duration=None,
+        time_unit=TimeUnit.SECONDS,
+    ):
+        """Sets subkeys and adds the keys to the filter."""
+        for name in [key] + (list(subkeys) if isinstance(subkeys, dict) else []):
+            if isinstance(name, str) and name:
+                self._filter_add(name)
+        return super().set_subkeys(key, subkeys, password, expire_duration, time_unit)
+
+    def rename(self, key, newkey):
+        """Renames a key with a new key and adds the new key to the filter."""
+        if isinstance(newkey, str) and newkey:
+            self._filter_add(newkey)
+        return super().rename(key, newkey)
+
+    def load_from_file(self, path, is_skip_error=True):
+        """Loads data from a file and rebuilds the filter."""
+        res = super().load_from_file(path, is_skip_error)
+        self.rebuild_filter()
+        return res
+
+
+#
+# Local variables:
+# tab-width: 4
+# c-basic-offset: 4
+# End:
+# vim600: expandtab sw=4 ts=4 fdm=marker
+# vim<600: expandtab sw=4 ts=4
+#
@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+#
+# K2hash Python Driver under MIT License
+#
+# Copyright (c) 2022 Yahoo Japan Corporation
+#
+# For the full copyright and license information, please view
+# the license file that was distributed with this source code.
+#
+# AUTHOR:   Hirotaka Wakabayashi
+# CREATE:   Tue Feb 08 2022
+# REVISION:
+#
+"""K2hash Python Driver under MIT License"""
+from __future__ import absolute_import
+
+import bisect
+import hashlib
+import logging
+
+LOG = logging.getLogger(__name__)
+
+
+class HashRing:
+    """
+    HashRing class maps keys to nodes by consistent hashing with virtual nodes.
+
+    Each node owns vnodes points on the ring, and a key belongs to the node of
+    the first point after the hash of the key. Adding or removing a node moves
+    only about 1/N of the keys. node_for can be called by threads while a node
+    is added or removed, because the points and their owners are replaced
+    together.
+    """
+
+    def __init__(self, nodes=(), vnodes=160):
+        """
+        Initialize a new HashRing instnace.
+        """
+        if not isinstance(vnodes, int):
+            raise TypeError("vnodes should be a int object")
+        if vnodes <= 0:
+            raise ValueError("vnodes should be positive")
+        self._vnodes = vnodes
+        self._nodes = []
+        # (sorted points, owners of the points)
+        self._ring = ([], [])
+        for node in nodes:
+            self.add(node)
+
+    @staticmethod
+    def _hash(name):
+        """Returns the position of name on the ring."""
+        return int.from_bytes(hashlib.blake2b(name.encode(), digest_size=8).digest(), "little")
+
+    def _build(self):
+        """Rebuilds the sorted points of the ring."""
+        ring = sorted(
+            (self._hash(f"{node}#{i}"), node) for node in self._nodes for i in range(self._vnodes)
+        )
+        self._ring = ([point for point, _ in ring], [node for _, node in ring])
+
+    def add(self, node):
+        """Adds a node."""
+        if not isinstance(node, str):
+            raise TypeError("node should be a str object")
+        if node in self._nodes:
+            raise ValueError(f"node {node} already exists")
+        self._nodes = self._nodes + [node]
+        self._build()
+
+    def remove(self, node):
+        """Removes a node."""
+        if node not in self._nodes:
+            raise ValueError(f"node {node} does not exist")
+        self._nodes = [name for name in self._nodes if name != node]
+        self._build()
+
+    def copy(self):
+        """Returns a new HashRing with the same nodes."""
+        ring = HashRing(vnodes=self._vnodes)
+        # the lists are replaced rather than modified, so they can be shared.
+        ring._nodes = self._nodes  # noqa: pylint: disable=protected-access
+        ring._ring = self._ring  # noqa: pylint: disable=protected-access
+        return ring
+
+    def node_for(self, key):
+        """Returns the node of key."""
+        if not isinstance(key, str):
+            raise TypeError("key should currently be a str object")
+        points, owners = self._ring
+        if not points:
+            raise RuntimeError("ring should have a node")
+        i = bisect.bisect(points, self._hash(key))
+        return owners[i % len(owners)]
+
+    @property
+    def nodes(self):
+        """Returns the list of nodes."""
+        return list(self._nodes)
+
+    @property
+    def vnodes(self):
+        """Returns the number of points of a node."""
+        return self._vnodes
+
+    def __len__(self):
+        """Returns the number of nodes."""
+        return len(self._nodes)
+
+    def __contains__(self, node):
+        """Returns True if node is in the ring."""
+        return node in self._nodes
+
+    def __repr__(self):
+        """Returns full of members as a string."""
+        return f"<_{self.__class__.__name__} nodes={self._nodes!r}, vnodes={self._vnodes}>"
+
+
+#
+# Local variables:
+# tab-width: 4
+# c-basic-offset: 4
+# End:
+# vim600: expandtab sw=4 ts=4 fdm=marker
+# vim<600: expandtab sw=4 ts=4
+#
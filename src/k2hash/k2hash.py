@@ -12,28 +12,128 @@
 # REVISION:
 #
 """K2hash Python Driver under MIT License"""
+# pylint: disable=too-many-lines
 from __future__ import absolute_import
 
 import ctypes
 import logging
 import os
 import sys
-from ctypes import byref, c_bool, c_char_p, c_int, c_size_t, c_uint64, pointer
+import threading
+import time
+import weakref
+from ctypes import (
+    POINTER,
+    byref,
+    c_bool,
+    c_char,
+    c_char_p,
+    c_int,
+    c_size_t,
+    c_ubyte,
+    c_uint64,
+    pointer,
+)
 from pathlib import Path
 
 import k2hash
 from k2hash import DumpLevel, LogLevel, OpenFlag, TimeUnit
+from k2hash.snapshot import _write_snapshot
 
 LOG = logging.getLogger(__name__)
 
+# K2hash and K2hashIterator objects of this process, whose handles are fixed up
+# in a child process after fork.
+_OPENED = weakref.WeakSet()
+_ITERATORS = weakref.WeakSet()
+
+# name of the builtin attribute that holds the expiration time of a key.
+_EXPIRE_ATTR = b"expire"
+
+
+# Returns a ctypes argument that refers to the memory of val and its length.
+# bytes, bytearray and writable contiguous memoryview objects are passed without
+# copying. A read-only memoryview over a part of an object is copied once because
+# ctypes can not export its address.
+def _as_c_buffer(val):
+    if isinstance(val, memoryview):
+        if not val.c_contiguous:
+            raise ValueError("val should be a contiguous memoryview object")
+        if not val.readonly:
+            val = val.cast("B")
+        elif isinstance(val.obj, bytes) and val.nbytes == len(val.obj):
+            val = val.obj
+        else:
+            val = val.tobytes()
+    if isinstance(val, bytes):
+        return (val if val else None), len(val)
+    if isinstance(val, (bytearray, memoryview)):
+        if not val:
+            return None, 0
+        return (c_char * len(val)).from_buffer(val), len(val)
+    raise TypeError("val should be a bytes, bytearray or memoryview object")
+
+
+# Returns a subkey value as bytes and its length for k2h_add_subkey_wa. A str
+# object keeps its terminating NUL like set(), and a bytes, bytearray or
+# memoryview object is stored with its exact length like set_bytes().
+def _as_subval(subval):
+    if isinstance(subval, str):
+        return subval.encode(), len(subval) + 1
+    if isinstance(subval, (bytes, bytearray, memoryview)):
+        bval = bytes(subval)
+        return bval, len(bval)
+    raise TypeError("subval should be a str or bytes object")
+
+
+# Copies a NUL terminated string allocated by libk2hash and frees the pointer.
+def _take_c_string(libc, ptr):
+    try:
+        return ctypes.string_at(ptr)
+    finally:
+        libc.free(ptr)
+
+
+# Copies length bytes from a pack member in one call. The str API stores the
+# terminating NUL, which is dropped here if strip is True, by default only when
+# the data is decoded, so bytes are returned as stored.
+def _unpack(ptr, length, use_str, strip=None):
+    data = ctypes.string_at(ptr, length)
+    if strip is None:
+        strip = use_str
+    if strip and data.endswith(b"\0"):
+        data = data[:-1]
+    return data.decode() if use_str else data
+
+
+# Copies a pack member allocated by libk2hash with _unpack and frees the pointer.
+def _take_pack(libc, ptr, length, use_str, strip=None):
+    try:
+        return _unpack(ptr, length, use_str, strip)
+    finally:
+        libc.free(ptr)
+
+
+class K2hashIterator:  # noqa: pylint: disable=too-many-instance-attributes
+    """implements iterator of k2hash
+
+    Every K2hashIterator owns its find handle, so several iterators can walk the
+    same K2hash independently. close() releases the find handle, which is also
+    done when the iterator is used as a context manager. last_key can be passed
+    as start_after to a new iterator to continue a scan after a restart. The
+    iterator walks from the first element to start_after, so resuming is O(n).
+    If start_after has been removed since, the scan starts over from the first
+    element, which hands out the keys before it again.
+
+    A K2hashIterator can be shared by threads. Each key is handed out to one of
+    them, because the find handle is moved with a lock held.
+    """
 
-class K2hashIterator:
-    """implements iterator of k2hash"""
-
-    def __init__(self, k2h, key=None):
+    def __init__(self, k2h, key=None, start_after=None):
         """Provides constructor"""
         if not isinstance(k2h, K2hash):
             raise TypeError("k2h should be a K2hash object")
+        self._k2h = k2h
         self._k2h_handle = k2h.handle
         self._libc = k2h.libc
         self._libk2hash = k2h.libk2hash
@@ -42,7 +142,32 @@ class K2hashIterator:
             self._key = key
         if key and not isinstance(key, str):
             raise TypeError("key should be a str object")
-
+        if start_after is not None and not isinstance(start_after, str):
+            raise TypeError("start_after should be a str object")
+        if start_after is not None and not start_after:
+            raise ValueError("start_after should not be empty")
+
+        self._handle = self._find_first()
+        self._last_key = None
+        self._forked = False
+        # guards the find handle, which k2h_find_next frees and replaces.
+        self._lock = threading.Lock()
+        _ITERATORS.add(self)
+
+        # out parameters of k2h_find_get_key/k2h_find_get_value are reused for
+        # every element.
+        self._ppkey = POINTER(c_ubyte)()
+        self._keylength = c_size_t(0)
+        self._ppval = POINTER(c_ubyte)()
+        self._vallength = c_size_t(0)
+        self._out_key = (byref(self._ppkey), byref(self._keylength))
+        self._out_val = (byref(self._ppval), byref(self._vallength))
+
+        if start_after is not None:
+            self._skip_to(start_after.encode())
+
+    def _find_first(self):
+        """Returns a new find handle at the first element."""
         if self._key:
             handle = self._libk2hash.k2h_find_first_str_subkey(
                 self._k2h_handle, (c_char_p(self._key.encode()))
@@ -52,7 +177,48 @@ class K2hashIterator:
 
         if handle == K2hash.K2H_INVALID_HANDLE:
             raise RuntimeError("handle should not be K2H_INVALID_HANDLE")
-        self._handle = handle
+        return handle
+
+    def _skip_to(self, bkey):
+        """Moves the find handle to the element after bkey, or to the first element."""
+        while True:
+            found = self._next_key()
+            if found is None:
+                # the find handle has been released at the end.
+                LOG.warning("start_after %s is not found, so the scan starts over", bkey)
+                self._handle = self._find_first()
+                return
+            self._advance()
+            if found == bkey:
+                self._last_key = found.decode()
+                return
+
+    def _next_key(self):
+        """Returns the raw key at the find handle and advances it, or None at the end."""
+        if self._forked:
+            raise RuntimeError("iterator should not be used after fork")
+        while self._handle != K2hash.K2H_INVALID_HANDLE:
+            handle = self._handle
+            bkey = None
+            if self._libk2hash.k2h_find_get_key(handle, *self._out_key) and self._ppkey:
+                bkey = _take_pack(
+                    self._libc, self._ppkey, self._keylength.value, False, strip=True
+                )
+            if bkey:
+                return bkey
+            # k2h_find_next releases the handle when it reaches the end.
+            self._handle = self._libk2hash.k2h_find_next(handle)
+        return None
+
+    def _advance(self):
+        """Moves the find handle to the next element."""
+        # k2h_find_next releases the handle when it reaches the end.
+        self._handle = self._libk2hash.k2h_find_next(self._handle)
+
+    @property
+    def last_key(self):
+        """Returns the last key handed out, which is a resume token of this iterator."""
+        return self._last_key
 
     def __iter__(self):
         """Implements iter() itrator interface"""
@@ -60,17 +226,67 @@ class K2hashIterator:
 
     def __next__(self):
         """Implements next() itrator interface"""
-        ppkey = pointer(c_char_p("".encode()))
-        pkeylength = pointer(c_size_t(0))
-        res = self._libk2hash.k2h_find_get_key(self._handle, ppkey, pkeylength)
-        if res:
-            keylength = pkeylength.contents.value
-            if keylength > 0:
-                pkey = ppkey.contents.value.decode()
-                self._libc.free(ppkey.contents)
-                self._handle = self._libk2hash.k2h_find_next(self._handle)
-                return pkey
-        raise StopIteration
+        with self._lock:
+            bkey = self._next_key()
+            if bkey is None:
+                raise StopIteration
+            self._advance()
+            self._last_key = bkey.decode()
+            return self._last_key
+
+    def next_batch(  # noqa: pylint: disable=too-many-arguments,too-many-positional-arguments
+        self, batch_size=1000, with_values=True, with_attrs=False, use_str=True
+    ):
+        """Returns a list of at most batch_size (key, value) pairs.
+
+        An empty list is returned at the end. See K2hash.scan for the arguments.
+        """
+        with self._lock:
+            batch = []
+            while len(batch) < batch_size:
+                bkey = self._next_key()
+                if bkey is None:
+                    break
+                val = None
+                if with_values and self._libk2hash.k2h_find_get_value(
+                    self._handle, *self._out_val
+                ):
+                    val = (
+                        # bytes values are returned as stored, like get_bytes.
+                        _take_pack(self._libc, self._ppval, self._vallength.value, use_str)
+                        if self._ppval
+                        else ("" if use_str else b"")
+                    )
+                self._advance()
+                item = (bkey.decode() if use_str else bkey, val)
+                if with_attrs:
+                    # pylint: disable-next=protected-access
+                    item += (self._k2h._get_attributes(bkey, use_str),)
+                batch.append(item)
+                self._last_key = bkey.decode()
+            return batch
+
+    def close(self):
+        """Releases the find handle."""
+        with self._lock:
+            if self._handle != K2hash.K2H_INVALID_HANDLE:
+                self._libk2hash.k2h_find_free(self._handle)
+                self._handle = K2hash.K2H_INVALID_HANDLE
+
+    def _invalidate(self):
+        """Drops the find handle inherited by a forked child without freeing it."""
+        self._lock = threading.Lock()
+        if self._handle != K2hash.K2H_INVALID_HANDLE:
+            self._handle = K2hash.K2H_INVALID_HANDLE
+            self._forked = True
+
+    def __enter__(self):
+        """Implements the context manager interface"""
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """Releases the find handle on leaving the context"""
+        self.close()
 
 
 class K2hash:  # noqa: pylint: disable=too-many-instance-attributes,too-many-public-methods
@@ -80,11 +296,70 @@ class K2hash:  # noqa: pylint: disable=too-many-instance-attributes,too-many-pub
 
     K2H_INVALID_HANDLE = 0
 
-    def get_iterator(self, key=None):
-        """Returns the k2hash iterator"""
-        if not self._iterator:
-            self._iterator = K2hashIterator(self, key)
-        return self._iterator
+    def get_iterator(self, key=None, start_after=None):
+        """Returns a new k2hash iterator, which should be closed after use."""
+        return K2hashIterator(self, key, start_after)
+
+    def scan(  # noqa: pylint: disable=too-many-arguments,too-many-positional-arguments
+        self,
+        batch_size=1000,
+        with_values=True,
+        with_attrs=False,
+        use_str=True,
+        start_after=None,
+    ):
+        """Scans all keys and yields lists of (key, value) pairs.
+
+        Each list holds at most batch_size pairs. value is None if with_values is
+        False. If with_attrs is True, the dict of get_attributes(key) is appended
+        to each pair. Keys and values are bytes objects if use_str is False, and
+        values are then returned as stored like get_bytes, so a value set by set()
+        keeps its terminating NUL. start_after resumes a scan after the
+        K2hashIterator.last_key of a previous scan.
+        """
+        if not isinstance(batch_size, int):
+            raise TypeError("batch_size should be a int object")
+        if batch_size <= 0:
+            raise ValueError("batch_size should be positive")
+        if not isinstance(with_values, bool):
+            raise TypeError("with_values should be a bool object")
+        if not isinstance(with_attrs, bool):
+            raise TypeError("with_attrs should be a bool object")
+        if not isinstance(use_str, bool):
+            raise TypeError("use_str should be a bool object")
+
+        try:
+            cursor = K2hashIterator(self, start_after=start_after)
+        except RuntimeError:
+            # k2h_find_first returns K2H_INVALID_HANDLE if there are no keys.
+            return
+        with cursor:
+            while True:
+                batch = cursor.next_batch(batch_size, with_values, with_attrs, use_str)
+                if not batch:
+                    return
+                yield batch
+
+    def export_snapshot(self, path, batch_size=1000):
+        """
+        Writes all key/value pairs to a snapshot file at path and returns their number.
+
+        A snapshot is a compact file of the pairs sorted by key, which
+        SnapshotReader reads. Subkey lists, attributes and expirations are not
+        written, and subkeys are written as plain keys.
+        """
+        if not isinstance(path, str):
+            raise TypeError("path should be a str object")
+        if not path:
+            raise ValueError("path should not be empty")
+        return _write_snapshot(
+            path,
+            (
+                (key, val or b"")
+                for batch in self.scan(batch_size, use_str=False)
+                for key, val in batch
+            ),
+        )
 
     def _set_k2h_handle(self):
         """Sets the k2h handle"""
@@ -172,7 +447,6 @@ class K2hash:  # noqa: pylint: disable=too-many-instance-attributes,too-many-pub
         Initialize a new K2hash instnace.
         """
         self._handle = 0
-        self._iterator = None
         self._flag = None
 
         if not isinstance(k2hfile, str):
@@ -222,6 +496,7 @@ class K2hash:  # noqa: pylint: disable=too-many-instance-attributes,too-many-pub
             raise
 
         self._set_k2h_handle()
+        _OPENED.add(self)
 
     @property
     def libk2hash(self):
@@ -276,16 +551,263 @@ class K2hash:  # noqa: pylint: disable=too-many-instance-attributes,too-many-pub
         if password and password == "":
             raise ValueError("password should not be empty")
 
-        val = self._libk2hash.k2h_get_str_direct_value_wp(
+        pval = self._libk2hash.k2h_get_str_direct_value_wp(
             self._handle,
             c_char_p(key.encode()),
             (c_char_p(password.encode()) if password else None),
         )
 
-        if val:
-            return val.decode()
+        if pval:
+            return _take_c_string(self._libc, pval).decode()
         return ""
 
+    def set_bytes(  # noqa: pylint: disable=too-many-arguments,too-many-positional-arguments
+        self, key, val, password=None, expire_duration=None, time_unit=TimeUnit.SECONDS
+    ):
+        """Sets a key/binary value pair.
+
+        val can be a bytes, bytearray or memoryview object and may contain NUL bytes.
+        The value is stored with its exact length, so it is read back by get_bytes.
+        """
+        if not isinstance(key, str):
+            raise TypeError("key should currently be a str object")
+        if not key:
+            raise ValueError("key should not be empty")
+        if not isinstance(val, (bytes, bytearray, memoryview)):
+            raise TypeError("val should be a bytes, bytearray or memoryview object")
+        if password and not isinstance(password, str):
+            raise TypeError("password should be a str object")
+        if password and password == "":
+            raise ValueError("password should not be empty")
+        if expire_duration and not isinstance(expire_duration, int):
+            raise TypeError("expire_duration should be a int object")
+        if expire_duration and expire_duration <= 0:
+            raise ValueError("expire_duration should not be positive")
+        if time_unit and not isinstance(time_unit, TimeUnit):
+            raise TypeError("time_unit should be a TimeUnit object")
+
+        # keys include the terminating NUL to be compatible with the str API.
+        bkey = key.encode()
+        buf, buflen = _as_c_buffer(val)
+        res = self._libk2hash.k2h_set_value_wa(
+            self._handle,
+            c_char_p(bkey),
+            c_size_t(len(bkey) + 1),
+            buf,
+            c_size_t(buflen),
+            (c_char_p(password.encode()) if password else None),
+            (pointer(c_uint64(expire_duration)) if expire_duration else None),
+        )
+
+        LOG.debug("ret:%s", res)
+        return res
+
+    def get_bytes(self, key, password=None):
+        """Gets the value as a bytes object.
+
+        Returns b"" if the key does not exist.
+        """
+        if not isinstance(key, str):
+            raise TypeError("key should currently be a str object")
+        if not key:
+            raise ValueError("key should not be empty")
+        if password and not isinstance(password, str):
+            raise TypeError("password should be a str object")
+        if password and password == "":
+            raise ValueError("password should not be empty")
+
+        bkey = key.encode()
+        ppval = POINTER(c_ubyte)()
+        vallength = c_size_t(0)
+        res = self._libk2hash.k2h_get_value_wp(
+            self._handle,
+            c_char_p(bkey),
+            c_size_t(len(bkey) + 1),
+            byref(ppval),
+            byref(vallength),
+            (c_char_p(password.encode()) if password else None),
+        )
+
+        if not res or not ppval:
+            return b""
+        try:
+            return ctypes.string_at(ppval, vallength.value)
+        finally:
+            self._libc.free(ppval)
+
+    def _stored_length(self, bkey, password, raw=False):
+        """Returns the length of a value in libk2hash without copying it, or None."""
+        ppval = POINTER(c_ubyte)()
+        vallength = c_size_t(0)
+        if raw:
+            # reads the value without checking attributes such as encryption.
+            res = self._libk2hash.k2h_get_value_np(
+                self._handle,
+                c_char_p(bkey),
+                c_size_t(len(bkey) + 1),
+                byref(ppval),
+                byref(vallength),
+            )
+        else:
+            res = self._libk2hash.k2h_get_value_wp(
+                self._handle,
+                c_char_p(bkey),
+                c_size_t(len(bkey) + 1),
+                byref(ppval),
+                byref(vallength),
+                (c_char_p(password.encode()) if password else None),
+            )
+        if not res or not ppval:
+            return None
+        self._libc.free(ppval)
+        return vallength.value
+
+    def _expired(self, bkey):
+        """Returns True if the expiration time of a key has passed."""
+        for name, val in self._get_attributes(bkey, False).items():
+            if name.rstrip(b"\0") == _EXPIRE_ATTR and len(val) >= 8:
+                # a time_t, or a struct timespec that starts with it.
+                return int.from_bytes(val[:8], sys.byteorder) <= time.time()
+        return False
+
+    def exists(self, key, password=None):
+        """Returns True if the key exists.
+
+        A missing key costs one lookup without attribute checks. A found key is
+        confirmed by a lookup with password, so a key whose expiration time has
+        passed does not exist, like get. An encrypted key that can not be read
+        with password is found unless it has expired.
+        """
+        if not isinstance(key, str):
+            raise TypeError("key should currently be a str object")
+        if not key:
+            raise ValueError("key should not be empty")
+        if password and not isinstance(password, str):
+            raise TypeError("password should be a str object")
+
+        bkey = key.encode()
+        # a key that is found with attribute checks is always found without them.
+        if self._stored_length(bkey, None, raw=True) is None:
+            return False
+        if self._stored_length(bkey, password) is not None:
+            return True
+        # the key has expired, or it is encrypted with another password.
+        return not self._expired(bkey)
+
+    def __contains__(self, key):
+        """Implements the in operator by exists()."""
+        return self.exists(key)
+
+    def value_length(self, key, password=None):
+        """Returns the length in bytes of the value, or None if it can not be read.
+
+        The length is that of get_bytes(key), so a value set by set() includes the
+        terminating NUL.
+        """
+        if not isinstance(key, str):
+            raise TypeError("key should currently be a str object")
+        if not key:
+            raise ValueError("key should not be empty")
+        if password and not isinstance(password, str):
+            raise TypeError("password should be a str object")
+
+        return self._stored_length(key.encode(), password)
+
+    def get_many(self, keys, password=None):
+        """Gets the values of keys.
+
+        Returns a list of values in the order of keys. A missing key yields "".
+        """
+        if not isinstance(keys, list):
+            raise TypeError("keys should be a list object")
+        for key in keys:
+            if not isinstance(key, str):
+                raise TypeError("key should currently be a str object")
+            if not key:
+                raise ValueError("key should not be empty")
+        if password and not isinstance(password, str):
+            raise TypeError("password should be a str object")
+        if password and password == "":
+            raise ValueError("password should not be empty")
+
+        get_value = self._libk2hash.k2h_get_str_direct_value_wp
+        libc = self._libc
+        handle = self._handle
+        cpass = c_char_p(password.encode()) if password else None
+        vals = []
+        for key in keys:
+            pval = get_value(handle, key.encode(), cpass)
+            vals.append(_take_c_string(libc, pval).decode() if pval else "")
+        return vals
+
+    def set_many(  # noqa: pylint: disable=too-many-branches
+        self, mapping, password=None, expire_duration=None, time_unit=TimeUnit.SECONDS
+    ):
+        """Sets key/value pairs in mapping.
+
+        Returns True if all pairs are set, otherwise stops at the first failure and
+        returns False.
+        """
+        if not isinstance(mapping, dict):
+            raise TypeError("mapping should be a dict object")
+        for key, val in mapping.items():
+            if not isinstance(key, str):
+                raise TypeError("key should currently be a str object")
+            if not key:
+                raise ValueError("key should not be empty")
+            if not isinstance(val, str):
+                raise TypeError("val should currently be a str object")
+        if password and not isinstance(password, str):
+            raise TypeError("password should be a str object")
+        if password and password == "":
+            raise ValueError("password should not be empty")
+        if expire_duration and not isinstance(expire_duration, int):
+            raise TypeError("expire_duration should be a int object")
+        if expire_duration and expire_duration <= 0:
+            raise ValueError("expire_duration should not be positive")
+        if time_unit and not isinstance(time_unit, TimeUnit):
+            raise TypeError("time_unit should be a TimeUnit object")
+
+        set_value = self._libk2hash.k2h_set_str_value_wa
+        handle = self._handle
+        cpass = c_char_p(password.encode()) if password else None
+        pexpire = pointer(c_uint64(expire_duration)) if expire_duration else None
+        for key, val in mapping.items():
+            res = set_value(handle, key.encode(), val.encode(), cpass, pexpire)
+            if not res:
+                LOG.error("error in k2h_set_str_value_wa")
+                return False
+        return True
+
+    def prepare_set(self, password=None, expire_duration=None, time_unit=TimeUnit.SECONDS):
+        """Returns a function that sets a key/value pair with password and expire_duration.
+
+        The arguments are validated and converted to ctypes objects once, so the
+        returned function(key, val) only encodes the key and the value.
+        """
+        if password and not isinstance(password, str):
+            raise TypeError("password should be a str object")
+        if password and password == "":
+            raise ValueError("password should not be empty")
+        if expire_duration and not isinstance(expire_duration, int):
+            raise TypeError("expire_duration should be a int object")
+        if expire_duration and expire_duration <= 0:
+            raise ValueError("expire_duration should not be positive")
+        if time_unit and not isinstance(time_unit, TimeUnit):
+            raise TypeError("time_unit should be a TimeUnit object")
+
+        set_value = self._libk2hash.k2h_set_str_value_wa
+        cpass = c_char_p(password.encode()) if password else None
+        pexpire = pointer(c_uint64(expire_duration)) if expire_duration else None
+
+        def prepared_set(key, val):
+            if not key:
+                raise ValueError("key should not be empty")
+            # the handle is read at each call because it changes when reopened after fork.
+            return set_value(self._handle, key.encode(), val.encode(), cpass, pexpire)
+
+        return prepared_set
+
     def add_attribute_plugin_lib(self, path):
         """Adds a shared library that handles an attribute"""
         if not isinstance(path, str):
@@ -325,7 +847,11 @@ class K2hash:  # noqa: pylint: disable=too-many-instance-attributes,too-many-pub
         expire_duration=None,
         time_unit=TimeUnit.SECONDS,
     ):
-        """Adds subkeys to a key/value pair."""
+        """Adds subkeys to a key/value pair.
+
+        subval can be a bytes, bytearray or memoryview object, which is stored with
+        its exact length like set_bytes.
+        """
         if not isinstance(key, str):
             raise TypeError("key should currently be a str object")
         if not key:
@@ -334,8 +860,7 @@ class K2hash:  # noqa: pylint: disable=too-many-instance-attributes,too-many-pub
             raise TypeError("subkey should be a str object")
         if not subkey:
             raise ValueError("subkey should not be empty")
-        if not isinstance(subval, str):
-            raise TypeError("subval should be a str object")
+        bval, vallength = _as_subval(subval)
         if password and not isinstance(password, str):
             raise TypeError("password should currently be a str object")
         if password and password == "":
@@ -353,8 +878,8 @@ class K2hash:  # noqa: pylint: disable=too-many-instance-attributes,too-many-pub
             c_size_t(len(key) + 1),
             c_char_p(subkey.encode()),
             c_size_t(len(subkey) + 1),
-            c_char_p(subval.encode()),
-            c_size_t(len(subval) + 1),
+            c_char_p(bval),
+            c_size_t(vallength),
             (c_char_p(password.encode()) if password else None),
             (pointer(c_uint64(expire_duration)) if expire_duration else None),
         )
@@ -397,8 +922,26 @@ class K2hash:  # noqa: pylint: disable=too-many-instance-attributes,too-many-pub
             LOG.error("error in k2h_transaction_param_we")
         return res
 
+    def _reopen(self):
+        """
+        Opens the k2h file again in a forked child with the original parameters.
+
+        The inherited handle is dropped without k2h_close, which would release the
+        file of the parent. The child never removes the file. Memory and temporary
+        file handles are kept, because their data can not be opened again.
+        """
+        if not self._k2hfile or self._flag == OpenFlag.TEMPFILE:
+            return
+        self._removefile = False
+        try:
+            self._set_k2h_handle()
+        except RuntimeError:
+            LOG.error("unable to reopen %s after fork", self._k2hfile)
+            self._handle = self.__class__.K2H_INVALID_HANDLE
+
     def close(self):
         """Closes a k2h file."""
+        _OPENED.discard(self)
         res = self._libk2hash.k2h_close_wait(self._handle, self._waitms)
         if not res:
             LOG.error("error in k2h_close_wait")
@@ -503,33 +1046,40 @@ class K2hash:  # noqa: pylint: disable=too-many-instance-attributes,too-many-pub
         return res
 
     def get_attributes(self, key, use_str=True):
-        """Gets attributes of a key."""
+        """Gets attributes of a key.
+
+        Names and values are bytes objects as stored if use_str is False, so an
+        attribute set by set_attribute keeps its terminating NUL.
+        """
         if not isinstance(key, str):
             raise TypeError("key should currently be a str object")
         if not key:
             raise ValueError("key should not be empty")
+        return self._get_attributes(key.encode(), use_str)
+
+    def _get_attributes(self, bkey, use_str):
+        """Gets attributes of a key given as the raw bytes."""
         pattrspckcnt = c_int()
         res = self._libk2hash.k2h_get_direct_attrs(
             self._handle,
-            c_char_p(key.encode()),
-            c_size_t(len(key)),
+            c_char_p(bkey),
+            c_size_t(len(bkey)),
             byref(pattrspckcnt),
         )
         LOG.debug(
             "type(res):{%s} pattrspckcnt.value{%s}", type(res), pattrspckcnt.value
         )
         attrs = {}
-        for i in range(pattrspckcnt.value):
-            key_buf = ctypes.create_string_buffer(res[i].keylength)
-            val_buf = ctypes.create_string_buffer(res[i].vallength)
-            for j in range(res[i].keylength):
-                key_buf[j] = res[i].pkey[j]
-            for k in range(res[i].vallength):
-                val_buf[k] = res[i].pval[k]
-            if use_str:
-                attrs[key_buf.value.decode()] = val_buf.value.decode()
-            else:
-                attrs[key_buf.value] = val_buf.value
+        if not res:
+            return attrs
+        try:
+            for i in range(pattrspckcnt.value):
+                pack = res[i]
+                attrs[_unpack(pack.pkey, pack.keylength, use_str)] = _unpack(
+                    pack.pval, pack.vallength, use_str
+                )
+        finally:
+            self._libk2hash.k2h_free_attrpack(res, pattrspckcnt)
         return attrs
 
     @property
@@ -538,7 +1088,11 @@ class K2hash:  # noqa: pylint: disable=too-many-instance-attributes,too-many-pub
         return self._handle
 
     def get_subkeys(self, key, use_str=True):
-        """Gets keys of subkeys of a key."""
+        """Gets keys of subkeys of a key.
+
+        Subkeys are bytes objects as stored if use_str is False, so a subkey added
+        by add_subkey keeps its terminating NUL.
+        """
         if not isinstance(key, str):
             raise TypeError("key should currently be a str object")
         if not key:
@@ -552,15 +1106,15 @@ class K2hash:  # noqa: pylint: disable=too-many-instance-attributes,too-many-pub
             byref(pskeypckcnt),
         )
         LOG.debug("%s", pskeypckcnt.value)
-        subkeys = []
-        for i in range(pskeypckcnt.value):
-            buf = ctypes.create_string_buffer(res[i].length)
-            for j in range(res[i].length):
-                buf[j] = res[i].pkey[j]
-            if use_str:
-                subkeys.append(buf.value.decode())
-            else:
-                subkeys.append(buf.value)
+        if not res:
+            return []
+        try:
+            subkeys = [
+                _unpack(pack.pkey, pack.length, use_str)
+                for pack in res[: pskeypckcnt.value]
+            ]
+        finally:
+            self._libk2hash.k2h_free_keypack(res, pskeypckcnt)
         return subkeys
 
     def get_tx_file_fd(self):
@@ -904,6 +1458,18 @@ class K2hash:  # noqa: pylint: disable=too-many-instance-attributes,too-many-pub
         libk2hash.k2h_print_version(None)
 
 
+def _after_fork_in_child():
+    """Fixes up the handles inherited by a forked child."""
+    for iterator in list(_ITERATORS):
+        iterator._invalidate()  # noqa: pylint: disable=protected-access
+    for k2h in list(_OPENED):
+        k2h._reopen()  # noqa: pylint: disable=protected-access
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
+
+
 #
 # Local variables:
 # tab-width: 4
@@ -0,0 +1,237 @@
+# -*- coding: utf-8 -*-
+#
+# K2hash Python Driver under MIT License
+#
+# Copyright (c) 2022 Yahoo Japan Corporation
+#
+# For the full copyright and license information, please view
+# the license file that was distributed with this source code.
+#
+# AUTHOR:   Hirotaka Wakabayashi
+# CREATE:   Tue Feb 08 2022
+# REVISION:
+#
+"""K2hash Python Driver under MIT License"""
+from __future__ import absolute_import
+
+import contextlib
+import itertools
+import logging
+import os
+import threading
+import time
+import weakref
+
+from k2hash import K2hash, OpenFlag
+
+LOG = logging.getLogger(__name__)
+
+# pools of this process, whose leases are reset in a child process after fork.
+_POOLS = weakref.WeakSet()
+
+
+class K2hashPool:  # noqa: pylint: disable=too-many-instance-attributes
+    """
+    K2hashPool class leases K2hash handles of a k2hash file to threads.
+
+    A thread leases the same handle each time while it is free, so threads do
+    not contend for handles as long as there are no more threads than handles.
+    A lease in a thread that already holds a handle returns the held handle.
+    """
+
+    def __init__(self, path, size=4, flag=OpenFlag.EDIT, **kwargs):
+        """
+        Initialize a new K2hashPool instnace.
+
+        size handles of path are opened with flag. kwargs are passed to K2hash.
+        """
+        if not isinstance(path, str):
+            raise TypeError("path should be a str object")
+        if not path:
+            raise ValueError("path should not be empty")
+        if not isinstance(size, int):
+            raise TypeError("size should be a int object")
+        if size <= 0:
+            raise ValueError("size should be positive")
+        if not isinstance(flag, OpenFlag):
+            raise TypeError("flag should be a OpenFlag object")
+        if flag == OpenFlag.MEMORY:
+            raise ValueError("flag should not be memory because handles share a file")
+        self._handles = []
+        try:
+            for _ in range(size):
+                self._handles.append(K2hash(path, flag, **kwargs))
+        except:
+            for handle in self._handles:
+                handle.close()
+            raise
+        self._idle = set(range(size))
+        self._cond = threading.Condition()
+        self._local = threading.local()
+        self._affinity = itertools.count()
+        self._created = time.monotonic()
+        self._leases = 0
+        self._affinity_hits = 0
+        self._waits = 0
+        self._wait_seconds = 0.0
+        self._max_wait_seconds = 0.0
+        self._busy_seconds = 0.0
+        self._leased_at = [None] * size
+        _POOLS.add(self)
+
+    @property
+    def size(self):
+        """Returns the number of handles."""
+        return len(self._handles)
+
+    def _take(self, preferred):
+        """Returns the index of an idle handle, preferring preferred, or None."""
+        if preferred in self._idle:
+            self._affinity_hits += 1
+            self._idle.remove(preferred)
+            return preferred
+        if self._idle:
+            return self._idle.pop()
+        return None
+
+    def acquire(self, timeout=None):
+        """
+        Leases a K2hash, waiting at most timeout seconds for a free one.
+
+        Raises TimeoutError if no handle is freed in time. Every acquire should be
+        paired with a release, which lease does.
+        """
+        if timeout is not None and not isinstance(timeout, (int, float)):
+            raise TypeError("timeout should be a int or float object")
+        local = self._local
+        if getattr(local, "depth", 0):
+            local.depth += 1
+            return self._handles[local.held]
+        if getattr(local, "preferred", None) is None:
+            local.preferred = next(self._affinity) % len(self._handles)
+
+        start = time.monotonic()
+        with self._cond:
+            index = self._take(local.preferred)
+            if index is None:
+                self._waits += 1
+                deadline = None if timeout is None else start + timeout
+                while index is None:
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        raise TimeoutError("no k2hash handle is free")
+                    self._cond.wait(remaining)
+                    index = self._take(local.preferred)
+            now = time.monotonic()
+            self._leases += 1
+            self._wait_seconds += now - start
+            self._max_wait_seconds = max(self._max_wait_seconds, now - start)
+            self._leased_at[index] = now
+        local.held = index
+        local.depth = 1
+        return self._handles[index]
+
+    def release(self, k2h):
+        """Returns a K2hash leased by acquire."""
+        local = self._local
+        if not getattr(local, "depth", 0) or self._handles[local.held] is not k2h:
+            raise ValueError("k2h should be leased by this thread")
+        local.depth -= 1
+        if local.depth:
+            return
+        with self._cond:
+            self._busy_seconds += time.monotonic() - self._leased_at[local.held]
+            self._leased_at[local.held] = None
+            self._idle.add(local.held)
+            self._cond.notify()
+
+    @contextlib.contextmanager
+    def lease(self, timeout=None):
+        """Leases a K2hash in a with statement."""
+        k2h = self.acquire(timeout)
+        try:
+            yield k2h
+        finally:
+            self.release(k2h)
+
+    def stats(self):
+        """
+        Returns the pool statistics as a dict.
+
+        utilisation is the leased time of the handles divided by size times the
+        lifetime of the pool.
+        """
+        with self._cond:
+            now = time.monotonic()
+            busy = self._busy_seconds + sum(
+                now - leased_at for leased_at in self._leased_at if leased_at is not None
+            )
+            elapsed = now - self._created
+            return {
+                "size": len(self._handles),
+                "in_use": len(self._handles) - len(self._idle),
+                "leases": self._leases,
+                "affinity_hits": self._affinity_hits,
+                "waits": self._waits,
+                "wait_seconds": self._wait_seconds,
+                "max_wait_seconds": self._max_wait_seconds,
+                "busy_seconds": busy,
+                "utilisation": busy / (len(self._handles) * elapsed) if elapsed else 0.0,
+            }
+
+    def _reset_after_fork(self):
+        """
+        Frees the handles leased by the threads of the parent in a forked child.
+
+        Only the thread that called fork exists in the child, so only its lease
+        is kept. The handles themselves are reopened by K2hash.
+        """
+        local = self._local
+        held = local.held if getattr(local, "depth", 0) else None
+        self._cond = threading.Condition()
+        self._idle = {index for index in range(len(self._handles)) if index != held}
+        self._leased_at = [
+            leased_at if index == held else None
+            for index, leased_at in enumerate(self._leased_at)
+        ]
+
+    def close(self):
+        """Closes the handles."""
+        _POOLS.discard(self)
+        with self._cond:
+            if len(self._idle) != len(self._handles):
+                LOG.warning("closing %s leased handles", len(self._handles) - len(self._idle))
+            results = [handle.close() for handle in self._handles]
+        return all(results)
+
+    def __enter__(self):
+        """Implements the context manager interface"""
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """Implements the context manager interface"""
+        self.close()
+
+    def __repr__(self):
+        """Returns full of members as a string."""
+        return f"<_{self.__class__.__name__} size={len(self._handles)}, handles={self._handles!r}>"
+
+
+def _after_fork_in_child():
+    """Resets the pools inherited by a forked child."""
+    for pool in list(_POOLS):
+        pool._reset_after_fork()  # noqa: pylint: disable=protected-access
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
+
+
+#
+# Local variables:
+# tab-width: 4
+# c-basic-offset: 4
+# End:
+# vim600: expandtab sw=4 ts=4 fdm=marker
+# vim<600: expandtab sw=4 ts=4
+#
@@ -15,7 +15,7 @@
 from __future__ import absolute_import
 
 import logging
-from ctypes import c_char_p, c_int, c_uint64, pointer
+from ctypes import byref, c_char_p, c_int, pointer
 
 from k2hash import K2hash, BaseQueue
 
@@ -33,7 +33,11 @@ class KeyQueue(BaseQueue):  # noqa: pylint: disable=too-many-instance-attributes
         """
         Initialize a new KeyQueue instnace.
         """
-        super().__init__(k2h, fifo=True, prefix=None, password=None, expire_duration=None)
+        super().__init__(k2h, fifo, prefix, password, expire_duration)
+        self._handle = self._open_handle()
+
+    def _open_handle(self):
+        """Returns a new queue handle of the k2h handle."""
         handle = self._libk2hash.k2h_keyq_handle_str_prefix(
             self._k2h_handle,
             self._fifo,
@@ -42,7 +46,7 @@ class KeyQueue(BaseQueue):  # noqa: pylint: disable=too-many-instance-attributes
 
         if handle == K2hash.K2H_INVALID_HANDLE:
             raise RuntimeError("handle should not be K2H_INVALID_HANDLE")
-        self._handle = handle
+        return handle
 
     def put(self, obj):
         """Inserts an element into the tail of this queue."""
@@ -61,15 +65,12 @@ class KeyQueue(BaseQueue):  # noqa: pylint: disable=too-many-instance-attributes
                 self._handle,
                 c_char_p(key.encode()),
                 c_char_p(val.encode()),
-                (c_char_p(self._password.encode()) if self._password else None),
-                (
-                    pointer(c_uint64(self._expire_duration))
-                    if self._expire_duration
-                    else None
-                ),
+                self._c_password,
+                self._c_expire,
             )
             if res:
                 LOG.debug("q_push:{%s}", res)
+                self._notify()
             else:
                 return False
         return True
@@ -87,6 +88,7 @@ class KeyQueue(BaseQueue):  # noqa: pylint: disable=too-many-instance-attributes
         Free QueueHandle
         """
         res = self._libk2hash.k2h_keyq_free(self._handle)
+        self._handle = K2hash.K2H_INVALID_HANDLE
         return res
 
     def qsize(self):
@@ -108,7 +110,7 @@ class KeyQueue(BaseQueue):  # noqa: pylint: disable=too-many-instance-attributes
             ppkey,
             ppval,
             c_int(position),
-            (c_char_p(self._password.encode()) if self._password else None),
+            self._c_password,
         )
         res = {}
         if ppkey.contents.value:
@@ -126,45 +128,58 @@ class KeyQueue(BaseQueue):  # noqa: pylint: disable=too-many-instance-attributes
         res = self._libk2hash.k2h_keyq_empty(self._handle)
         return res
 
-    def get(self):
-        """Finds and gets a object from the head of this queue."""
-        ppkey = pointer(c_char_p("".encode()))
-        ppval = pointer(c_char_p("".encode()))
-        res = self._libk2hash.k2h_keyq_str_pop_keyval_wp(
-            self._handle,
-            ppkey,
-            ppval,
-            (c_char_p(self._password.encode()) if self._password else None),
-        )
-        res = {}
-        if ppkey.contents.value:
-            pkey = ppkey.contents.value.decode()
-            self._libc.free(ppkey.contents)
-            res[pkey] = ""
-        if ppval.contents.value:
-            pval = ppval.contents.value.decode()
-            self._libc.free(ppval.contents)
-            res[pkey] = pval
-        return res
+    def get(self, block=False, timeout=None):
+        """
+        Finds and gets a object from the head of this queue.
+
+        Returns {} if the queue is empty, or waits at most timeout seconds for an
+        object to be put if block is True. timeout=None waits forever.
+        """
+        return self._wait_for(lambda: next(self._pop(1), {}), block, timeout)
 
     def print(self):
         """Print the objects in this queue."""
         res = self._libk2hash.k2h_keyq_dump(self._handle, None)
         return res
 
-    def remove(self, count=1):
-        """Removes objects from this queue."""
+    def _pop(self, max_items):
+        """Yields at most max_items {key: val} dicts popped from the head of this queue."""
+        # the out parameters are reused across the pops.
+        pop = self._libk2hash.k2h_keyq_str_pop_keyval_wp
+        free = self._libc.free
+        handle = self._handle
+        cpass = self._c_password
+        pkey = c_char_p()
+        pval = c_char_p()
+        ppkey = byref(pkey)
+        ppval = byref(pval)
+        for _ in range(max_items):
+            if not pop(handle, ppkey, ppval, cpass) or pkey.value is None:
+                break
+            key = pkey.value.decode()
+            free(pkey)
+            pkey.value = None
+            val = ""
+            if pval.value is not None:
+                val = pval.value.decode()
+                free(pval)
+                pval.value = None
+            yield {key: val}
+
+    def remove(self, count=1, callback=None):
+        """
+        Removes at most count objects from the head of this queue.
+
+        Returns the removed objects as a list of {key: val} dicts. If callback is
+        a callable, each dict is passed to it instead and the number of removed
+        objects is returned. If callback is a file object, each dict is written to
+        it as a JSON line.
+        """
         if not isinstance(count, int):
             raise TypeError("count should be a int object")
         if count <= 0:
             raise ValueError("count should be positive")
-
-        vals = []
-        for _ in range(count):
-            val = self._libk2hash.k2h_keyq_remove(self._handle, 1)
-            if val:
-                vals.append(val)
-        return vals
+        return self._drain(self._pop(count), callback)
 
 
 #
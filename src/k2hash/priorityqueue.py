@@ -0,0 +1,233 @@
+# -*- coding: utf-8 -*-
+#
+# K2hash Python Driver under MIT License
+#
+# Copyright (c) 2022 Yahoo Japan Corporation
+#
+# For the full copyright and license information, please view
+# the license file that was distributed with this source code.
+#
+# AUTHOR:   Hirotaka Wakabayashi
+# CREATE:   Tue Feb 08 2022
+# REVISION:
+#
+"""K2hash Python Driver under MIT License"""
+from __future__ import absolute_import
+
+import logging
+import threading
+import time
+
+from k2hash import BaseQueue, Queue
+
+LOG = logging.getLogger(__name__)
+
+
+class PriorityQueue(BaseQueue):  # noqa: pylint: disable=too-many-instance-attributes
+    """
+    PriorityQueue class pops elements from the highest non-empty level of levels Queues.
+
+    Level 0 is the highest priority. The non-empty levels are tracked in memory,
+    so empty levels are not popped. The levels are rechecked with k2h_q_empty
+    every refresh_interval seconds to find elements put by other processes or
+    other PriorityQueue objects.
+    """
+
+    def __init__(  # noqa: pylint: disable=too-many-arguments,too-many-positional-arguments
+        self,
+        k2h,
+        levels=3,
+        prefix="priority",
+        fifo=True,
+        password=None,
+        expire_duration=None,
+        aging=None,
+        refresh_interval=0.01,
+    ):
+        """
+        Initialize a new PriorityQueue instnace.
+
+        The levels are Queues whose prefixes are prefix followed by ":" and the
+        level. If aging is set, a level that has been skipped for aging seconds
+        is popped before the higher levels once.
+        """
+        if not isinstance(levels, int):
+            raise TypeError("levels should be a int object")
+        if levels <= 0:
+            raise ValueError("levels should be positive")
+        if not isinstance(prefix, str):
+            raise TypeError("prefix should be a string object")
+        if not prefix:
+            raise ValueError("prefix should not be empty")
+        if aging is not None and not isinstance(aging, (int, float)):
+            raise TypeError("aging should be a int or float object")
+        if aging is not None and aging <= 0:
+            raise ValueError("aging should be positive")
+        if not isinstance(refresh_interval, (int, float)):
+            raise TypeError("refresh_interval should be a int or float object")
+        if refresh_interval < 0:
+            raise ValueError("refresh_interval should not be negative")
+        super().__init__(k2h, fifo, prefix, password, expire_duration)
+        self._aging = aging
+        self._refresh_interval = refresh_interval
+        self._levels = [
+            Queue(k2h, fifo, f"{prefix}:{i}", password, expire_duration)
+            for i in range(levels)
+        ]
+        self._lock = threading.Lock()
+        self._nonempty = [False] * levels
+        # the time when a non-empty level was first skipped for a higher one.
+        self._skipped_since = [None] * levels
+        self._next_refresh = 0.0
+
+    def _reopen(self):
+        """Fixes up the queue in a forked child and replaces the level lock."""
+        super()._reopen()
+        self._lock = threading.Lock()
+
+    @property
+    def levels(self):
+        """Returns the list of the level Queues."""
+        return list(self._levels)
+
+    def _check_priority(self, priority):
+        """Raises an error if priority is not a level."""
+        if not isinstance(priority, int):
+            raise TypeError("priority should be a int object")
+        if not 0 <= priority < len(self._levels):
+            raise ValueError(f"priority should be between 0 and {len(self._levels) - 1}")
+
+    def _refresh(self, force=False):
+        """Rechecks the levels if refresh_interval has passed."""
+        now = time.monotonic()
+        if not force and now < self._next_refresh:
+            return
+        self._next_refresh = now + self._refresh_interval
+        for level, queue in enumerate(self._levels):
+            self._nonempty[level] = not queue.empty()
+
+    def _order(self):
+        """Returns the non-empty levels in the order to pop them."""
+        self._refresh()
+        levels = [level for level, nonempty in enumerate(self._nonempty) if nonempty]
+        if self._aging is None or len(levels) < 2:
+            return levels
+        now = time.monotonic()
+        starving = [
+            level
+            for _, level in sorted(
+                (self._skipped_since[level], level)
+                for level in levels[1:]
+                if self._skipped_since[level] is not None
+                and now - self._skipped_since[level] >= self._aging
+            )
+        ]
+        return starving + [level for level in levels if level not in starving]
+
+    def _pop(self, max_items):
+        """Returns at most max_items objects popped from the levels in order."""
+        with self._lock:
+            order = self._order()
+        vals = []
+        served = set()
+        for level in order:
+            if len(vals) >= max_items:
+                break
+            wanted = max_items - len(vals)
+            popped = self._levels[level].get_many(wanted)
+            vals += popped
+            served.add(level)
+            if len(popped) < wanted:
+                with self._lock:
+                    self._nonempty[level] = False
+        now = time.monotonic()
+        with self._lock:
+            for level in order:
+                if level in served:
+                    self._skipped_since[level] = None
+                elif self._skipped_since[level] is None:
+                    self._skipped_since[level] = now
+        return vals
+
+    def put(self, obj, priority=0, attrs=None):
+        """Inserts an element into the tail of the level of priority."""
+        self._check_priority(priority)
+        res = self._levels[priority].put(obj, attrs)
+        if res:
+            with self._lock:
+                self._nonempty[priority] = True
+            self._notify()
+        return res
+
+    def put_many(self, objs, priority=0, attrs=None):
+        """Inserts elements into the level of priority and returns the number of them."""
+        self._check_priority(priority)
+        count = self._levels[priority].put_many(objs, attrs)
+        if count:
+            with self._lock:
+                self._nonempty[priority] = True
+            self._notify(count)
+        return count
+
+    def get(self, block=False, timeout=None):
+        """
+        Finds and gets a object from the highest non-empty level.
+
+        See Queue.get for block and timeout.
+        """
+        return self._wait_for(lambda: next(iter(self._pop(1)), ""), block, timeout)
+
+    def get_many(self, max_items, block=False, timeout=None):
+        """Finds and gets at most max_items objects from the levels in priority order."""
+        if not isinstance(max_items, int):
+            raise TypeError("max_items should be a int object")
+        if max_items <= 0:
+            raise ValueError("max_items should be positive")
+        first = self._wait_for(lambda: next(iter(self._pop(1)), ""), block, timeout)
+        if not first:
+            return []
+        return [first] + (self._pop(max_items - 1) if max_items > 1 else [])
+
+    def remove(self, count=1, callback=None):
+        """Removes at most count objects in priority order. See Queue.remove."""
+        if not isinstance(count, int):
+            raise TypeError("count should be a int object")
+        if count <= 0:
+            raise ValueError("count should be positive")
+        return self._drain(self._pop(count), callback)
+
+    def qsize(self, priority=None):
+        """Returns the number of elements of a level, or of all levels if priority is None."""
+        if priority is None:
+            return sum(queue.qsize() for queue in self._levels)
+        self._check_priority(priority)
+        return self._levels[priority].qsize()
+
+    def empty(self):
+        """Returns true if, and only if, all levels are empty."""
+        with self._lock:
+            self._refresh(force=True)
+            return not any(self._nonempty)
+
+    def clear(self):
+        """Removes all of the elements from the levels."""
+        results = [queue.clear() for queue in self._levels]
+        with self._lock:
+            self._nonempty = [False] * len(self._levels)
+            self._skipped_since = [None] * len(self._levels)
+        return all(results)
+
+    def close(self):
+        """Frees the handles of the levels."""
+        results = [queue.close() for queue in self._levels]
+        return all(results)
+
+
+#
+# Local variables:
+# tab-width: 4
+# c-basic-offset: 4
+# End:
+# vim600: expandtab sw=4 ts=4 fdm=marker
+# vim<600: expandtab sw=4 ts=4
+#
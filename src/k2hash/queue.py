@@ -14,10 +14,9 @@
 """K2hash Python Driver under MIT License"""
 from __future__ import absolute_import
 
-import copy
 import logging
-from ctypes import (POINTER, c_char_p, c_int, c_size_t, c_ubyte, c_uint64,
-                    cast, pointer)
+from ctypes import (POINTER, byref, c_char_p, c_int, c_size_t, c_ubyte, cast,
+                    pointer)
 
 from k2hash import AttrPack, K2hash, BaseQueue
 
@@ -35,7 +34,11 @@ class Queue(BaseQueue):  # noqa: pylint:disable=too-many-instance-attributes
         """
         Initialize a new Queue instnace.
         """
-        super().__init__(k2h, fifo=True, prefix=None, password=None, expire_duration=None)
+        super().__init__(k2h, fifo, prefix, password, expire_duration)
+        self._handle = self._open_handle()
+
+    def _open_handle(self):
+        """Returns a new queue handle of the k2h handle."""
         handle = self._libk2hash.k2h_q_handle_str_prefix(
             self._k2h_handle,
             self._fifo,
@@ -44,54 +47,77 @@ class Queue(BaseQueue):  # noqa: pylint:disable=too-many-instance-attributes
 
         if handle == K2hash.K2H_INVALID_HANDLE:
             raise RuntimeError("handle should not be K2H_INVALID_HANDLE")
-        self._handle = handle
+        return handle
+
 
+    @staticmethod
+    def _attr_pack_array(attrs):
+        """Returns an AttrPack array built from attrs and its length."""
+        if not attrs:
+            return None, 0
+        if not isinstance(attrs, dict):
+            raise TypeError("attrs should be a dict")
+        ap_array = (AttrPack * len(attrs))()
+        for attr_pack, (key, val) in zip(ap_array, attrs.items()):
+            key_bin = key.encode()
+            attr_pack.pkey = cast(key_bin, POINTER(c_ubyte))
+            attr_pack.keylength = c_size_t(len(key_bin))
+            val_bin = val.encode()
+            attr_pack.pval = cast(val_bin, POINTER(c_ubyte))
+            attr_pack.vallength = c_size_t(len(val_bin))
+        return ap_array, len(attrs)
 
     def put(self, obj, attrs=None):
         """Inserts an element into the tail of this queue."""
-        value = []
         if not isinstance(obj, list) and not isinstance(obj, str):
             raise TypeError("obj should be a str or list object")
         if not obj:
             raise ValueError("obj should not be empty")
         if isinstance(obj, list):
-            value += copy.deepcopy(obj)
-        elif isinstance(obj, str):
-            value.append(obj)
-
-        if attrs and not isinstance(attrs, dict):
-            raise TypeError("attrs should be a dict")
-        ap_array_pointer = None
-        ap_array = None
-        if attrs:
-            attrpack_len = len(attrs)
-            ap_array = AttrPack * attrpack_len
-            ap_list = []
-            for key, val in attrs.items():
-                attr_pack = AttrPack()
-                key_bin = key.encode()
-                attr_pack.pkey = cast(key_bin, POINTER(c_ubyte))
-                attr_pack.keylength = c_size_t(len(key_bin))
-                val_bin = val.encode()
-                attr_pack.pval = cast(val_bin, POINTER(c_ubyte))
-                attr_pack.vallength = c_size_t(len(val_bin))
-                ap_list.append(attr_pack)
-            ap_array_pointer = pointer(ap_array()[0])
+            return self.put_many(obj, attrs) == len(obj)
 
+        ap_array, ap_count = self._attr_pack_array(attrs)
         res = self._libk2hash.k2h_q_str_push_wa(
             self._handle,
             c_char_p(obj.encode()),
-            (ap_array_pointer if ap_array else None),
-            0,
-            (c_char_p(self._password.encode()) if self._password else None),
-            (
-                pointer(c_uint64(self._expire_duration))
-                if self._expire_duration
-                else None
-            ),
+            ap_array,
+            ap_count,
+            self._c_password,
+            self._c_expire,
         )
+        if res:
+            self._notify()
         return res
 
+    def put_many(self, objs, attrs=None):
+        """Inserts elements into the tail of this queue and returns the number of them."""
+        if isinstance(objs, str):
+            raise TypeError("objs should be an iterable of str objects")
+        values = []
+        for obj in objs:
+            if not isinstance(obj, str):
+                raise TypeError("obj should be a str object")
+            if not obj:
+                raise ValueError("obj should not be empty")
+            values.append(obj.encode())
+        ap_array, ap_count = self._attr_pack_array(attrs)
+
+        # each element is pushed by a call of its own, so that libk2hash holds
+        # the queue lock only for a push and consumers interleave with us.
+        push = self._libk2hash.k2h_q_str_push_wa
+        handle = self._handle
+        cpass = self._c_password
+        pexpire = self._c_expire
+        count = 0
+        for value in values:
+            if not push(handle, value, ap_array, ap_count, cpass, pexpire):
+                LOG.error("error in k2h_q_str_push_wa")
+                break
+            count += 1
+        if count:
+            self._notify(count)
+        return count
+
     def clear(self):
         """Removes all of the elements from this collection (optional operation)."""
         count = self.qsize()
@@ -105,6 +131,7 @@ class Queue(BaseQueue):  # noqa: pylint:disable=too-many-instance-attributes
         Free QueueHandle
         """
         res = self._libk2hash.k2h_q_free(self._handle)
+        self._handle = K2hash.K2H_INVALID_HANDLE
         return res
 
     def qsize(self):
@@ -126,7 +153,7 @@ class Queue(BaseQueue):  # noqa: pylint:disable=too-many-instance-attributes
             ppdata,
             pdatalen,
             c_int(position),
-            (c_char_p(self._password.encode()) if self._password else None),
+            self._c_password,
         )
         datalen = pdatalen.contents.value
         if datalen > 0:
@@ -140,40 +167,66 @@ class Queue(BaseQueue):  # noqa: pylint:disable=too-many-instance-attributes
         res = self._libk2hash.k2h_q_empty(self._handle)
         return res
 
-    def get(self):
-        """Finds and gets a object from the head of this queue."""
-        ppval = pointer(c_char_p("".encode()))
-        res = self._libk2hash.k2h_q_str_pop_wp(
-            self._handle,
-            ppval,
-            (c_char_p(self._password.encode()) if self._password else None),
-        )
+    def get(self, block=False, timeout=None):
+        """
+        Finds and gets a object from the head of this queue.
 
-        if res and ppval.contents.value:
-            pval = ppval.contents.value.decode()
-            if ppval.contents:
-                self._libc.free(ppval.contents)
-            return pval
-        return ""
+        Returns "" if the queue is empty, or waits at most timeout seconds for an
+        object to be put if block is True. timeout=None waits forever.
+        """
+        return self._wait_for(lambda: next(self._pop(1), ""), block, timeout)
+
+    def _pop(self, max_items):
+        """Yields at most max_items objects popped from the head of this queue."""
+        # the out parameter is reused across the pops.
+        pop = self._libk2hash.k2h_q_str_pop_wp
+        free = self._libc.free
+        handle = self._handle
+        cpass = self._c_password
+        pval = c_char_p()
+        ppval = byref(pval)
+        for _ in range(max_items):
+            if not pop(handle, ppval, cpass) or pval.value is None:
+                break
+            val = pval.value.decode()
+            free(pval)
+            pval.value = None
+            yield val
+
+    def get_many(self, max_items, block=False, timeout=None):
+        """
+        Finds and gets at most max_items objects from the head of this queue.
+
+        If block is True, waits at most timeout seconds for the first object.
+        """
+        if not isinstance(max_items, int):
+            raise TypeError("max_items should be a int object")
+        if max_items <= 0:
+            raise ValueError("max_items should be positive")
+        first = self._wait_for(lambda: next(self._pop(1), ""), block, timeout)
+        if not first:
+            return []
+        return [first] + list(self._pop(max_items - 1))
 
     def print(self):
         """Print the objects in this queue."""
         res = self._libk2hash.k2h_q_dump(self._handle, None)
         return res
 
-    def remove(self, count=1):
-        """Removes objects from this queue."""
+    def remove(self, count=1, callback=None):
+        """
+        Removes at most count objects from the head of this queue.
+
+        Returns the removed objects as a list. If callback is a callable, each
+        object is passed to it instead and the number of removed objects is
+        returned. If callback is a file object, each object is written to it as a
+        JSON line.
+        """
         if not isinstance(count, int):
             raise TypeError("count should be a int object")
         if count <= 0:
             raise ValueError("count should be positive")
-
-        vals = []
-        for _ in range(count):
-            val = self._libk2hash.k2h_q_remove(self._handle, 1)
-            if val:
-                vals.append(val)
-        return vals
+        return self._drain(self._pop(count), callback)
 
 #
 # Local variables:
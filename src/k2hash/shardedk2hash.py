@@ -0,0 +1,492 @@
+# -*- coding: utf-8 -*-
+#
+# K2hash Python Driver under MIT License
+#
+# Copyright (c) 2022 Yahoo Japan Corporation
+#
+# For the full copyright and license information, please view
+# the license file that was distributed with this source code.
+#
+# AUTHOR:   Hirotaka Wakabayashi
+# CREATE:   Tue Feb 08 2022
+# REVISION:
+#
+"""K2hash Python Driver under MIT License"""
+from __future__ import absolute_import
+
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from k2hash import HashRing, K2hash, TimeUnit
+from k2hash.snapshot import _write_snapshot
+
+LOG = logging.getLogger(__name__)
+
+
+class ShardedK2hash:  # noqa: pylint: disable=too-many-public-methods
+    """
+    ShardedK2hash class spreads keys over several k2hash files by consistent hashing.
+
+    Each file has its own libk2hash handle and locks, so writes to different
+    shards run in parallel. A subkey is stored in the shard of its parent key,
+    which shard_of(key) returns. add_shard and remove_shard move only the keys
+    whose shard changes, while reads keep finding keys that are not moved yet.
+    The shards and the ring are replaced rather than modified, so threads keep
+    reading and writing while a shard is added or removed.
+    """
+
+    def __init__(self, paths, vnodes=160, max_workers=None, **kwargs):
+        """
+        Initialize a new ShardedK2hash instnace.
+
+        paths is a list of k2hash file paths, or of K2hash objects. A shard is
+        named by its path, or "shard<position>" for a K2hash object. vnodes is
+        the number of points of a shard on the hash ring. max_workers bounds the
+        threads that read and write the shards in parallel, by default the larger
+        of the number of shards and the default of ThreadPoolExecutor. kwargs are
+        passed to K2hash for each path.
+        """
+        if not isinstance(paths, (list, tuple)):
+            raise TypeError("paths should be a list object")
+        if not paths:
+            raise ValueError("paths should not be empty")
+        for path in paths:
+            if not isinstance(path, (str, K2hash)):
+                raise TypeError("path should be a str or K2hash object")
+        if max_workers is None:
+            max_workers = max(len(paths), min(32, (os.cpu_count() or 1) + 4))
+        if not isinstance(max_workers, int):
+            raise TypeError("max_workers should be a int object")
+        if max_workers <= 0:
+            raise ValueError("max_workers should be positive")
+        self._kwargs = kwargs
+        self._shards = {}
+        try:
+            for i, path in enumerate(paths):
+                name = path if isinstance(path, str) else f"shard{i}"
+                self._shards[name] = self._open(path)
+        except:
+            for shard in self._shards.values():
+                shard.close()
+            raise
+        self._ring = HashRing(list(self._shards), vnodes)
+        # the ring before add_shard or remove_shard, while keys are moved.
+        self._previous_ring = None
+        # threads are started on demand, so the pool serves added shards too.
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="k2hash-shard"
+        )
+        # serializes add_shard and remove_shard.
+        self._resize_lock = threading.Lock()
+
+    def _open(self, path):
+        """Returns the K2hash of path."""
+        return path if isinstance(path, K2hash) else K2hash(path, **self._kwargs)
+
+    @property
+    def shards(self):
+        """Returns the list of the K2hash shards."""
+        return list(self._shards.values())
+
+    @property
+    def ring(self):
+        """Returns the HashRing that routes keys."""
+        return self._ring
+
+    def shard_of(self, key):
+        """Returns the K2hash shard that stores key."""
+        return self._shards[self._ring.node_for(key)]
+
+    def _locations(self, key):
+        """Returns the shards to read key from, the new one first."""
+        shard = self.shard_of(key)
+        previous_ring = self._previous_ring
+        if previous_ring is not None:
+            previous = self._shards[previous_ring.node_for(key)]
+            if previous is not shard:
+                return [shard, previous]
+        return [shard]
+
+    def _group(self, keys, ring):
+        """Returns {shard name: [positions of keys]}."""
+        groups = {}
+        for i, key in enumerate(keys):
+            groups.setdefault(ring.node_for(key), []).append(i)
+        return groups
+
+    def _read(self, method, key, *args, empty=""):
+        """Calls method of the shards of key until one returns a non-empty value."""
+        val = empty
+        for shard in self._locations(key):
+            val = getattr(shard, method)(key, *args)
+            if val:
+                return val
+        return val
+
+    def set(  # noqa: pylint: disable=too-many-arguments,too-many-positional-arguments
+        self, key, val, password=None, expire_duration=None, time_unit=TimeUnit.SECONDS
+    ):
+        """Sets a key/value pair."""
+        return self.shard_of(key).set(key, val, password, expire_duration, time_unit)
+
+    def get(self, key, password=None):
+        """Gets the value of key."""
+        return self._read("get", key, password)
+
+    def set_bytes(  # noqa: pylint: disable=too-many-arguments,too-many-positional-arguments
+        self, key, val, password=None, expire_duration=None, time_unit=TimeUnit.SECONDS
+    ):
+        """Sets a key/binary value pair."""
+        return self.shard_of(key).set_bytes(key, val, password, expire_duration, time_unit)
+
+    def get_bytes(self, key, password=None):
+        """Gets the value of key as a bytes object."""
+        return self._read("get_bytes", key, password, empty=b"")
+
+    def exists(self, key, password=None):
+        """Returns True if the key exists."""
+        return self._read("exists", key, password, empty=False)
+
+    def __contains__(self, key):
+        """Returns True if the key exists."""
+        return isinstance(key, str) and bool(key) and self.exists(key)
+
+    def remove(self, key, remove_all_subkeys=False):
+        """Removes a key."""
+        results = [shard.remove(key, remove_all_subkeys) for shard in self._locations(key)]
+        return results[0]
+
+    def add_subkey(  # noqa: pylint: disable=too-many-arguments,too-many-positional-arguments
+        self,
+        key,
+        subkey,
+        subval,
+        password=None,
+        expire_duration=None,
+        time_unit=TimeUnit.SECONDS,
+    ):
+        """Adds a subkey to key in the shard of key."""
+        return self.shard_of(key).add_subkey(
+            key, subkey, subval, password, expire_duration, time_unit
+        )
+
+    def set_subkeys(  # noqa: pylint: disable=too-many-arguments,too-many-positional-arguments
+        self,
+        key,
+        subkeys,
+        password=None,
+        expire_duration=None,
+        time_unit=TimeUnit.SECONDS,
+    ):
+        """Sets subkeys of key in the shard of key."""
+        return self.shard_of(key).set_subkeys(
+            key, subkeys, password, expire_duration, time_unit
+        )
+
+    def get_subkeys(self, key, use_str=True):
+        """Gets subkeys of a key."""
+        return self._read("get_subkeys", key, use_str, empty=[])
+
+    def remove_subkeys(self, key, subkeys):
+        """Removes subkeys from the key."""
+        return self.shard_of(key).remove_subkeys(key, subkeys)
+
+    def get_attributes(self, key, use_str=True):
+        """Gets attributes of a key."""
+        return self._read("get_attributes", key, use_str, empty={})
+
+    def set_attribute(self, key, attr_name, attr_val):
+        """Sets an attribute of a key."""
+        return self.shard_of(key).set_attribute(key, attr_name, attr_val)
+
+    def _get_many(self, keys, password, ring):
+        """Gets the values of keys from the shards of ring in parallel threads."""
+        groups = self._group(keys, ring)
+        futures = {
+            name: self._executor.submit(
+                self._shards[name].get_many, [keys[i] for i in positions], password
+            )
+            for name, positions in groups.items()
+        }
+        vals = [""] * len(keys)
+        for name, positions in groups.items():
+            for i, val in zip(positions, futures[name].result()):
+                vals[i] = val
+        return vals
+
+    def get_many(self, keys, password=None):
+        """Gets the values of keys, reading the shards in parallel threads."""
+        if not isinstance(keys, list):
+            raise TypeError("keys should be a list object")
+        vals = self._get_many(keys, password, self._ring)
+        previous_ring = self._previous_ring
+        if previous_ring is not None:
+            # reads the keys that are not moved yet from their previous shards.
+            misses = [
+                i
+                for i, val in enumerate(vals)
+                if not val and previous_ring.node_for(keys[i]) != self._ring.node_for(keys[i])
+            ]
+            if misses:
+                fetched = self._get_many([keys[i] for i in misses], password, previous_ring)
+                for i, val in zip(misses, fetched):
+                    vals[i] = val
+        return vals
+
+    def set_many(
+        self, mapping, password=None, expire_duration=None, time_unit=TimeUnit.SECONDS
+    ):
+        """Sets key/value pairs in mapping, writing the shards in parallel threads."""
+        if not isinstance(mapping, dict):
+            raise TypeError("mapping should be a dict object")
+        keys = list(mapping)
+        futures = [
+            self._executor.submit(
+                self._shards[name].set_many,
+                {keys[i]: mapping[keys[i]] for i in positions},
+                password,
+                expire_duration,
+                time_unit,
+            )
+            for name, positions in self._group(keys, self._ring).items()
+        ]
+        results = [future.result() for future in futures]
+        return all(results)
+
+    def scan(self, batch_size=1000, with_values=True, with_attrs=False, use_str=True):
+        """
+        Yields lists of at most batch_size items of all shards like K2hash.scan.
+
+        A key may be yielded twice while add_shard or remove_shard moves it.
+        """
+        for shard in self.shards:
+            yield from shard.scan(batch_size, with_values, with_attrs, use_str)
+
+    def export_snapshot(self, path, batch_size=1000):
+        """Writes the pairs of all shards to a snapshot file like K2hash.export_snapshot."""
+        if not isinstance(path, str):
+            raise TypeError("path should be a str object")
+        if not path:
+            raise ValueError("path should not be empty")
+        # a key yielded twice while it is moved is written once.
+        return _write_snapshot(
+            path,
+            (
+                (key, val or b"")
+                for batch in self.scan(batch_size, use_str=False)
+                for key, val in batch
+            ),
+        )
+
+    def __iter__(self):
+        """Yields all keys."""
+        for batch in self.scan(with_values=False):
+            for key, _ in batch:
+                yield key
+
+    @staticmethod
+    def _copy(  # noqa: pylint: disable=too-many-arguments,too-many-positional-arguments
+        key, src, dst, subkeys, password=None, with_value=True
+    ):
+        """
+        Copies key with its subkeys and attributes as bytes and returns True on success.
+
+        If with_value is False, the value of dst is kept and only the subkeys and
+        attributes that dst lacks are copied.
+        """
+        if with_value:
+            if not dst.set_bytes(key, src.get_bytes(key, password), password):
+                return False
+            present_attrs, present_subkeys = set(), set()
+        else:
+            present_attrs = set(dst.get_attributes(key, use_str=False))
+            present_subkeys = set(dst.get_subkeys(key))
+        for attr_name, attr_val in src.get_attributes(key, use_str=False).items():
+            if attr_name in present_attrs:
+                continue
+            try:
+                # set_attribute adds the terminating NUL of the stored bytes again.
+                copied = dst.set_attribute(
+                    key, attr_name.decode().rstrip("\0"), attr_val.decode().rstrip("\0")
+                )
+            except UnicodeDecodeError:
+                copied = False
+            if not copied:
+                LOG.debug("attribute %s of %s is not copied", attr_name, key)
+        for subkey in subkeys:
+            if subkey in present_subkeys:
+                continue
+            # a subkey that can not be read with password keeps key in src.
+            if src.value_length(subkey, password) is None:
+                return False
+            if not dst.add_subkey(key, subkey, src.get_bytes(subkey, password), password):
+                return False
+        return True
+
+    @classmethod
+    def _move(cls, key, src, dst, password=None):
+        """
+        Moves key with its subkeys and attributes and returns the number of subkeys.
+
+        Returns None and leaves key in src if key or a subkey can not be read with
+        password, or if a write to dst fails.
+        """
+        if src.value_length(key, password) is None:
+            LOG.warning("%s can not be read and is not moved", key)
+            return None
+        subkeys = src.get_subkeys(key)
+        # a newer value may have been set to dst since the ring changed. It is
+        # kept, and the subkeys and attributes that it lacks are still copied.
+        # A value that has expired or can not be read is replaced.
+        with_value = dst.value_length(key, password) is None
+        if not cls._copy(key, src, dst, subkeys, password, with_value):
+            LOG.error("%s is not moved", key)
+            if with_value:
+                dst.remove(key, remove_all_subkeys=True)
+            return None
+        src.remove(key, remove_all_subkeys=True)
+        return len(subkeys)
+
+    @staticmethod
+    def _count(shard, batch_size):
+        """Returns the number of keys of a shard."""
+        return sum(len(batch) for batch in shard.scan(batch_size, with_values=False))
+
+    def _rebalance(self, sources, password=None, batch_size=1000):
+        """
+        Moves the keys of sources whose shard has changed and returns the statistics.
+
+        The previous ring is dropped only after a complete pass. If a move raises,
+        readers keep falling back to it until rebalance finishes the pass.
+        """
+        stats = {"scanned": 0, "moved": 0, "subkeys": 0, "skipped": 0}
+        start = time.perf_counter()
+        # counted before the keys are moved into them.
+        others = sum(
+            self._count(shard, batch_size)
+            for name, shard in self._shards.items()
+            if name not in sources
+        )
+        for name in sources:
+            src = self._shards[name]
+            # subkeys move with their parents, so they are not moved by themselves.
+            children = set()
+            candidates = []
+            for batch in src.scan(batch_size, with_values=False):
+                for key, _ in batch:
+                    stats["scanned"] += 1
+                    children.update(src.get_subkeys(key))
+                    if self._ring.node_for(key) != name:
+                        candidates.append(key)
+            for key in candidates:
+                if key not in children:
+                    subkeys = self._move(key, src, self.shard_of(key), password)
+                    if subkeys is None:
+                        stats["skipped"] += 1
+                    else:
+                        stats["subkeys"] += subkeys
+                        stats["moved"] += 1
+        self._previous_ring = None
+        total = stats["scanned"] + others
+        stats["seconds"] = time.perf_counter() - start
+        stats["keys_per_sec"] = (
+            (stats["moved"] + stats["subkeys"]) / stats["seconds"] if stats["seconds"] else 0.0
+        )
+        stats["moved_fraction"] = (stats["moved"] + stats["subkeys"]) / total if total else 0.0
+        LOG.info("rebalanced %s", stats)
+        return stats
+
+    def _finish_rebalance(self, password, batch_size):
+        """Finishes a pass of add_shard or remove_shard that has raised."""
+        if self._previous_ring is not None:
+            self._rebalance(list(self._shards), password, batch_size)
+
+    def rebalance(self, password=None, batch_size=1000):
+        """
+        Moves the keys of all shards whose shard has changed and returns the statistics.
+
+        Call it to finish add_shard or remove_shard after it has raised.
+        """
+        with self._resize_lock:
+            return self._rebalance(list(self._shards), password, batch_size)
+
+    def add_shard(self, path, password=None, batch_size=1000):
+        """
+        Adds a shard and moves the keys that it now owns from the other shards.
+
+        Returns a dict of the number of scanned, moved and skipped keys and moved
+        subkeys, the seconds, the moved keys and subkeys per second and the moved
+        fraction of all keys. A key is skipped and left in its shard if it can not
+        be read with password.
+        """
+        if not isinstance(path, (str, K2hash)):
+            raise TypeError("path should be a str or K2hash object")
+        with self._resize_lock:
+            name = path if isinstance(path, str) else f"shard{len(self._shards)}"
+            if name in self._shards:
+                raise ValueError(f"shard {name} already exists")
+            self._finish_rebalance(password, batch_size)
+            sources = list(self._shards)
+            self._shards = {**self._shards, name: self._open(path)}
+            previous_ring, ring = self._ring, self._ring.copy()
+            ring.add(name)
+            # readers fall back to the previous ring before the new one is used.
+            self._previous_ring = previous_ring
+            self._ring = ring
+            return self._rebalance(sources, password, batch_size)
+
+    def remove_shard(self, name, password=None, batch_size=1000):
+        """
+        Moves all keys of a shard to the other shards and closes it.
+
+        Returns the statistics like add_shard.
+        """
+        with self._resize_lock:
+            if name not in self._shards:
+                raise ValueError(f"shard {name} does not exist")
+            if len(self._shards) == 1:
+                raise ValueError("the last shard should not be removed")
+            if name in self._ring:
+                self._finish_rebalance(password, batch_size)
+                previous_ring, ring = self._ring, self._ring.copy()
+                ring.remove(name)
+                self._previous_ring = previous_ring
+                self._ring = ring
+            # otherwise an earlier remove_shard of name has raised, and this finishes it.
+            stats = self._rebalance([name], password, batch_size)
+            shards = dict(self._shards)
+            shard = shards.pop(name)
+            self._shards = shards
+        shard.close()
+        return stats
+
+    def close(self):
+        """Closes the k2hash files."""
+        self._executor.shutdown()
+        results = [shard.close() for shard in self._shards.values()]
+        return all(results)
+
+    def __enter__(self):
+        """Implements the context manager interface"""
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """Implements the context manager interface"""
+        self.close()
+
+    def __repr__(self):
+        """Returns full of members as a string."""
+        return f"<_{self.__class__.__name__} shards={self._shards!r}, ring={self._ring!r}>"
+
+
+#
+# Local variables:
+# tab-width: 4
+# c-basic-offset: 4
+# End:
+# vim600: expandtab sw=4 ts=4 fdm=marker
+# vim<600: expandtab sw=4 ts=4
+#
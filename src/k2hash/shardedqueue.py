@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+#
+# K2hash Python Driver under MIT License
+#
+# Copyright (c) 2022 Yahoo Japan Corporation
+#
+# For the full copyright and license information, please view
+# the license file that was distributed with this source code.
+#
+# AUTHOR:   Hirotaka Wakabayashi
+# CREATE:   Tue Feb 08 2022
+# REVISION:
+#
+"""K2hash Python Driver under MIT License"""
+from __future__ import absolute_import
+
+import itertools
+import logging
+import os
+import zlib
+
+from k2hash import BaseQueue, Queue
+
+LOG = logging.getLogger(__name__)
+
+
+class ShardedQueue(BaseQueue):
+    """
+    ShardedQueue class spreads the elements over shards Queues to scale producers and consumers.
+
+    put chooses a shard in round robin order, or by the hash of a key if policy
+    is "hash". A consumer pops from its home shard first and steals from the
+    other shards when it is empty. The order is kept within a shard only.
+    """
+
+    POLICIES = ("round_robin", "hash")
+
+    def __init__(  # noqa: pylint: disable=too-many-arguments,too-many-positional-arguments
+        self,
+        k2h,
+        shards=4,
+        prefix="shard",
+        fifo=True,
+        password=None,
+        expire_duration=None,
+        policy="round_robin",
+        home=None,
+    ):
+        """
+        Initialize a new ShardedQueue instnace.
+
+        The shards are Queues whose prefixes are prefix followed by ":" and the
+        shard number. home is the first shard a consumer pops from, which
+        defaults to the process id modulo shards.
+        """
+        if not isinstance(shards, int):
+            raise TypeError("shards should be a int object")
+        if shards <= 0:
+            raise ValueError("shards should be positive")
+        if not isinstance(prefix, str):
+            raise TypeError("prefix should be a string object")
+        if not prefix:
+            raise ValueError("prefix should not be empty")
+        if policy not in self.POLICIES:
+            raise ValueError(f"policy should be one of {self.POLICIES}")
+        if home is not None and not isinstance(home, int):
+            raise TypeError("home should be a int object")
+        super().__init__(k2h, fifo, prefix, password, expire_duration)
+        self._policy = policy
+        self._home = (os.getpid() if home is None else home) % shards
+        self._counter = itertools.count()
+        self._shards = [
+            Queue(k2h, fifo, f"{prefix}:{i}", password, expire_duration)
+            for i in range(shards)
+        ]
+
+    @property
+    def shards(self):
+        """Returns the list of the shard Queues."""
+        return list(self._shards)
+
+    def _shard_of(self, obj, key=None):
+        """Returns the shard number to put obj into."""
+        if self._policy == "hash":
+            name = key if key is not None else obj
+            if not isinstance(name, str):
+                raise TypeError("key should be a str object")
+            return zlib.crc32(name.encode()) % len(self._shards)
+        return next(self._counter) % len(self._shards)
+
+    def _stealing_order(self):
+        """Returns the shards from the home shard on."""
+        return self._shards[self._home:] + self._shards[:self._home]
+
+    def put(self, obj, attrs=None, key=None):
+        """Inserts an element into a shard. key chooses the shard if policy is "hash"."""
+        if isinstance(obj, list):
+            return self.put_many(obj, attrs, key) == len(obj)
+        res = self._shards[self._shard_of(obj, key)].put(obj, attrs)
+        if res:
+            self._notify()
+        return res
+
+    def put_many(self, objs, attrs=None, key=None):
+        """Inserts elements into shards and returns the number of them."""
+        if isinstance(objs, str):
+            raise TypeError("objs should be an iterable of str objects")
+        objs = list(objs)
+        groups = {}
+        if self._policy == "round_robin" and key is None:
+            # spreads the elements evenly in one pass per shard.
+            start = next(self._counter)
+            for i, obj in enumerate(objs):
+                groups.setdefault((start + i) % len(self._shards), []).append(obj)
+        else:
+            for obj in objs:
+                groups.setdefault(self._shard_of(obj, key), []).append(obj)
+        count = 0
+        for shard, group in groups.items():
+            count += self._shards[shard].put_many(group, attrs)
+        if count:
+            self._notify(count)
+        return count
+
+    def _pop(self, max_items):
+        """Yields at most max_items objects, stealing from other shards."""
+        for shard in self._stealing_order():
+            if max_items <= 0:
+                break
+            vals = shard.get_many(max_items)
+            max_items -= len(vals)
+            yield from vals
+
+    def get(self, block=False, timeout=None):
+        """
+        Finds and gets a object from the home shard or another shard.
+
+        See Queue.get for block and timeout.
+        """
+        return self._wait_for(lambda: next(self._pop(1), ""), block, timeout)
+
+    def get_many(self, max_items, block=False, timeout=None):
+        """Finds and gets at most max_items objects from the shards."""
+        if not isinstance(max_items, int):
+            raise TypeError("max_items should be a int object")
+        if max_items <= 0:
+            raise ValueError("max_items should be positive")
+        first = self._wait_for(lambda: next(self._pop(1), ""), block, timeout)
+        if not first:
+            return []
+        return [first] + list(self._pop(max_items - 1))
+
+    def remove(self, count=1, callback=None):
+        """Removes at most count objects from the shards. See Queue.remove."""
+        if not isinstance(count, int):
+            raise TypeError("count should be a int object")
+        if count <= 0:
+            raise ValueError("count should be positive")
+        return self._drain(self._pop(count), callback)
+
+    def qsize(self):
+        """Returns the number of elements in all shards."""
+        return sum(shard.qsize() for shard in self._shards)
+
+    def empty(self):
+        """Returns true if, and only if, all shards are empty."""
+        return all(shard.empty() for shard in self._shards)
+
+    def clear(self):
+        """Removes all of the elements from the shards."""
+        # clears every shard even if one of them fails.
+        results = [shard.clear() for shard in self._shards]
+        return all(results)
+
+    def close(self):
+        """Frees the handles of the shards."""
+        results = [shard.close() for shard in self._shards]
+        return all(results)
+
+
+#
+# Local variables:
+# tab-width: 4
+# c-basic-offset: 4
+# End:
+# vim600: expandtab sw=4 ts=4 fdm=marker
+# vim<600: expandtab sw=4 ts=4
+#
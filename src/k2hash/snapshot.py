@@ -0,0 +1,255 @@
+# -*- coding: utf-8 -*-
+#
+# K2hash Python Driver under MIT License
+#
+# Copyright (c) 2022 Yahoo Japan Corporation
+#
+# For the full copyright and license information, please view
+# the license file that was distributed with this source code.
+#
+# AUTHOR:   Hirotaka Wakabayashi
+# CREATE:   Tue Feb 08 2022
+# REVISION:
+#
+"""K2hash Python Driver under MIT License"""
+from __future__ import absolute_import
+
+import bisect
+import logging
+import mmap
+import os
+import struct
+
+LOG = logging.getLogger(__name__)
+
+# A snapshot file is a header, an index of the offsets of the records sorted by
+# key and the records. Integers are little endian.
+#
+#   header: magic (8 bytes), version (uint32), reserved (uint32), count (uint64)
+#   index:  count offsets (uint64) of the records from the head of the file
+#   record: key length (uint32), value length (uint32), key, value
+_MAGIC = b"K2HSNAP\0"
+_VERSION = 1
+_HEADER = struct.Struct("<8sIIQ")
+_OFFSET = struct.Struct("<Q")
+_RECORD = struct.Struct("<II")
+
+
+def _spill(file, items):
+    """
+    Writes items as records to file in their order and returns their entries.
+
+    An entry is (key, position, size) of a record in file, so only the keys are
+    kept in memory. The entries are sorted by key and hold the last record of a
+    key that is given more than once.
+    """
+    entries = []
+    position = 0
+    for key, val in items:
+        size = _RECORD.size + len(key) + len(val)
+        file.write(_RECORD.pack(len(key), len(val)))
+        file.write(key)
+        file.write(val)
+        entries.append((key, position, size))
+        position += size
+    # the sort is stable, so the last entry of a key is the last given.
+    entries.sort(key=lambda entry: entry[0])
+    return [
+        entry
+        for i, entry in enumerate(entries)
+        if i + 1 == len(entries) or entries[i + 1][0] != entry[0]
+    ]
+
+
+def _write_snapshot(path, items):
+    """
+    Writes (key, value) pairs of bytes objects to a snapshot file at path.
+
+    The records are first written to a temporary file in the order of items,
+    then copied to the snapshot in the order of the keys, so values are never
+    held in memory together. The snapshot is written to a temporary file that
+    replaces path, so readers of an old snapshot at path are not affected.
+    Returns the number of pairs.
+    """
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    spill_path = f"{path}.{os.getpid()}.spill"
+    try:
+        with open(spill_path, "w+b") as spill:
+            entries = _spill(spill, items)
+            spill.flush()
+            with open(tmp_path, "wb") as file:
+                file.write(_HEADER.pack(_MAGIC, _VERSION, 0, len(entries)))
+                offset = _HEADER.size + _OFFSET.size * len(entries)
+                index = bytearray()
+                for _, _, size in entries:
+                    index += _OFFSET.pack(offset)
+                    offset += size
+                file.write(index)
+                if entries:
+                    with mmap.mmap(spill.fileno(), 0, access=mmap.ACCESS_READ) as records:
+                        for _, position, size in entries:
+                            file.write(records[position:position + size])
+        os.replace(tmp_path, path)
+    except:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    finally:
+        if os.path.exists(spill_path):
+            os.remove(spill_path)
+    return len(entries)
+
+
+class _Keys:  # noqa: pylint: disable=too-few-public-methods
+    """Sequence of the keys of a SnapshotReader, which bisect searches."""
+
+    def __init__(self, reader):
+        self._reader = reader
+
+    def __len__(self):
+        return len(self._reader)
+
+    def __getitem__(self, i):
+        return self._reader._key_at(i)  # noqa: pylint: disable=protected-access
+
+
+class SnapshotReader:
+    """
+    SnapshotReader class reads a snapshot file written by K2hash.export_snapshot.
+
+    The file is mapped into memory and keys are looked up by binary search on
+    its sorted index, so no table is built when the file is opened and the
+    processes reading the same snapshot share its pages. get_view returns a
+    memoryview into the mapping without copying the value.
+    """
+
+    def __init__(self, path):
+        """
+        Initialize a new SnapshotReader instnace.
+        """
+        if not isinstance(path, str):
+            raise TypeError("path should be a str object")
+        if not path:
+            raise ValueError("path should not be empty")
+        self._path = path
+        with open(path, "rb") as file:
+            size = os.fstat(file.fileno()).st_size
+            if size < _HEADER.size:
+                raise ValueError(f"{path} should be a k2hash snapshot")
+            self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, _, count = _HEADER.unpack_from(self._mmap, 0)
+        if magic != _MAGIC or size < _HEADER.size + _OFFSET.size * count:
+            self._mmap.close()
+            raise ValueError(f"{path} should be a k2hash snapshot")
+        if version != _VERSION:
+            self._mmap.close()
+            raise ValueError(f"version {version} of {path} is not supported")
+        self._count = count
+        self._keys = _Keys(self)
+
+    def _record_at(self, i):
+        """Returns the positions of the key and the value of the i-th record."""
+        (offset,) = _OFFSET.unpack_from(self._mmap, _HEADER.size + _OFFSET.size * i)
+        keylength, vallength = _RECORD.unpack_from(self._mmap, offset)
+        key_start = offset + _RECORD.size
+        return key_start, key_start + keylength, key_start + keylength + vallength
+
+    def _key_at(self, i):
+        """Returns the i-th key as a bytes object."""
+        key_start, key_end, _ = self._record_at(i)
+        return self._mmap[key_start:key_end]
+
+    def _find(self, key):
+        """Returns the positions of the value of key, or None if key is missing."""
+        if isinstance(key, str):
+            key = key.encode()
+        elif not isinstance(key, bytes):
+            raise TypeError("key should be a str or bytes object")
+        i = bisect.bisect_left(self._keys, key)
+        if i == self._count:
+            return None
+        key_start, key_end, val_end = self._record_at(i)
+        if self._mmap[key_start:key_end] != key:
+            return None
+        return key_end, val_end
+
+    def get_view(self, key):
+        """
+        Returns the value of key as a memoryview into the snapshot, or None.
+
+        The memoryview should be released before the reader is closed.
+        """
+        found = self._find(key)
+        if found is None:
+            return None
+        return memoryview(self._mmap)[found[0]:found[1]]
+
+    def get_bytes(self, key):
+        """Returns the value of key as a bytes object, or None if key is missing."""
+        found = self._find(key)
+        if found is None:
+            return None
+        return self._mmap[found[0]:found[1]]
+
+    @staticmethod
+    def _decode(val):
+        """Returns a value as a str object without the terminating NUL of set()."""
+        if val.endswith(b"\0"):
+            val = val[:-1]
+        return val.decode()
+
+    def get(self, key):
+        """Returns the value of key as a str object, or "" if key is missing."""
+        val = self.get_bytes(key)
+        return self._decode(val) if val is not None else ""
+
+    def items(self, use_str=True):
+        """
+        Yields the (key, value) pairs in the order of the keys.
+
+        Values are bytes objects as stored, like get_bytes, if use_str is False.
+        """
+        for i in range(self._count):
+            key_start, key_end, val_end = self._record_at(i)
+            key = self._mmap[key_start:key_end]
+            val = self._mmap[key_end:val_end]
+            yield (key.decode(), self._decode(val)) if use_str else (key, val)
+
+    def __iter__(self):
+        """Yields the keys in order."""
+        for i in range(self._count):
+            yield self._key_at(i).decode()
+
+    def __len__(self):
+        """Returns the number of keys."""
+        return self._count
+
+    def __contains__(self, key):
+        """Returns True if key is in the snapshot."""
+        return self._find(key) is not None
+
+    def close(self):
+        """Unmaps the snapshot file."""
+        self._mmap.close()
+
+    def __enter__(self):
+        """Implements the context manager interface"""
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """Implements the context manager interface"""
+        self.close()
+
+    def __repr__(self):
+        """Returns full of members as a string."""
+        return f"<_{self.__class__.__name__} path={self._path}, count={self._count}>"
+
+
+#
+# Local variables:
+# tab-width: 4
+# c-basic-offset: 4
+# End:
+# vim600: expandtab sw=4 ts=4 fdm=marker
+# vim<600: expandtab sw=4 ts=4
+#
@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+#
+# K2hash Python Driver under MIT License
+#
+# Copyright (c) 2022 Yahoo Japan Corporation
+#
+# For the full copyright and license information, please view
+# the license file that was distributed with this source code.
+#
+# AUTHOR:   Hirotaka Wakabayashi
+# CREATE:   Tue Feb 08 2022
+# REVISION:
+#
+import asyncio
+import unittest
+
+import k2hash
+from k2hash import aio
+
+
+class TestAsyncK2hash(unittest.IsolatedAsyncioTestCase):
+    async def test_AsyncK2hash_construct(self):
+        self.assertRaises(TypeError, aio.AsyncK2hash, "db")
+        self.assertRaises(ValueError, aio.AsyncK2hash, k2hash.K2hash(), max_workers=0)
+        db = aio.AsyncK2hash(k2hash.K2hash())
+        self.assertTrue(isinstance(db.k2hash, k2hash.K2hash))
+        self.assertTrue(await db.close())
+
+    async def test_AsyncK2hash_get_set(self):
+        async with aio.AsyncK2hash(k2hash.K2hash()) as db:
+            self.assertTrue(await db.set("hello", "world"))
+            self.assertEqual(await db.get("hello"), "world")
+            with self.assertRaises(ValueError):
+                await db.get("")
+
+    async def test_AsyncK2hash_batched(self):
+        async with aio.AsyncK2hash(k2hash.K2hash(), max_batch=16) as db:
+            keys = ["key{}".format(i) for i in range(100)]
+            res = await asyncio.gather(*[db.set(key, key + "val") for key in keys])
+            self.assertTrue(all(res))
+            vals = await asyncio.gather(*[db.get(key) for key in keys + ["nokey"]])
+            self.assertEqual(vals, [key + "val" for key in keys] + [""])
+
+    async def test_AsyncK2hash_aiter(self):
+        async with aio.AsyncK2hash(k2hash.K2hash()) as db:
+            self.assertEqual([key async for key in db], [])
+            self.assertTrue(await db.set_many({"k1": "v1", "k2": "v2"}))
+            self.assertEqual(sorted([key async for key in db]), ["k1", "k2"])
+            batches = [batch async for batch in db.scan(batch_size=1)]
+            self.assertEqual(sorted(batch[0] for batch in batches), [("k1", "v1"), ("k2", "v2")])
+
+
+class TestAsyncQueue(unittest.IsolatedAsyncioTestCase):
+    async def test_AsyncQueue_put_get(self):
+        db = k2hash.K2hash()
+        self.assertRaises(TypeError, aio.AsyncQueue, k2hash.KeyQueue(db))
+        q = aio.AsyncQueue(k2hash.Queue(db))
+        objs = ["v{}".format(i) for i in range(10)]
+        self.assertTrue(all(await asyncio.gather(*[q.put(obj) for obj in objs])))
+        self.assertEqual(await q.qsize(), 10)
+        self.assertEqual(await asyncio.gather(*[q.get() for _ in range(11)]), objs + [""])
+        self.assertTrue(await q.close())
+        db.close()
+
+    async def test_AsyncQueue_get_with_timeout(self):
+        db = k2hash.K2hash()
+        q = aio.AsyncQueue(k2hash.Queue(db))
+        self.assertEqual(await q.get(block=True, timeout=0.1), "")
+        consumer = asyncio.ensure_future(q.get(block=True, timeout=10))
+        await asyncio.sleep(0.1)
+        self.assertTrue(await q.put("v1"))
+        self.assertEqual(await consumer, "v1")
+        self.assertTrue(await q.close())
+        db.close()
+
+    async def test_AsyncQueue_get_cancelled(self):
+        db = k2hash.K2hash()
+        q = aio.AsyncQueue(k2hash.Queue(db))
+        self.assertTrue(await q.put("v1"))
+        getter = asyncio.ensure_future(q.get())
+        # lets the getter submit its pop, then cancels it before the pop returns.
+        await asyncio.sleep(0)
+        getter.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await getter
+        self.assertEqual(await q.get(block=True, timeout=1), "v1")
+        self.assertTrue(await q.close())
+        db.close()
+
+    async def test_AsyncKeyQueue_put_get(self):
+        db = k2hash.K2hash()
+        q = aio.AsyncKeyQueue(k2hash.KeyQueue(db))
+        self.assertTrue(await q.put({"k1": "v1", "k2": "v2"}))
+        self.assertEqual(
+            await asyncio.gather(q.get(), q.get(), q.get()), [{"k1": "v1"}, {"k2": "v2"}, {}]
+        )
+        self.assertTrue(await q.close())
+        db.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
+
+#
+# Local variables:
+# tab-width: 4
+# c-basic-offset: 4
+# End:
+# vim600: expandtab sw=4 ts=4 fdm=marker
+# vim<600: expandtab sw=4 ts=4
+#
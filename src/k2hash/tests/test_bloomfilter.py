@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+#
+# K2hash Python Driver under MIT License
+#
+# Copyright (c) 2022 Yahoo Japan Corporation
+#
+# For the full copyright and license information, please view
+# the license file that was distributed with this source code.
+#
+# AUTHOR:   Hirotaka Wakabayashi
+# CREATE:   Tue Feb 08 2022
+# REVISION:
+#
+import unittest
+
+import k2hash
+
+
+class TestBloomFilter(unittest.TestCase):
+    def test_BloomFilter_construct(self):
+        bf = k2hash.BloomFilter(1000, 0.01)
+        self.assertTrue(isinstance(bf, k2hash.BloomFilter))
+        self.assertEqual(bf.capacity, 1000)
+        self.assertEqual(bf.count, 0)
+        self.assertTrue(bf.nbytes > 0)
+        self.assertRaises(ValueError, k2hash.BloomFilter, 0)
+        self.assertRaises(ValueError, k2hash.BloomFilter, 1000, 1.5)
+
+    def test_BloomFilter_add(self):
+        bf = k2hash.BloomFilter(1000, 0.01)
+        keys = ["key{}".format(i) for i in range(1000)]
+        for key in keys:
+            bf.add(key)
+        self.assertEqual(bf.count, 1000)
+        for key in keys:
+            self.assertTrue(key in bf)
+            self.assertTrue(key.encode() in bf)
+
+    def test_BloomFilter_false_positive_rate(self):
+        bf = k2hash.BloomFilter(10000, 0.01)
+        for i in range(10000):
+            bf.add("key{}".format(i))
+        false_positives = sum(1 for i in range(10000) if "nokey{}".format(i) in bf)
+        self.assertLess(false_positives, 300)
+
+    def test_BloomFilter_clear(self):
+        bf = k2hash.BloomFilter(10)
+        bf.add("hello")
+        bf.clear()
+        self.assertFalse("hello" in bf)
+        self.assertEqual(bf.count, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
+
+#
+# Local variables:
+# tab-width: 4
+# c-basic-offset: 4
+# End:
+# vim600: expandtab sw=4 ts=4 fdm=marker
+# vim<600: expandtab sw=4 ts=4
+#
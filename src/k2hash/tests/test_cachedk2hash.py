@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+#
+# K2hash Python Driver under MIT License
+#
+# Copyright (c) 2022 Yahoo Japan Corporation
+#
+# For the full copyright and license information, please view
+# the license file that was distributed with this source code.
+#
+# AUTHOR:   Hirotaka Wakabayashi
+# CREATE:   Tue Feb 08 2022
+# REVISION:
+#
+import time
+import unittest
+
+import k2hash
+
+
+class _RacingK2hash(k2hash.K2hash):
+    """Sets a new value in the middle of a read, like another thread of the same object."""
+
+    racing = False
+
+    def get(self, key, password=None):
+        val = super().get(key, password)
+        if self.racing:
+            self.racing = False
+            self.set(key, "new")
+        return val
+
+
+class _RacingCachedK2hash(k2hash.CachedK2hash, _RacingK2hash):
+    pass
+
+
+class TestCachedK2hash(unittest.TestCase):
+    def test_CachedK2hash_construct(self):
+        db = k2hash.CachedK2hash(cache_size=2)
+        self.assertTrue(isinstance(db, k2hash.K2hash))
+        self.assertRaises(ValueError, k2hash.CachedK2hash, cache_size=0)
+        db.close()
+
+    def test_CachedK2hash_get(self):
+        db = k2hash.CachedK2hash(cache_size=2)
+        key = "hello"
+        val = "world"
+        self.assertTrue(db.set(key, val))
+        self.assertEqual(db.get(key), val)
+        self.assertEqual(db.get(key), val)
+        info = db.cache_info()
+        self.assertEqual(info["hits"], 2)
+        self.assertEqual(info["size"], 1)
+        self.assertEqual(db.get("nokey"), "")
+        self.assertEqual(db.cache_info()["misses"], 1)
+        db.close()
+
+    def test_CachedK2hash_eviction(self):
+        db = k2hash.CachedK2hash(cache_size=2)
+        self.assertTrue(db.set("k1", "v1"))
+        self.assertTrue(db.set("k2", "v2"))
+        self.assertEqual(db.get("k1"), "v1")
+        self.assertTrue(db.set("k3", "v3"))
+        info = db.cache_info()
+        self.assertEqual(info["evictions"], 1)
+        self.assertEqual(info["size"], 2)
+        # k2 was the least recently used entry.
+        self.assertEqual(db.get("k2"), "v2")
+        self.assertEqual(db.cache_info()["misses"], 1)
+        db.close()
+
+    def test_CachedK2hash_invalidate(self):
+        db = k2hash.CachedK2hash()
+        key = "hello"
+        val = "world"
+        self.assertTrue(db.set(key, val))
+        self.assertEqual(db.get(key), val)
+        self.assertTrue(db.rename(key, "newkey"))
+        self.assertEqual(db.get(key), "")
+        self.assertEqual(db.get("newkey"), val)
+        self.assertTrue(db.remove("newkey"))
+        self.assertEqual(db.get("newkey"), "")
+        self.assertTrue(db.set(key, val))
+        self.assertTrue(db.set_subkeys(key, {"subkey": "subval"}))
+        self.assertEqual(db.get("subkey"), "subval")
+        self.assertTrue(db.remove_subkeys(key, ["subkey"]))
+        self.assertEqual(db.get("subkey"), "")
+        db.close()
+
+    def test_CachedK2hash_expire_duration(self):
+        db = k2hash.CachedK2hash()
+        key = "hello"
+        val = "world"
+        duration = 2
+        self.assertTrue(db.set(key, val, expire_duration=duration))
+        self.assertEqual(db.get(key), val)
+        time.sleep(duration + 1)
+        self.assertEqual(db.get(key), "")
+        db.close()
+
+    def test_CachedK2hash_expire_duration_after_eviction(self):
+        db = k2hash.CachedK2hash(cache_size=1)
+        key = "hello"
+        val = "world"
+        duration = 2
+        self.assertTrue(db.set(key, val, expire_duration=duration))
+        # evicts key, which is read back from the k2hash.
+        self.assertTrue(db.set("other", val))
+        self.assertEqual(db.get(key), val)
+        time.sleep(duration + 1)
+        self.assertEqual(db.get(key), "")
+        db.close()
+
+    def test_CachedK2hash_expire_duration_in_milliseconds(self):
+        db = k2hash.CachedK2hash()
+        key = "hello"
+        self.assertTrue(
+            db.set(key, "world", expire_duration=500, time_unit=k2hash.TimeUnit.MILLISECONDS)
+        )
+        self.assertEqual(db.get(key), "world")
+        self.assertEqual(db.cache_info()["hits"], 1)
+        time.sleep(1)
+        # the entry is dropped 500 milliseconds after the set.
+        db.get(key)
+        self.assertEqual(db.cache_info()["hits"], 1)
+        db.close()
+
+    def test_CachedK2hash_set_during_read_through(self):
+        db = _RacingCachedK2hash()
+        self.assertTrue(k2hash.K2hash.set(db, "hello", "old"))
+        db.racing = True
+        self.assertEqual(db.get("hello"), "old")
+        # the old value read through is not cached over the new one.
+        self.assertEqual(db.get("hello"), "new")
+        self.assertEqual(db.get_many(["hello"]), ["new"])
+        db.close()
+
+    def test_CachedK2hash_get_many(self):
+        db = k2hash.CachedK2hash()
+        self.assertTrue(db.set("k1", "v1"))
+        self.assertTrue(db.set("k2", "v2"))
+        self.assertEqual(db.get_many(["k1", "nokey", "k2"]), ["v1", "", "v2"])
+        self.assertEqual(db.cache_info()["hits"], 2)
+        db.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
+
+#
+# Local variables:
+# tab-width: 4
+# c-basic-offset: 4
+# End:
+# vim600: expandtab sw=4 ts=4 fdm=marker
+# vim<600: expandtab sw=4 ts=4
+#
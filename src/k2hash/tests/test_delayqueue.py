@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+#
+# K2hash Python Driver under MIT License
+#
+# Copyright (c) 2022 Yahoo Japan Corporation
+#
+# For the full copyright and license information, please view
+# the license file that was distributed with this source code.
+#
+# AUTHOR:   Hirotaka Wakabayashi
+# CREATE:   Tue Feb 08 2022
+# REVISION:
+#
+import time
+import unittest
+
+import k2hash
+
+
+class TestDelayQueue(unittest.TestCase):
+    def test_DelayQueue_construct(self):
+        db = k2hash.K2hash()
+        q = k2hash.DelayQueue(db)
+        self.assertTrue(isinstance(q, k2hash.DelayQueue))
+        self.assertRaises(ValueError, k2hash.DelayQueue, db, bucket_seconds=0)
+        self.assertRaises(ValueError, q.put, "v1", -1)
+        self.assertTrue(q.close())
+        db.close()
+
+    def test_DelayQueue_put_without_delay(self):
+        db = k2hash.K2hash()
+        q = k2hash.DelayQueue(db)
+        self.assertTrue(q.put("v1"))
+        self.assertEqual(q.qsize(), 1)
+        self.assertEqual(q.get(), "v1")
+        self.assertTrue(q.close())
+        db.close()
+
+    def test_DelayQueue_put_with_delay(self):
+        db = k2hash.K2hash()
+        q = k2hash.DelayQueue(db, bucket_seconds=0.1)
+        self.assertEqual(q.put_many(["v1", "v2"], delay=0.2), 2)
+        self.assertEqual(q.get(), "")
+        self.assertEqual(q.delayed_size(), 2)
+        self.assertEqual(q.get_many(10, block=True, timeout=5), ["v1", "v2"])
+        self.assertEqual(q.delayed_size(), 0)
+        self.assertTrue(q.close())
+        db.close()
+
+    def test_DelayQueue_promote_across_objects(self):
+        db = k2hash.K2hash()
+        producer = k2hash.DelayQueue(db, bucket_seconds=0.1)
+        consumer = k2hash.DelayQueue(db, bucket_seconds=0.1)
+        self.assertTrue(producer.put("v1", delay=0.1))
+        time.sleep(0.4)
+        self.assertEqual(consumer.promote(), 1)
+        self.assertEqual(consumer.get(), "v1")
+        self.assertTrue(producer.close())
+        self.assertTrue(consumer.close())
+        db.close()
+
+    def test_DelayQueue_promote_partial_put(self):
+        db = k2hash.K2hash()
+        q = k2hash.DelayQueue(db, bucket_seconds=0.1)
+        self.assertEqual(q.put_many(["v1", "v2"], delay=0.1), 2)
+        time.sleep(0.4)
+        put_many = q._ready.put_many
+        # the ready queue takes only the first element of each batch.
+        q._ready.put_many = lambda objs, attrs=None: put_many(objs[:1], attrs)
+        self.assertEqual(q.promote(), 1)
+        self.assertEqual(q.delayed_size(), 1)
+        del q._ready.put_many
+        self.assertEqual(q.promote(), 1)
+        self.assertEqual(sorted(q.get_many(10)), ["v1", "v2"])
+        self.assertEqual(q.delayed_size(), 0)
+        self.assertTrue(q.close())
+        db.close()
+
+    def test_DelayQueue_clear(self):
+        db = k2hash.K2hash()
+        q = k2hash.DelayQueue(db)
+        self.assertTrue(q.put("v1"))
+        self.assertTrue(q.put("v2", delay=60))
+        self.assertTrue(q.clear())
+        self.assertEqual(q.qsize(), 0)
+        self.assertEqual(q.delayed_size(), 0)
+        self.assertTrue(q.close())
+        db.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
+
+#
+# Local variables:
+# tab-width: 4
+# c-basic-offset: 4
+# End:
+# vim600: expandtab sw=4 ts=4 fdm=marker
+# vim<600: expandtab sw=4 ts=4
+#
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+#
+# K2hash Python Driver under MIT License
+#
+# Copyright (c) 2022 Yahoo Japan Corporation
+#
+# For the full copyright and license information, please view
+# the license file that was distributed with this source code.
+#
+# AUTHOR:   Hirotaka Wakabayashi
+# CREATE:   Tue Feb 08 2022
+# REVISION:
+#
+import unittest
+
+import k2hash
+
+
+class TestFilteredK2hash(unittest.TestCase):
+    def test_FilteredK2hash_construct(self):
+        db = k2hash.FilteredK2hash(capacity=100)
+        self.assertTrue(isinstance(db, k2hash.K2hash))
+        self.assertEqual(db.filter_info()["count"], 0)
+        db.close()
+
+    def test_FilteredK2hash_get(self):
+        db = k2hash.FilteredK2hash(capacity=100)
+        key = "hello"
+        val = "world"
+        self.assertTrue(db.set(key, val))
+        self.assertEqual(db.get(key), val)
+        self.assertEqual(db.get("nokey"), "")
+        self.assertEqual(db.get_many([key, "nokey"]), [val, ""])
+        self.assertTrue(db.filter_info()["negatives"] >= 1)
+        db.close()
+
+    def test_FilteredK2hash_rename(self):
+        db = k2hash.FilteredK2hash(capacity=100)
+        key = "hello"
+        val = "world"
+        self.assertTrue(db.set(key, val))
+        self.assertTrue(db.rename(key, "newkey"))
+        self.assertEqual(db.get("newkey"), val)
+        db.close()
+
+    def test_FilteredK2hash_rebuild_filter(self):
+        db = k2hash.K2hash("test_filtered.k2h", flag=k2hash.OpenFlag.EDIT)
+        self.assertTrue(db.set_many({"key{}".format(i): "val" for i in range(50)}))
+        db.close()
+        db = k2hash.FilteredK2hash(
+            "test_filtered.k2h", flag=k2hash.OpenFlag.EDIT, capacity=10
+        )
+        info = db.filter_info()
+        self.assertTrue(info["capacity"] >= 50)
+        self.assertEqual(db.get("key0"), "val")
+        self.assertTrue(db.remove("key0"))
+        self.assertTrue(db.rebuild_filter())
+        self.assertEqual(db.get("key0"), "")
+        db.close()
+
+
+    def test_FilteredK2hash_set_during_rebuild_filter(self):
+        db = k2hash.FilteredK2hash(capacity=10)
+        self.assertTrue(db.set_many({"key{}".format(i): "val" for i in range(50)}))
+        scan = db.scan
+        late = []
+
+        def scan_then_set(*args, **kwargs):
+            yield from scan(*args, **kwargs)
+            # a key written after the scan has passed it.
+            late.append("late{}".format(len(late)))
+            self.assertTrue(db.set(late[-1], "val"))
+
+        db.scan = scan_then_set
+        self.assertTrue(db.rebuild_filter())
+        del db.scan
+        self.assertTrue(late)
+        for key in late:
+            self.assertEqual(db.get(key), "val")
+            self.assertTrue(db.exists(key))
+        db.close()
+
+if __name__ == "__main__":
+    unittest.main()
+
+#
+# Local variables:
+# tab-width: 4
+# c-basic-offset: 4
+# End:
+# vim600: expandtab sw=4 ts=4 fdm=marker
+# vim<600: expandtab sw=4 ts=4
+#
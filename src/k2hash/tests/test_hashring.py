@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+#
+# K2hash Python Driver under MIT License
+#
+# Copyright (c) 2022 Yahoo Japan Corporation
+#
+# For the full copyright and license information, please view
+# the license file that was distributed with this source code.
+#
+# AUTHOR:   Hirotaka Wakabayashi
+# CREATE:   Tue Feb 08 2022
+# REVISION:
+#
+import threading
+import unittest
+
+import k2hash
+
+
+class TestHashRing(unittest.TestCase):
+    def test_HashRing_construct(self):
+        ring = k2hash.HashRing(["n1", "n2"], vnodes=10)
+        self.assertEqual(ring.nodes, ["n1", "n2"])
+        self.assertEqual(ring.vnodes, 10)
+        self.assertEqual(len(ring), 2)
+        self.assertTrue("n1" in ring)
+        self.assertRaises(ValueError, k2hash.HashRing, vnodes=0)
+        self.assertRaises(ValueError, ring.add, "n1")
+        self.assertRaises(ValueError, ring.remove, "n3")
+        self.assertRaises(RuntimeError, k2hash.HashRing().node_for, "key")
+
+    def test_HashRing_node_for(self):
+        ring = k2hash.HashRing(["n1", "n2", "n3"])
+        keys = ["key{}".format(i) for i in range(3000)]
+        owners = [ring.node_for(key) for key in keys]
+        self.assertEqual(owners, [ring.copy().node_for(key) for key in keys])
+        for node in ring.nodes:
+            self.assertTrue(600 < owners.count(node) < 1400)
+
+    def test_HashRing_node_for_threads(self):
+        ring = k2hash.HashRing(["n1", "n2"], vnodes=50)
+        errors = []
+        done = threading.Event()
+
+        def read():
+            while not done.is_set():
+                try:
+                    for i in range(100):
+                        self.assertTrue(ring.node_for("key{}".format(i)) in ("n1", "n2", "n3"))
+                except Exception as ex:  # noqa: pylint: disable=broad-except
+                    errors.append(ex)
+                    return
+
+        readers = [threading.Thread(target=read) for _ in range(4)]
+        for reader in readers:
+            reader.start()
+        for _ in range(200):
+            ring.add("n3")
+            ring.remove("n3")
+        done.set()
+        for reader in readers:
+            reader.join()
+        self.assertEqual(errors, [])
+
+    def test_HashRing_add_moves_few_keys(self):
+        ring = k2hash.HashRing(["n1", "n2", "n3"])
+        keys = ["key{}".format(i) for i in range(3000)]
+        before = [ring.node_for(key) for key in keys]
+        ring.add("n4")
+        after = [ring.node_for(key) for key in keys]
+        moved = [(b, a) for b, a in zip(before, after) if b != a]
+        self.assertTrue(all(a == "n4" for _, a in moved))
+        self.assertTrue(len(moved) < 1200)
+
+
+if __name__ == "__main__":
+    unittest.main()
+
+#
+# Local variables:
+# tab-width: 4
+# c-basic-offset: 4
+# End:
+# vim600: expandtab sw=4 ts=4 fdm=marker
+# vim<600: expandtab sw=4 ts=4
+#
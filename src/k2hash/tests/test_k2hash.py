@@ -13,6 +13,9 @@
 #
 import ctypes
 import logging
+import os
+import tempfile
+import threading
 import time
 import unittest
 
@@ -48,6 +51,68 @@ class TestK2hashIterator(unittest.TestCase):
         db.close()
 
 
+    def test_K2hashIterator_threads(self):
+        db = k2hash.K2hash()
+        keys = ["key{}".format(i) for i in range(1000)]
+        self.assertTrue(db.set_many({key: "val" for key in keys}))
+        found = []
+        with db.get_iterator() as ki:
+
+            def walk():
+                found.extend(list(ki))
+
+            workers = [threading.Thread(target=walk) for _ in range(4)]
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+        self.assertEqual(sorted(found), sorted(keys))
+        db.close()
+
+    def test_K2hashIterator_independent(self):
+        db = k2hash.K2hash()
+        self.assertTrue(isinstance(db, k2hash.K2hash))
+        keys = ["key{}".format(i) for i in range(10)]
+        self.assertTrue(db.set_many({key: "val" for key in keys}))
+        with db.get_iterator() as ki1:
+            self.assertEqual(sorted(ki1), keys)
+        with db.get_iterator() as ki2:
+            self.assertFalse(ki1 is ki2)
+            self.assertEqual(sorted(ki2), keys)
+        db.close()
+
+    def test_K2hashIterator_start_after(self):
+        db = k2hash.K2hash()
+        self.assertTrue(isinstance(db, k2hash.K2hash))
+        keys = ["key{}".format(i) for i in range(10)]
+        self.assertTrue(db.set_many({key: "val" for key in keys}))
+        with db.get_iterator() as ki:
+            head = [next(ki) for _ in range(4)]
+            token = ki.last_key
+        self.assertEqual(token, head[-1])
+        with db.get_iterator(start_after=token) as ki:
+            tail = list(ki)
+        self.assertEqual(sorted(head + tail), keys)
+        # a removed token starts the scan over.
+        self.assertTrue(db.remove(token))
+        with db.get_iterator(start_after=token) as ki:
+            self.assertEqual(sorted(ki), sorted(key for key in keys if key != token))
+        db.close()
+
+    def test_K2hashIterator_next_batch(self):
+        db = k2hash.K2hash()
+        self.assertTrue(isinstance(db, k2hash.K2hash))
+        self.assertTrue(db.set_many({"k1": "v1", "k2": "v2", "k3": "v3"}))
+        with k2hash.K2hashIterator(db) as ki:
+            batch = ki.next_batch(2)
+            self.assertEqual(len(batch), 2)
+            self.assertEqual(ki.last_key, batch[-1][0])
+            batch += ki.next_batch(2)
+            self.assertEqual(dict(batch), {"k1": "v1", "k2": "v2", "k3": "v3"})
+            self.assertEqual(ki.next_batch(2), [])
+        db.close()
+
+
 class TestK2hash(unittest.TestCase):
     def test_K2hash_construct(self):
         db = k2hash.K2hash()
@@ -66,6 +131,42 @@ class TestK2hash(unittest.TestCase):
         self.assertTrue(isinstance(ki, k2hash.K2hashIterator))
         db.close()
 
+    def test_K2hash_scan(self):
+        db = k2hash.K2hash()
+        self.assertTrue(isinstance(db, k2hash.K2hash))
+        mapping = {"key{}".format(i): "val{}".format(i) for i in range(25)}
+        self.assertTrue(db.set_many(mapping))
+        batches = list(db.scan(batch_size=10))
+        self.assertEqual([len(batch) for batch in batches], [10, 10, 5])
+        self.assertEqual(dict(pair for batch in batches for pair in batch), mapping)
+        keys = [pair for batch in db.scan(with_values=False) for pair in batch]
+        self.assertEqual(sorted(keys), sorted((key, None) for key in mapping))
+        self.assertRaises(ValueError, next, db.scan(batch_size=0))
+        db.close()
+
+    def test_K2hash_scan_with_attrs(self):
+        db = k2hash.K2hash()
+        self.assertTrue(isinstance(db, k2hash.K2hash))
+        key = "hello"
+        val = "world"
+        self.assertTrue(db.set(key, val))
+        self.assertTrue(db.set_attribute(key, "attrkey1", "attrval1"))
+        items = [item for batch in db.scan(with_attrs=True) for item in batch]
+        self.assertEqual(items[0][:2], (key, val))
+        self.assertEqual(items[0][2], db.get_attributes(key))
+        self.assertEqual(items[0][2], {"attrkey1": "attrval1"})
+        db.close()
+
+    def test_K2hash_scan_bytes(self):
+        db = k2hash.K2hash()
+        self.assertTrue(db.set_bytes("bin", b"x\x00"))
+        self.assertTrue(db.set("str", "val"))
+        items = dict(item for batch in db.scan(use_str=False) for item in batch)
+        self.assertEqual(items[b"bin"], b"x\x00")
+        self.assertEqual(items[b"bin"], db.get_bytes("bin"))
+        self.assertEqual(items[b"str"], db.get_bytes("str"))
+        db.close()
+
     def test_K2hash_set(self):
         db = k2hash.K2hash()
         self.assertTrue(isinstance(db, k2hash.K2hash))
@@ -84,6 +185,126 @@ class TestK2hash(unittest.TestCase):
         self.assertTrue(db.get(key), val)
         db.close()
 
+    def test_K2hash_set_bytes(self):
+        db = k2hash.K2hash()
+        self.assertTrue(isinstance(db, k2hash.K2hash))
+        key = "hello"
+        val = b"wor\x00ld"
+        self.assertTrue(db.set_bytes(key, val))
+        self.assertEqual(db.get_bytes(key), val)
+        self.assertTrue(db.set_bytes(key, bytearray(val)))
+        self.assertEqual(db.get_bytes(key), val)
+        self.assertTrue(db.set_bytes(key, memoryview(val)[1:]))
+        self.assertEqual(db.get_bytes(key), val[1:])
+        self.assertRaises(TypeError, db.set_bytes, key, "world")
+        db.close()
+
+    def test_K2hash_get_bytes(self):
+        db = k2hash.K2hash()
+        self.assertTrue(isinstance(db, k2hash.K2hash))
+        key = "hello"
+        val = bytes(range(256)) * 32
+        self.assertTrue(db.set_bytes(key, val))
+        self.assertEqual(db.get_bytes(key), val)
+        self.assertEqual(db.get_bytes("nokey"), b"")
+        db.close()
+
+    def test_K2hash_prepare_set(self):
+        db = k2hash.K2hash()
+        self.assertTrue(isinstance(db, k2hash.K2hash))
+        password = "secretstring"
+        prepared_set = db.prepare_set(password=password, expire_duration=60)
+        self.assertTrue(callable(prepared_set))
+        self.assertTrue(prepared_set("hello", "world"))
+        self.assertEqual(db.get("hello", password), "world")
+        self.assertRaises(ValueError, prepared_set, "", "world")
+        self.assertRaises(ValueError, db.prepare_set, None, -1)
+        db.close()
+
+    def test_K2hash_get_many(self):
+        db = k2hash.K2hash()
+        self.assertTrue(isinstance(db, k2hash.K2hash))
+        self.assertTrue(db.set("k1", "v1"))
+        self.assertTrue(db.set("k2", "v2"))
+        self.assertEqual(db.get_many(["k1", "nokey", "k2"]), ["v1", "", "v2"])
+        self.assertEqual(db.get_many([]), [])
+        self.assertRaises(TypeError, db.get_many, ["k1", 1])
+        db.close()
+
+    def test_K2hash_set_many(self):
+        db = k2hash.K2hash()
+        self.assertTrue(isinstance(db, k2hash.K2hash))
+        mapping = {"k{}".format(i): "v{}".format(i) for i in range(100)}
+        self.assertTrue(db.set_many(mapping))
+        self.assertEqual(db.get_many(list(mapping)), list(mapping.values()))
+        self.assertRaises(ValueError, db.set_many, {"": "v"})
+        db.close()
+
+    def test_K2hash_exists(self):
+        db = k2hash.K2hash()
+        self.assertTrue(isinstance(db, k2hash.K2hash))
+        key = "hello"
+        val = "world"
+        self.assertTrue(db.set(key, val))
+        self.assertTrue(db.exists(key))
+        self.assertTrue(key in db)
+        self.assertFalse(db.exists("nokey"))
+        self.assertFalse("nokey" in db)
+        password = "secretstring"
+        self.assertTrue(db.set("secret", val, password=password))
+        self.assertTrue(db.exists("secret"))
+        self.assertTrue(db.exists("secret", password))
+        self.assertTrue(db.exists("secret", "wrongpassword"))
+        db.close()
+
+    def test_K2hash_exists_expired(self):
+        db = k2hash.K2hash()
+        password = "secretstring"
+        self.assertTrue(db.set("hello", "world", expire_duration=1))
+        self.assertTrue(db.set("secret", "world", password=password, expire_duration=1))
+        self.assertTrue(db.exists("hello"))
+        self.assertTrue(db.exists("secret", password))
+        self.assertTrue(db.exists("secret"))
+        time.sleep(2)
+        self.assertEqual(db.get("hello"), "")
+        self.assertFalse(db.exists("hello"))
+        self.assertFalse("hello" in db)
+        self.assertFalse(db.exists("secret", password))
+        self.assertFalse(db.exists("secret"))
+        db.close()
+
+    def test_K2hash_value_length(self):
+        db = k2hash.K2hash()
+        self.assertTrue(isinstance(db, k2hash.K2hash))
+        key = "hello"
+        val = b"x" * 4096
+        self.assertTrue(db.set_bytes(key, val))
+        self.assertEqual(db.value_length(key), len(val))
+        self.assertTrue(db.set(key, "world"))
+        self.assertEqual(db.value_length(key), len("world") + 1)
+        self.assertEqual(db.value_length("nokey"), None)
+        db.close()
+
+    @unittest.skipUnless(os.path.exists("/proc/self/statm"), "requires procfs")
+    def test_K2hash_get_rss(self):
+        def rss():
+            with open("/proc/self/statm") as f:
+                return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+        db = k2hash.K2hash()
+        self.assertTrue(isinstance(db, k2hash.K2hash))
+        key = "hello"
+        val = "w" * 1024
+        self.assertTrue(db.set(key, val))
+        for _ in range(10000):
+            db.get(key)
+        before = rss()
+        for _ in range(1000000):
+            db.get(key)
+        # A leak of the returned buffer would grow RSS by about 1GB.
+        self.assertLess(rss() - before, 32 * 1024 * 1024)
+        db.close()
+
     @unittest.skip("skipping because no plugin lib prepared")
     def test_K2hash_add_attribute_plugin_lib(self):
         db = k2hash.K2hash()
@@ -119,6 +340,9 @@ class TestK2hash(unittest.TestCase):
         self.assertTrue(db.get(subkey), subval)
         self.assertTrue(db.add_subkey(key, subkey, subval), True)
         self.assertTrue(db.get_subkeys(key) == [subkey])
+        self.assertTrue(db.add_subkey(key, "binsubkey", b"a\0b"))
+        self.assertEqual(db.get_bytes("binsubkey"), b"a\0b")
+        self.assertRaises(TypeError, db.add_subkey, key, subkey, 1)
         db.close()
 
     def test_K2hash_begin_tx(self):
@@ -234,6 +458,29 @@ class TestK2hash(unittest.TestCase):
         self.assertTrue(db.get_subkeys(key) == [subkey])
         db.close()
 
+    def test_K2hash_get_subkeys_bytes(self):
+        db = k2hash.K2hash()
+        self.assertTrue(isinstance(db, k2hash.K2hash))
+        key = "hello"
+        val = "world"
+        self.assertTrue(db.set(key, val), True)
+        subkeys = {"subkey{}".format(i): "subval{}".format(i) for i in range(1000)}
+        self.assertTrue(db.set_subkeys(key, subkeys))
+        self.assertEqual(sorted(db.get_subkeys(key)), sorted(subkeys))
+        self.assertEqual(
+            sorted(db.get_subkeys(key, use_str=False)),
+            sorted(subkey.encode() + b"\0" for subkey in subkeys),
+        )
+        self.assertEqual(db.get_subkeys("nokey"), [])
+        attr_key = "attrkey1"
+        attr_val = "attrval1"
+        self.assertTrue(db.set_attribute(key, attr_key, attr_val))
+        self.assertEqual(
+            db.get_attributes(key, use_str=False),
+            {attr_key.encode() + b"\0": attr_val.encode() + b"\0"},
+        )
+        db.close()
+
     def test_K2hash_get_tx_file_fd(self):
         db = k2hash.K2hash()
         self.assertTrue(isinstance(db, k2hash.K2hash))
@@ -469,6 +716,44 @@ class TestK2hash(unittest.TestCase):
     def test_K2hash_version(self):
         self.assertTrue(k2hash.K2hash.version() == None)
 
+    def test_K2hash_export_snapshot(self):
+        db = k2hash.K2hash()
+        pairs = {"key{}".format(i): "val{}".format(i) for i in range(100)}
+        self.assertTrue(db.set_many(pairs))
+        self.assertRaises(TypeError, db.export_snapshot, 1)
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "test.snap")
+            self.assertEqual(db.export_snapshot(path), 100)
+            with k2hash.SnapshotReader(path) as reader:
+                self.assertEqual(list(reader), sorted(pairs))
+                for key, val in pairs.items():
+                    self.assertEqual(reader.get(key), val)
+        db.close()
+
+    @unittest.skipUnless(hasattr(os, "fork"), "fork is not available")
+    def test_K2hash_reopen_after_fork(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            db = k2hash.K2hash(os.path.join(tmpdir, "fork.k2h"), readonly=False)
+            self.assertTrue(db.set("hello", "world"))
+            ki = db.get_iterator()
+            pid = os.fork()
+            if pid == 0:
+                ok = False
+                try:
+                    ok = db.get("hello") == "world" and db.set("child", "value")
+                    next(ki)
+                    ok = False
+                except RuntimeError:
+                    pass
+                finally:
+                    os._exit(0 if ok else 1)
+            _, status = os.waitpid(pid, 0)
+            self.assertEqual(os.WEXITSTATUS(status), 0)
+            self.assertEqual(db.get("child"), "value")
+            self.assertEqual(next(ki), "hello")
+            ki.close()
+            db.close()
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -11,6 +11,7 @@
 # CREATE:   Tue Feb 08 2022
 # REVISION:
 #
+import ctypes
 import logging
 import unittest
 
@@ -25,6 +26,20 @@ class TestK2hashPackage(unittest.TestCase):
         self.assertTrue(libk2hash["c"])
         self.assertTrue(libk2hash["k2hash"])
 
+    def test_configure(self):
+        libk2hash = k2hash.get_library_handle()["k2hash"]
+        k2hash.configure(libk2hash._name)
+        self.assertTrue(k2hash.get_library_handle()["k2hash"])
+        k2hash.configure()
+        self.assertRaises(TypeError, k2hash.configure, 1)
+        self.assertRaises(ValueError, k2hash.configure, "")
+
+    def test_lazy_prototype(self):
+        libk2hash = k2hash.get_library_handle()["k2hash"]
+        func = libk2hash.k2h_find_first
+        self.assertEqual(func.restype, ctypes.c_uint64)
+        self.assertEqual(func.argtypes, [ctypes.c_uint64])
+
     def test_set_log_level(self):
         k2hash.set_log_level(logging.INFO)
         logger = logging.getLogger("k2hash")
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+#
+# K2hash Python Driver under MIT License
+#
+# Copyright (c) 2022 Yahoo Japan Corporation
+#
+# For the full copyright and license information, please view
+# the license file that was distributed with this source code.
+#
+# AUTHOR:   Hirotaka Wakabayashi
+# CREATE:   Tue Feb 08 2022
+# REVISION:
+#
+import os
+import tempfile
+import threading
+import unittest
+
+import k2hash
+
+
+class TestK2hashPool(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "pool.k2h")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_K2hashPool_construct(self):
+        self.assertRaises(ValueError, k2hash.K2hashPool, "")
+        self.assertRaises(ValueError, k2hash.K2hashPool, self.path, size=0)
+        self.assertRaises(
+            ValueError, k2hash.K2hashPool, self.path, flag=k2hash.OpenFlag.MEMORY
+        )
+        pool = k2hash.K2hashPool(self.path, size=2)
+        self.assertEqual(pool.size, 2)
+        self.assertTrue(pool.close())
+
+    def test_K2hashPool_lease(self):
+        with k2hash.K2hashPool(self.path, size=2) as pool:
+            with pool.lease() as db:
+                self.assertTrue(isinstance(db, k2hash.K2hash))
+                self.assertTrue(db.set("hello", "world"))
+                # a nested lease returns the held handle.
+                with pool.lease() as nested:
+                    self.assertTrue(nested is db)
+                self.assertEqual(pool.stats()["in_use"], 1)
+            with pool.lease() as db2:
+                self.assertTrue(db2 is db)
+                self.assertEqual(db2.get("hello"), "world")
+            stats = pool.stats()
+            self.assertEqual(stats["in_use"], 0)
+            self.assertEqual(stats["leases"], 2)
+            self.assertEqual(stats["affinity_hits"], 2)
+            self.assertRaises(ValueError, pool.release, db)
+
+    def test_K2hashPool_timeout(self):
+        with k2hash.K2hashPool(self.path, size=1) as pool:
+            leased = threading.Event()
+            done = threading.Event()
+
+            def hold():
+                with pool.lease():
+                    leased.set()
+                    done.wait(10)
+
+            holder = threading.Thread(target=hold)
+            holder.start()
+            leased.wait(10)
+            self.assertRaises(TimeoutError, pool.acquire, 0.1)
+            done.set()
+            holder.join()
+            with pool.lease(timeout=10) as db:
+                self.assertTrue(isinstance(db, k2hash.K2hash))
+            self.assertEqual(pool.stats()["waits"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
+
+#
+# Local variables:
+# tab-width: 4
+# c-basic-offset: 4
+# End:
+# vim600: expandtab sw=4 ts=4 fdm=marker
+# vim<600: expandtab sw=4 ts=4
+#
@@ -11,7 +11,9 @@
 # CREATE:   Tue Feb 08 2022
 # REVISION:
 #
+import io
 import logging
+import threading
 import time
 import unittest
 
@@ -119,6 +121,20 @@ class TestKeyQueue(unittest.TestCase):
         self.assertTrue(q.close(), True)
         db.close()
 
+    def test_KeyQueue_get_with_timeout(self):
+        db = k2hash.K2hash()
+        q = k2hash.KeyQueue(db)
+        self.assertTrue(isinstance(q, k2hash.KeyQueue))
+        start = time.monotonic()
+        self.assertEqual(q.get(block=True, timeout=0.1), {})
+        self.assertTrue(time.monotonic() - start >= 0.1)
+        producer = threading.Timer(0.1, q.put, [{"k1": "v1"}])
+        producer.start()
+        self.assertEqual(q.get(block=True, timeout=10), {"k1": "v1"})
+        producer.join()
+        self.assertTrue(q.close(), True)
+        db.close()
+
     def test_KeyQueue_print(self):
         db = k2hash.K2hash()
         q = k2hash.KeyQueue(db)
@@ -151,6 +167,63 @@ class TestKeyQueue(unittest.TestCase):
         self.assertTrue(q.close(), True)
         db.close()
 
+    def test_KeyQueue_remove_returns_objs(self):
+        db = k2hash.K2hash()
+        q = k2hash.KeyQueue(db)
+        self.assertTrue(isinstance(q, k2hash.KeyQueue))
+        self.assertTrue(q.put({"k1": "v1", "k2": "v2", "k3": "v3"}))
+        self.assertEqual(q.remove(1), [{"k1": "v1"}])
+        removed = []
+        self.assertEqual(q.remove(10, removed.append), 2)
+        self.assertEqual(removed, [{"k2": "v2"}, {"k3": "v3"}])
+        self.assertTrue(q.qsize() == 0)
+        self.assertTrue(q.close(), True)
+        db.close()
+
+    def test_KeyQueue_remove_to_file(self):
+        db = k2hash.K2hash()
+        q = k2hash.KeyQueue(db)
+        self.assertTrue(isinstance(q, k2hash.KeyQueue))
+        self.assertTrue(q.put({"k1": "v1"}))
+        out = io.StringIO()
+        self.assertEqual(q.remove(1, out), 1)
+        self.assertEqual(out.getvalue(), '{"k1": "v1"}\n')
+        self.assertTrue(q.close(), True)
+        db.close()
+
+    def test_KeyQueue_lifo(self):
+        db = k2hash.K2hash()
+        q = k2hash.KeyQueue(db, fifo=False)
+        self.assertTrue(isinstance(q, k2hash.KeyQueue))
+        self.assertTrue(q.put({"k1": "v1", "k2": "v2"}))
+        self.assertEqual(q.remove(2), [{"k2": "v2"}, {"k1": "v1"}])
+        self.assertTrue(q.close(), True)
+        db.close()
+
+    def test_KeyQueue_prefix_isolation(self):
+        db = k2hash.K2hash()
+        prefixes = ["tenant{}".format(i) for i in range(4)]
+        queues = {prefix: k2hash.KeyQueue(db, prefix=prefix) for prefix in prefixes}
+
+        def produce(prefix):
+            producer_q = k2hash.KeyQueue(db, prefix=prefix)
+            for i in range(100):
+                producer_q.put({"{}-{}".format(prefix, i): "val"})
+            producer_q.close()
+
+        producers = [threading.Thread(target=produce, args=(prefix,)) for prefix in prefixes]
+        for producer in producers:
+            producer.start()
+        for producer in producers:
+            producer.join()
+        for prefix, q in queues.items():
+            self.assertTrue(q.qsize() == 100)
+            self.assertEqual(
+                q.remove(1000), [{"{}-{}".format(prefix, i): "val"} for i in range(100)]
+            )
+            self.assertTrue(q.close(), True)
+        db.close()
+
     def test_KeyQueue_repr(self):
         db = k2hash.K2hash()
         q = k2hash.KeyQueue(db)
@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+#
+# K2hash Python Driver under MIT License
+#
+# Copyright (c) 2022 Yahoo Japan Corporation
+#
+# For the full copyright and license information, please view
+# the license file that was distributed with this source code.
+#
+# AUTHOR:   Hirotaka Wakabayashi
+# CREATE:   Tue Feb 08 2022
+# REVISION:
+#
+import time
+import unittest
+
+import k2hash
+
+
+class TestPriorityQueue(unittest.TestCase):
+    def test_PriorityQueue_construct(self):
+        db = k2hash.K2hash()
+        q = k2hash.PriorityQueue(db, levels=3)
+        self.assertTrue(isinstance(q, k2hash.PriorityQueue))
+        self.assertEqual(len(q.levels), 3)
+        self.assertRaises(ValueError, k2hash.PriorityQueue, db, levels=0)
+        self.assertRaises(ValueError, k2hash.PriorityQueue, db, aging=0)
+        self.assertRaises(ValueError, q.put, "v1", 3)
+        self.assertRaises(TypeError, q.put, "v1", "0")
+        self.assertTrue(q.close())
+        db.close()
+
+    def test_PriorityQueue_get(self):
+        db = k2hash.K2hash()
+        q = k2hash.PriorityQueue(db, levels=3)
+        self.assertTrue(q.put("low", 2))
+        self.assertTrue(q.put("high", 0))
+        self.assertTrue(q.put("middle", 1))
+        self.assertEqual(q.qsize(), 3)
+        self.assertEqual(q.qsize(2), 1)
+        self.assertEqual(q.get(), "high")
+        self.assertEqual(q.get(), "middle")
+        self.assertEqual(q.get(), "low")
+        self.assertEqual(q.get(), "")
+        self.assertTrue(q.empty())
+        self.assertTrue(q.close())
+        db.close()
+
+    def test_PriorityQueue_get_many(self):
+        db = k2hash.K2hash()
+        q = k2hash.PriorityQueue(db, levels=3)
+        self.assertEqual(q.put_many(["l1", "l2"], 2), 2)
+        self.assertEqual(q.put_many(["h1", "h2"], 0), 2)
+        self.assertEqual(q.get_many(3), ["h1", "h2", "l1"])
+        self.assertEqual(q.remove(10), ["l2"])
+        self.assertTrue(q.close())
+        db.close()
+
+    def test_PriorityQueue_refresh(self):
+        db = k2hash.K2hash()
+        consumer = k2hash.PriorityQueue(db, levels=2, refresh_interval=0.05)
+        producer = k2hash.PriorityQueue(db, levels=2)
+        self.assertEqual(consumer.get(), "")
+        self.assertTrue(producer.put("v1", 1))
+        time.sleep(0.1)
+        self.assertEqual(consumer.get(), "v1")
+        self.assertTrue(producer.close())
+        self.assertTrue(consumer.close())
+        db.close()
+
+    def test_PriorityQueue_aging(self):
+        db = k2hash.K2hash()
+        q = k2hash.PriorityQueue(db, levels=2, aging=0.05)
+        self.assertEqual(q.put_many(["h{}".format(i) for i in range(10)], 0), 10)
+        self.assertTrue(q.put("low", 1))
+        self.assertEqual(q.get(), "h0")
+        time.sleep(0.1)
+        self.assertEqual(q.get(), "low")
+        self.assertEqual(q.get(), "h1")
+        self.assertTrue(q.clear())
+        self.assertTrue(q.close())
+        db.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
+
+#
+# Local variables:
+# tab-width: 4
+# c-basic-offset: 4
+# End:
+# vim600: expandtab sw=4 ts=4 fdm=marker
+# vim<600: expandtab sw=4 ts=4
+#
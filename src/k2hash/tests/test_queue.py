@@ -11,7 +11,11 @@
 # CREATE:   Tue Feb 08 2022
 # REVISION:
 #
+import io
 import logging
+import os
+import tempfile
+import threading
 import time
 import unittest
 
@@ -56,6 +60,85 @@ class TestQueue(unittest.TestCase):
         self.assertTrue(q.close(), True)
         db.close()
 
+    def test_Queue_put_with_list(self):
+        db = k2hash.K2hash()
+        q = k2hash.Queue(db)
+        self.assertTrue(isinstance(q, k2hash.Queue))
+        self.assertTrue(q.put(["v1", "v2"]))
+        self.assertTrue(q.qsize() == 2)
+        self.assertEqual(q.get(), "v1")
+        self.assertEqual(q.get(), "v2")
+        self.assertTrue(q.close(), True)
+        db.close()
+
+    def test_Queue_put_many(self):
+        db = k2hash.K2hash()
+        q = k2hash.Queue(db)
+        self.assertTrue(isinstance(q, k2hash.Queue))
+        self.assertEqual(q.put_many("v{}".format(i) for i in range(10)), 10)
+        self.assertTrue(q.qsize() == 10)
+        self.assertRaises(TypeError, q.put_many, "v1")
+        self.assertRaises(TypeError, q.put_many, ["v1", 1])
+        self.assertRaises(ValueError, q.put_many, ["v1", ""])
+        self.assertTrue(q.qsize() == 10)
+        self.assertTrue(q.clear())
+        self.assertTrue(q.close(), True)
+        db.close()
+
+    def test_Queue_get_many(self):
+        db = k2hash.K2hash()
+        q = k2hash.Queue(db)
+        self.assertTrue(isinstance(q, k2hash.Queue))
+        objs = ["v{}".format(i) for i in range(10)]
+        self.assertEqual(q.put_many(objs), 10)
+        self.assertEqual(q.get_many(4), objs[:4])
+        self.assertEqual(q.get_many(100), objs[4:])
+        self.assertEqual(q.get_many(1), [])
+        self.assertRaises(TypeError, q.get_many, "1")
+        self.assertRaises(ValueError, q.get_many, 0)
+        self.assertTrue(q.close(), True)
+        db.close()
+
+    def test_Queue_lifo(self):
+        db = k2hash.K2hash()
+        q = k2hash.Queue(db, fifo=False)
+        self.assertTrue(isinstance(q, k2hash.Queue))
+        self.assertEqual(q.put_many(["v1", "v2", "v3"]), 3)
+        self.assertEqual(q.get_many(3), ["v3", "v2", "v1"])
+        self.assertTrue(q.close(), True)
+        db.close()
+
+    def test_Queue_with_password(self):
+        db = k2hash.K2hash()
+        q = k2hash.Queue(db, password="secretstring", expire_duration=60)
+        self.assertTrue(isinstance(q, k2hash.Queue))
+        self.assertTrue(q.put("v1"))
+        self.assertEqual(q.get(), "v1")
+        self.assertTrue(q.close(), True)
+        db.close()
+
+    def test_Queue_prefix_isolation(self):
+        db = k2hash.K2hash()
+        prefixes = ["tenant{}".format(i) for i in range(4)]
+        queues = {prefix: k2hash.Queue(db, prefix=prefix) for prefix in prefixes}
+
+        def produce(prefix):
+            producer_q = k2hash.Queue(db, prefix=prefix)
+            for i in range(100):
+                producer_q.put("{}-{}".format(prefix, i))
+            producer_q.close()
+
+        producers = [threading.Thread(target=produce, args=(prefix,)) for prefix in prefixes]
+        for producer in producers:
+            producer.start()
+        for producer in producers:
+            producer.join()
+        for prefix, q in queues.items():
+            self.assertTrue(q.qsize() == 100)
+            self.assertEqual(q.get_many(1000), ["{}-{}".format(prefix, i) for i in range(100)])
+            self.assertTrue(q.close(), True)
+        db.close()
+
     def test_Queue_clear(self):
         db = k2hash.K2hash()
         q = k2hash.Queue(db)
@@ -130,6 +213,31 @@ class TestQueue(unittest.TestCase):
         self.assertTrue(q.close(), True)
         db.close()
 
+    def test_Queue_get_with_timeout(self):
+        db = k2hash.K2hash()
+        q = k2hash.Queue(db)
+        self.assertTrue(isinstance(q, k2hash.Queue))
+        start = time.monotonic()
+        self.assertEqual(q.get(block=True, timeout=0.1), "")
+        self.assertTrue(time.monotonic() - start >= 0.1)
+        self.assertRaises(TypeError, q.get, 1)
+        self.assertRaises(ValueError, q.get, True, -1)
+        self.assertTrue(q.close(), True)
+        db.close()
+
+    def test_Queue_get_wakes_up_on_put(self):
+        db = k2hash.K2hash()
+        q = k2hash.Queue(db)
+        producer_q = k2hash.Queue(db)
+        self.assertTrue(isinstance(q, k2hash.Queue))
+        producer = threading.Timer(0.1, producer_q.put, ["v1"])
+        producer.start()
+        self.assertEqual(q.get(block=True, timeout=10), "v1")
+        producer.join()
+        self.assertTrue(producer_q.close(), True)
+        self.assertTrue(q.close(), True)
+        db.close()
+
     def test_Queue_print(self):
         db = k2hash.K2hash()
         q = k2hash.Queue(db)
@@ -162,6 +270,51 @@ class TestQueue(unittest.TestCase):
         self.assertTrue(q.close(), True)
         db.close()
 
+    def test_Queue_remove_returns_objs(self):
+        db = k2hash.K2hash()
+        q = k2hash.Queue(db)
+        self.assertTrue(isinstance(q, k2hash.Queue))
+        objs = ["v{}".format(i) for i in range(5)]
+        self.assertEqual(q.put_many(objs), 5)
+        self.assertEqual(q.remove(2), objs[:2])
+        removed = []
+        self.assertEqual(q.remove(10, removed.append), 3)
+        self.assertEqual(removed, objs[2:])
+        self.assertTrue(q.qsize() == 0)
+        self.assertRaises(TypeError, q.remove, 1, "callback")
+        self.assertTrue(q.close(), True)
+        db.close()
+
+    def test_Queue_remove_to_file(self):
+        db = k2hash.K2hash()
+        q = k2hash.Queue(db)
+        self.assertTrue(isinstance(q, k2hash.Queue))
+        self.assertEqual(q.put_many(["v1", "v2"]), 2)
+        out = io.StringIO()
+        self.assertEqual(q.remove(2, out), 2)
+        self.assertEqual(out.getvalue(), '"v1"\n"v2"\n')
+        self.assertTrue(q.close(), True)
+        db.close()
+
+    @unittest.skipUnless(hasattr(os, "fork"), "fork is not available")
+    def test_Queue_reopen_after_fork(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            db = k2hash.K2hash(os.path.join(tmpdir, "fork.k2h"), readonly=False)
+            q = k2hash.Queue(db, prefix="fork")
+            self.assertEqual(q.put_many(["v1", "v2"]), 2)
+            pid = os.fork()
+            if pid == 0:
+                ok = False
+                try:
+                    ok = q.get() == "v1" and q.put("v3")
+                finally:
+                    os._exit(0 if ok else 1)
+            _, status = os.waitpid(pid, 0)
+            self.assertEqual(os.WEXITSTATUS(status), 0)
+            self.assertEqual(q.get_many(10), ["v2", "v3"])
+            self.assertTrue(q.close())
+            db.close()
+
     def test_Queue_repr(self):
         db = k2hash.K2hash()
         q = k2hash.Queue(db)
@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+#
+# K2hash Python Driver under MIT License
+#
+# Copyright (c) 2022 Yahoo Japan Corporation
+#
+# For the full copyright and license information, please view
+# the license file that was distributed with this source code.
+#
+# AUTHOR:   Hirotaka Wakabayashi
+# CREATE:   Tue Feb 08 2022
+# REVISION:
+#
+import os
+import tempfile
+import unittest
+
+import k2hash
+
+
+class TestShardedK2hash(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.paths = [
+            os.path.join(self.tmpdir.name, "shard{}.k2h".format(i)) for i in range(4)
+        ]
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_ShardedK2hash_construct(self):
+        self.assertRaises(TypeError, k2hash.ShardedK2hash, "path")
+        self.assertRaises(ValueError, k2hash.ShardedK2hash, [])
+        db = k2hash.ShardedK2hash(self.paths, readonly=False)
+        self.assertTrue(isinstance(db, k2hash.ShardedK2hash))
+        self.assertEqual(len(db.shards), 4)
+        self.assertTrue(db.close())
+
+    def test_ShardedK2hash_set_get(self):
+        with k2hash.ShardedK2hash(self.paths, readonly=False) as db:
+            for i in range(100):
+                self.assertTrue(db.set("key{}".format(i), "val{}".format(i)))
+            self.assertEqual(db.get("key1"), "val1")
+            self.assertTrue("key1" in db)
+            self.assertEqual(db.shard_of("key1").get("key1"), "val1")
+            for shard in db.shards:
+                if shard is not db.shard_of("key1"):
+                    self.assertFalse(shard.exists("key1"))
+            self.assertTrue(db.remove("key1"))
+            self.assertFalse("key1" in db)
+
+    def test_ShardedK2hash_get_many_set_many(self):
+        with k2hash.ShardedK2hash(self.paths, readonly=False) as db:
+            mapping = {"key{}".format(i): "val{}".format(i) for i in range(100)}
+            self.assertTrue(db.set_many(mapping))
+            keys = list(mapping) + ["nokey"]
+            self.assertEqual(db.get_many(keys), list(mapping.values()) + [""])
+
+    def test_ShardedK2hash_subkeys(self):
+        with k2hash.ShardedK2hash(self.paths, readonly=False) as db:
+            self.assertTrue(db.set("parent", "val"))
+            self.assertTrue(db.add_subkey("parent", "child", "subval"))
+            self.assertEqual(db.get_subkeys("parent"), ["child"])
+            self.assertEqual(db.shard_of("parent").get("child"), "subval")
+
+    def test_ShardedK2hash_scan(self):
+        with k2hash.ShardedK2hash(self.paths, readonly=False) as db:
+            mapping = {"key{}".format(i): "val{}".format(i) for i in range(100)}
+            self.assertTrue(db.set_many(mapping))
+            pairs = [pair for batch in db.scan(batch_size=7) for pair in batch]
+            self.assertEqual(dict(pairs), mapping)
+            self.assertEqual(sorted(db), sorted(mapping))
+
+    def test_ShardedK2hash_add_shard(self):
+        with k2hash.ShardedK2hash(self.paths[:3], readonly=False) as db:
+            mapping = {"key{}".format(i): "val{}".format(i) for i in range(300)}
+            self.assertTrue(db.set_many(mapping))
+            self.assertTrue(db.set("parent", "val"))
+            self.assertTrue(db.add_subkey("parent", "child", "subval"))
+            binary = {"bin{}".format(i): b"\0\xff" * i for i in range(1, 50)}
+            for key, val in binary.items():
+                self.assertTrue(db.set_bytes(key, val))
+            stats = db.add_shard(self.paths[3])
+            self.assertEqual(len(db.shards), 4)
+            self.assertTrue(0 < stats["moved"] < stats["scanned"])
+            self.assertTrue(0.0 < stats["moved_fraction"] < 0.5)
+            self.assertEqual(db.get_many(list(mapping)), list(mapping.values()))
+            self.assertEqual(db.get_subkeys("parent"), ["child"])
+            self.assertEqual(db.shard_of("parent").get("child"), "subval")
+            self.assertEqual(sum(1 for key in db if key.startswith("key")), 300)
+            self.assertEqual(stats["skipped"], 0)
+            for key, val in binary.items():
+                self.assertEqual(db.get_bytes(key), val)
+
+    def test_ShardedK2hash_add_shard_with_newer_value(self):
+        with k2hash.ShardedK2hash(self.paths[:3], readonly=False) as db:
+            ring = db.ring.copy()
+            ring.add("shard3")
+            key = next(
+                "parent{}".format(i)
+                for i in range(1000)
+                if ring.node_for("parent{}".format(i)) == "shard3"
+            )
+            self.assertTrue(db.set(key, "old"))
+            self.assertTrue(db.add_subkey(key, "child", "subval"))
+            # the key is written to its new shard while the keys are moved.
+            shard = k2hash.K2hash(self.paths[3], readonly=False)
+            self.assertTrue(shard.set(key, "new"))
+            stats = db.add_shard(shard)
+            self.assertEqual(stats["skipped"], 0)
+            self.assertTrue(db.shard_of(key) is shard)
+            self.assertEqual(db.get(key), "new")
+            self.assertEqual(db.get_subkeys(key), ["child"])
+            self.assertEqual(shard.get("child"), "subval")
+
+    def test_ShardedK2hash_remove_shard(self):
+        with k2hash.ShardedK2hash(self.paths, readonly=False) as db:
+            mapping = {"key{}".format(i): "val{}".format(i) for i in range(300)}
+            self.assertTrue(db.set_many(mapping))
+            stats = db.remove_shard(self.paths[0])
+            self.assertEqual(len(db.shards), 3)
+            self.assertEqual(stats["moved"], stats["scanned"])
+            self.assertTrue(0.0 < stats["moved_fraction"] < 0.5)
+            self.assertEqual(db.get_many(list(mapping)), list(mapping.values()))
+            self.assertRaises(ValueError, db.remove_shard, self.paths[0])
+
+
+if __name__ == "__main__":
+    unittest.main()
+
+#
+# Local variables:
+# tab-width: 4
+# c-basic-offset: 4
+# End:
+# vim600: expandtab sw=4 ts=4 fdm=marker
+# vim<600: expandtab sw=4 ts=4
+#
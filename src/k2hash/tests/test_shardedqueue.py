@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+#
+# K2hash Python Driver under MIT License
+#
+# Copyright (c) 2022 Yahoo Japan Corporation
+#
+# For the full copyright and license information, please view
+# the license file that was distributed with this source code.
+#
+# AUTHOR:   Hirotaka Wakabayashi
+# CREATE:   Tue Feb 08 2022
+# REVISION:
+#
+import unittest
+
+import k2hash
+
+
+class TestShardedQueue(unittest.TestCase):
+    def test_ShardedQueue_construct(self):
+        db = k2hash.K2hash()
+        q = k2hash.ShardedQueue(db, shards=4)
+        self.assertTrue(isinstance(q, k2hash.ShardedQueue))
+        self.assertEqual(len(q.shards), 4)
+        self.assertRaises(ValueError, k2hash.ShardedQueue, db, shards=0)
+        self.assertRaises(ValueError, k2hash.ShardedQueue, db, policy="random")
+        self.assertTrue(q.close())
+        db.close()
+
+    def test_ShardedQueue_round_robin(self):
+        db = k2hash.K2hash()
+        q = k2hash.ShardedQueue(db, shards=4, home=0)
+        objs = ["v{}".format(i) for i in range(8)]
+        for obj in objs[:4]:
+            self.assertTrue(q.put(obj))
+        self.assertEqual(q.put_many(objs[4:]), 4)
+        self.assertEqual([shard.qsize() for shard in q.shards], [2, 2, 2, 2])
+        self.assertEqual(q.qsize(), 8)
+        self.assertEqual(sorted(q.get_many(100)), objs)
+        self.assertTrue(q.empty())
+        self.assertTrue(q.close())
+        db.close()
+
+    def test_ShardedQueue_hash(self):
+        db = k2hash.K2hash()
+        q = k2hash.ShardedQueue(db, shards=4, policy="hash")
+        for i in range(10):
+            self.assertTrue(q.put("v{}".format(i), key="tenant1"))
+        self.assertEqual(sorted(shard.qsize() for shard in q.shards), [0, 0, 0, 10])
+        self.assertTrue(q.clear())
+        self.assertEqual(q.qsize(), 0)
+        self.assertTrue(q.close())
+        db.close()
+
+    def test_ShardedQueue_work_stealing(self):
+        db = k2hash.K2hash()
+        producer = k2hash.ShardedQueue(db, shards=4, policy="hash")
+        consumer = k2hash.ShardedQueue(db, shards=4, home=0)
+        objs = ["v{}".format(i) for i in range(5)]
+        self.assertEqual(producer.put_many(objs, key="tenant1"), 5)
+        self.assertEqual(consumer.get(), "v0")
+        self.assertEqual(consumer.remove(10), objs[1:])
+        self.assertEqual(consumer.get(block=True, timeout=0.1), "")
+        self.assertTrue(producer.close())
+        self.assertTrue(consumer.close())
+        db.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
+
+#
+# Local variables:
+# tab-width: 4
+# c-basic-offset: 4
+# End:
+# vim600: expandtab sw=4 ts=4 fdm=marker
+# vim<600: expandtab sw=4 ts=4
+#
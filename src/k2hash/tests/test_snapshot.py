@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+#
+# K2hash Python Driver under MIT License
+#
+# Copyright (c) 2022 Yahoo Japan Corporation
+#
+# For the full copyright and license information, please view
+# the license file that was distributed with this source code.
+#
+# AUTHOR:   Hirotaka Wakabayashi
+# CREATE:   Tue Feb 08 2022
+# REVISION:
+#
+import os
+import tempfile
+import unittest
+
+import k2hash
+from k2hash.snapshot import _write_snapshot
+
+
+class TestSnapshotReader(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "test.snap")
+        self.pairs = {"key{}".format(i).encode(): "val{}".format(i).encode() for i in range(100)}
+        self.assertEqual(_write_snapshot(self.path, self.pairs.items()), 100)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_SnapshotReader_construct(self):
+        self.assertRaises(TypeError, k2hash.SnapshotReader, 1)
+        self.assertRaises(ValueError, k2hash.SnapshotReader, "")
+        other = os.path.join(self.tmpdir.name, "other")
+        with open(other, "wb") as file:
+            file.write(b"not a snapshot file")
+        self.assertRaises(ValueError, k2hash.SnapshotReader, other)
+        with k2hash.SnapshotReader(self.path) as reader:
+            self.assertEqual(len(reader), 100)
+
+    def test_SnapshotReader_get(self):
+        with k2hash.SnapshotReader(self.path) as reader:
+            for key, val in self.pairs.items():
+                self.assertEqual(reader.get(key.decode()), val.decode())
+                self.assertEqual(reader.get_bytes(key), val)
+            self.assertEqual(reader.get("missing"), "")
+            self.assertEqual(reader.get_bytes("key"), None)
+            self.assertEqual(reader.get_bytes("zzz"), None)
+            self.assertTrue("key1" in reader)
+            self.assertFalse("key1000" in reader)
+            self.assertRaises(TypeError, reader.get, 1)
+
+    def test_SnapshotReader_get_view(self):
+        with k2hash.SnapshotReader(self.path) as reader:
+            view = reader.get_view("key42")
+            self.assertTrue(isinstance(view, memoryview))
+            self.assertEqual(view.tobytes(), b"val42")
+            view.release()
+            self.assertEqual(reader.get_view("missing"), None)
+
+    def test_SnapshotReader_iter(self):
+        with k2hash.SnapshotReader(self.path) as reader:
+            keys = sorted(key.decode() for key in self.pairs)
+            self.assertEqual(list(reader), keys)
+            self.assertEqual(
+                list(reader.items()), [(key, self.pairs[key.encode()].decode()) for key in keys]
+            )
+
+    def test_SnapshotReader_stored_values(self):
+        path = os.path.join(self.tmpdir.name, "stored.snap")
+        # values set by set() keep their terminating NUL, and a later pair wins.
+        pairs = iter([(b"b", b"v1\0"), (b"a", b"\0x\0"), (b"b", b"v2\0")])
+        self.assertEqual(_write_snapshot(path, pairs), 2)
+        with k2hash.SnapshotReader(path) as reader:
+            self.assertEqual(reader.get("b"), "v2")
+            self.assertEqual(reader.get_bytes("a"), b"\0x\0")
+            self.assertEqual(list(reader.items()), [("a", "\0x"), ("b", "v2")])
+            self.assertEqual(
+                list(reader.items(use_str=False)), [(b"a", b"\0x\0"), (b"b", b"v2\0")]
+            )
+        self.assertEqual(sorted(os.listdir(self.tmpdir.name)), ["stored.snap", "test.snap"])
+
+    def test_SnapshotReader_empty(self):
+        path = os.path.join(self.tmpdir.name, "empty.snap")
+        self.assertEqual(_write_snapshot(path, []), 0)
+        with k2hash.SnapshotReader(path) as reader:
+            self.assertEqual(len(reader), 0)
+            self.assertEqual(reader.get("key"), "")
+            self.assertEqual(list(reader), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
+
+#
+# Local variables:
+# tab-width: 4
+# c-basic-offset: 4
+# End:
+# vim600: expandtab sw=4 ts=4 fdm=marker
+# vim<600: expandtab sw=4 ts=4
+#